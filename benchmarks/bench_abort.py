@@ -0,0 +1,106 @@
+"""
+Benchmark of aborting a job while it is marking, with and without a cap on the list packets in flight.
+
+A job is marked on a simulated board which takes PACKET_TIME to execute each list packet, so the board fills and the
+job waits for it. The job is aborted from another thread while marking. The latency is the time from calling abort() to
+the board stopping, and should not depend on what the job thread is waiting for. The packets in flight are those the
+board held when it stopped: had the controller lost the connection rather than stopped the board, the laser would have
+run on for that many packets. The cap bounds them, at some cost in throughput, measured marking a job to the end.
+
+With `--connection usb` the job is marked on the laser, and the latency is the time for abort() to send the stop.
+
+Run from the repository root: `python -m benchmarks.bench_abort`
+"""
+
+import argparse
+import threading
+import time
+
+from galvo import GalvoController
+from galvo.connections import create_connection
+
+PACKET_TIME = 0.002
+BUFFER_PACKETS = 8
+ABORTS = 10
+
+
+def controller_for(connection, cap):
+    controller = GalvoController()
+    if connection == "simulated":
+        controller.connection = create_connection(
+            "simulated", buffer_packets=BUFFER_PACKETS, packet_time=PACKET_TIME
+        )
+    else:
+        controller.connection = create_connection(connection)
+    controller.max_inflight_packets = cap
+    return controller
+
+
+def job(controller, points):
+    with controller.marking() as c:
+        c.goto(0x1000, 0x1000)
+        for i in range(points):
+            c.mark(0x1000 + (i % 1000) * 0x20, 0x1000 + (i // 1000 % 0xE0) * 0x100)
+
+
+def aborted(connection, cap, delay):
+    """
+    Aborts a job after delay seconds.
+
+    @return: latency to the board stopping, packets in flight, seconds for the job thread to finish.
+    """
+    controller = controller_for(connection, cap)
+    thread = threading.Thread(target=job, args=(controller, 50000))
+    thread.start()
+    time.sleep(delay)
+    start = time.perf_counter()
+    controller.abort()
+    thread.join()
+    returned = time.perf_counter() - start
+    board = controller.connection
+    if connection == "simulated":
+        latency = board.stop_time - start
+        in_flight = board.packets_discarded
+    else:
+        latency = controller.abort_latency
+        in_flight = None
+    controller.disconnect()
+    return latency, in_flight, returned
+
+
+def throughput(connection, cap, points=50000):
+    controller = controller_for(connection, cap)
+    start = time.perf_counter()
+    job(controller, points)
+    elapsed = time.perf_counter() - start
+    controller.disconnect()
+    return elapsed
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("-c", "--connection", default="simulated")
+    parser.add_argument("--caps", nargs="+", type=int, default=[0, 4, 2])
+    options = parser.parse_args(args)
+    if options.connection == "simulated":
+        print(f"{PACKET_TIME * 1e3:.0f}ms per packet, board buffer of {BUFFER_PACKETS} packets.")
+    for cap in options.caps:
+        cap = cap or None
+        results = [
+            aborted(options.connection, cap, 0.05 + 0.013 * i) for i in range(ABORTS)
+        ]
+        latencies = [r[0] for r in results]
+        returned = [r[2] for r in results]
+        line = (
+            f"cap {str(cap):4} abort latency mean {sum(latencies) / ABORTS * 1e3:6.2f}ms "
+            f"max {max(latencies) * 1e3:6.2f}ms, job finished within {max(returned) * 1e3:6.1f}ms"
+        )
+        if results[0][1] is not None:
+            line += f", in flight max {max(r[1] for r in results)}"
+        if options.connection == "simulated":
+            line += f", job time {throughput(options.connection, cap):.3f}s"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
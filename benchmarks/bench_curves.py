@@ -0,0 +1,69 @@
+"""
+Benchmark of flattening circles of varying radius and center, as a preview rebuilt as its radius changes.
+
+Compares computing cos and sin of each vertex in Python, as `examples/light_circle_abort.py` did, against
+`galvo.curves.circle()`, which scales the cached unit circle of the segment count, both at the segment count for half
+a galvo unit. Then marks the circles with mark_circle().
+
+Run from the repository root: `python -m benchmarks.bench_curves`
+"""
+
+import math
+import time
+
+from galvo import GalvoController, curves
+from galvo.consts import listMarkTo
+from galvo.recorder_connection import RecorderConnection
+
+CIRCLES = 2000
+TOLERANCE = 0.5
+
+
+def radii():
+    return [0x800 + 8 * i for i in range(CIRCLES)]
+
+
+def per_vertex(radii):
+    start = time.perf_counter()
+    points = 0
+    for i, radius in enumerate(radii):
+        n = curves.arc_segments(radius, 2 * math.pi, TOLERANCE)
+        cx = 0x8000 + i % 16
+        path = []
+        for k in range(n + 1):
+            angle = 2 * math.pi * k / n
+            path.append((cx + radius * math.cos(angle), 0x8000 + radius * math.sin(angle)))
+        points += len(path)
+    return time.perf_counter() - start, points
+
+
+def cached(radii):
+    curves.cache_clear()
+    start = time.perf_counter()
+    points = 0
+    for i, radius in enumerate(radii):
+        points += len(curves.circle(0x8000 + i % 16, 0x8000, radius, TOLERANCE))
+    return time.perf_counter() - start, points
+
+
+def marked(radii):
+    controller = GalvoController(mock=True)
+    controller.connection = RecorderConnection()
+    start = time.perf_counter()
+    with controller.marking() as c:
+        for i, radius in enumerate(radii):
+            c.mark_circle(0x8000 + i % 16, 0x8000, radius, TOLERANCE)
+    return time.perf_counter() - start, controller.connection.count(listMarkTo)
+
+
+def main():
+    shapes = radii()
+    print(f"{CIRCLES} circles of radius {shapes[0]:#x} to {shapes[-1]:#x}, within {TOLERANCE} galvo units.")
+    for name, function in (("per vertex", per_vertex), ("cached", cached), ("marked", marked)):
+        elapsed, points = function(shapes)
+        print(f"{name:10} {elapsed:7.3f}s {points / elapsed:12,.0f} points/s, {points} points")
+    print(curves.cache_info())
+
+
+if __name__ == "__main__":
+    main()
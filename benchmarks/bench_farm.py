@@ -0,0 +1,62 @@
+"""
+Benchmark of compiling a large job of many polylines in worker processes.
+
+Compares `mark_polylines()` compiled in-process against a `CompileFarm` of one worker per core, and checks that both
+write identical list commands.
+
+Run from the repository root: `python -m benchmarks.bench_farm`
+"""
+
+import os
+import time
+
+import numpy as np
+
+from galvo import GalvoController
+from galvo.farm import CompileFarm
+from galvo.recorder_connection import RecorderConnection
+
+PATHS = 4000
+POINTS = 250
+
+
+def paths():
+    t = np.linspace(0, 4 * np.pi, POINTS)
+    side = int(np.ceil(np.sqrt(PATHS)))
+    result = []
+    for i in range(PATHS):
+        cx = 0x1000 + (i % side) * 0xD00 / side * 16
+        cy = 0x1000 + (i // side) * 0xD00 / side * 16
+        r = 20 * t + i % 50
+        result.append(np.column_stack((cx + r * np.cos(t), cy + r * np.sin(t))))
+    return result
+
+
+def job(polylines, farm=None):
+    controller = GalvoController(mock=True)
+    controller.connection = RecorderConnection()
+    start = time.perf_counter()
+    with controller.marking() as c:
+        c.mark_polylines(polylines, farm)
+    return time.perf_counter() - start, controller.connection
+
+
+def main():
+    polylines = paths()
+    serial_time, serial = job(polylines)
+    workers = os.cpu_count() or 1
+    with CompileFarm(workers=max(2, workers), min_points=0) as farm:
+        # The first job starts the worker processes.
+        job(polylines[:100], farm)
+        farm_time, farmed = job(polylines, farm)
+        stats = farm.stats()
+    identical = list(serial.commands()) == list(farmed.commands())
+    commands = len(serial)
+    print(f"{PATHS} polylines of {POINTS} points, {commands} commands, {workers} cores.")
+    print(f"in-process: {serial_time:.3f}s, {commands / serial_time:.0f} commands/s")
+    print(f"farm:       {farm_time:.3f}s, {commands / farm_time:.0f} commands/s")
+    print(f"chunks: {stats['chunks']}, recompiled: {stats['recompiled']}, identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark of hatch filling many small polygons, such as the glyphs of a page of text.
+
+Compares the bulk `hatch()` against hatching each polygon in turn and marking its segments with `goto()` and `mark()`.
+
+Run from the repository root: `python -m benchmarks.bench_hatch`
+"""
+
+import time
+
+import numpy as np
+
+from galvo import GalvoController
+from galvo.hatch import hatch
+from galvo.recorder_connection import RecorderConnection
+
+POLYGONS = 10000
+SPACING = 0.05
+
+
+def polygons():
+    # A grid of small diamonds with square holes.
+    outer = np.array([[0, -40], [40, 0], [0, 40], [-40, 0]], dtype=float)
+    inner = np.array([[-10, -10], [10, -10], [10, 10], [-10, 10]], dtype=float)
+    shapes = []
+    side = int(np.ceil(np.sqrt(POLYGONS)))
+    for i in range(POLYGONS):
+        center = np.array([0x1000 + (i % side) * 100, 0x1000 + (i // side) * 100])
+        shapes.append([outer + center, inner + center])
+    return shapes
+
+
+def hatch_job(bulk, shapes):
+    controller = GalvoController(mock=True)
+    controller.connection = RecorderConnection()
+    spacing = SPACING * controller.galvos_per_mm
+    start = time.perf_counter()
+    with controller.marking() as c:
+        if bulk:
+            c.hatch(shapes, spacing=SPACING)
+        else:
+            for shape in shapes:
+                for (x0, y0), (x1, y1) in np.rint(hatch([shape], spacing)):
+                    c.goto(x0, y0)
+                    c.mark(x1, y1)
+    return time.perf_counter() - start, len(controller.connection)
+
+
+def main():
+    shapes = polygons()
+    loop_time, loop_commands = hatch_job(False, shapes)
+    bulk_time, bulk_commands = hatch_job(True, shapes)
+    print(f"{POLYGONS} polygons hatched at {SPACING}mm.")
+    print(f"per polygon: {loop_time:.3f}s, {loop_commands} commands")
+    print(f"bulk:        {bulk_time:.3f}s, {bulk_commands} commands")
+
+
+if __name__ == "__main__":
+    main()
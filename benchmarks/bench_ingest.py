@@ -0,0 +1,81 @@
+"""
+Benchmark of marking a large svg file, with paths of lines and quadratic curves in mm.
+
+Compares parsing the whole file, then marking each flattened vertex with `goto()` and `mark()`, against
+`mark_file()`, which streams batches of paths into the list as the file is parsed. Reports the time to the first list
+packet sent, when the laser could start marking, and the total time.
+
+Run from the repository root: `python -m benchmarks.bench_ingest`
+"""
+
+import io
+import time
+
+from galvo import GalvoController
+from galvo.consts import listMarkTo
+from galvo.ingest import read_svg
+from galvo.recorder_connection import RecorderConnection
+
+PATHS = 20000
+
+
+def svg():
+    rows = [
+        f'<path d="M{i % 100} {i // 100} l0.5 0 q 0.5 1 1 0 t 1 0 z"/>'
+        for i in range(PATHS)
+    ]
+    data = '<svg xmlns="http://www.w3.org/2000/svg" width="100mm" height="100mm" viewBox="-100 0 200 200">'
+    return (data + "\n".join(rows) + "</svg>").encode()
+
+
+def controller(start, first):
+    c = GalvoController(mock=True)
+    recorder = RecorderConnection()
+    write = recorder.write
+
+    def record(index=0, packet=None):
+        if len(packet) == 0xC00 and not first:
+            first.append(time.perf_counter() - start[0])
+        write(index, packet)
+
+    recorder.write = record
+    c.connection = recorder
+    return c
+
+
+def per_vertex(data):
+    start = [time.perf_counter()]
+    first = []
+    c = controller(start, first)
+    transform = c._default_transform()
+    paths = list(read_svg(io.BytesIO(data), transform.tolerance(0.5)))
+    with c.marking():
+        for path in paths:
+            for i, (x, y) in enumerate(transform(path).tolist()):
+                if i:
+                    c.mark(int(round(x)), int(round(y)))
+                else:
+                    c.goto(int(round(x)), int(round(y)))
+    return time.perf_counter() - start[0], first[0], c
+
+
+def streamed(data):
+    start = [time.perf_counter()]
+    first = []
+    c = controller(start, first)
+    with c.marking():
+        c.mark_file(io.BytesIO(data), file_format="svg")
+    return time.perf_counter() - start[0], first[0], c
+
+
+def main():
+    data = svg()
+    print(f"{PATHS} paths, {len(data) / 1e6:.1f}MB of svg.")
+    for name, function in (("per vertex", per_vertex), ("mark_file", streamed)):
+        elapsed, first, c = function(data)
+        marks = c.connection.count(listMarkTo)
+        print(f"{name:10} first packet {first:7.3f}s, total {elapsed:7.3f}s, {marks} marks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark of pausing and resuming a job while it is marking.
+
+A job is marked on a simulated board which takes PACKET_TIME to execute each list packet, and paused and resumed
+repeatedly from another thread. The resume latency is the time from calling resume() until the list is restarted and
+the job thread continues sending. The job must still mark every point, once.
+
+Run from the repository root: `python -m benchmarks.bench_pause`
+"""
+
+import statistics
+import threading
+import time
+
+from galvo import GalvoController
+from galvo.connections import create_connection
+from galvo.consts import listMarkTo
+
+PACKET_TIME = 0.002
+POINTS = 100000
+PAUSES = 20
+
+
+def job(controller):
+    with controller.marking() as c:
+        c.goto(0x1000, 0x1000)
+        for i in range(POINTS):
+            c.mark(0x1010 + (i % 1000) * 0x20, 0x1000 + (i // 1000 % 0xE0) * 0x100)
+
+
+def main():
+    controller = GalvoController()
+    board = create_connection("simulated", buffer_packets=8, packet_time=PACKET_TIME)
+    controller.connection = board
+    thread = threading.Thread(target=job, args=(controller,))
+    thread.start()
+    latencies = []
+    for i in range(PAUSES):
+        time.sleep(0.02)
+        controller.pause()
+        time.sleep(0.01)
+        controller.resume()
+        # The job thread records its wake, as it continues.
+        time.sleep(0.005)
+        latencies.append(controller.pause_stats["resume_latency"])
+    thread.join()
+    controller.wait_finished()
+    marks = board.count(listMarkTo)
+    print(f"{PAUSES} pauses, {PACKET_TIME * 1e3:.0f}ms per packet.")
+    print(
+        f"resume latency mean {statistics.mean(latencies) * 1e3:.3f}ms, max {max(latencies) * 1e3:.3f}ms"
+    )
+    print(f"marked {marks} of {POINTS} points, {board.packets_discarded} packets discarded.")
+    controller.disconnect()
+
+
+if __name__ == "__main__":
+    main()
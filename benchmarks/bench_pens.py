@@ -0,0 +1,53 @@
+"""
+Benchmark of a job alternating between dozens of pens.
+
+Compares calling `set()` with each pen's parameters against switching compiled pens with `set_pen()`.
+
+Run from the repository root: `python -m benchmarks.bench_pens`
+"""
+
+import time
+
+from galvo import GalvoController
+from galvo.recorder_connection import RecorderConnection
+
+PEN_COUNT = 48
+SWITCHES = 20000
+
+
+def pen_job(use_pens):
+    controller = GalvoController(mock=True)
+    controller.connection = RecorderConnection()
+    for i in range(PEN_COUNT):
+        controller.add_pen(
+            i,
+            mark_speed=100.0 + 10 * i,
+            power=10.0 + i,
+            frequency=20.0 + (i % 5),
+            delay_on=100 + (i % 3),
+        )
+    pens = [controller.pens[i] for i in range(PEN_COUNT)]
+    parameters = [pen.parameters() for pen in pens]
+    start = time.perf_counter()
+    with controller.marking() as c:
+        for i in range(SWITCHES):
+            if use_pens:
+                c.set_pen(pens[i % PEN_COUNT])
+            else:
+                c.set(**parameters[i % PEN_COUNT])
+            c.goto(0x5000, 0x5000 + (i & 0xFF))
+            c.mark(0xA000, 0x5000 + (i & 0xFF))
+    return time.perf_counter() - start, len(controller.connection)
+
+
+def main():
+    set_time, set_commands = pen_job(False)
+    pen_time, pen_commands = pen_job(True)
+    assert set_commands == pen_commands
+    print(f"{SWITCHES} switches between {PEN_COUNT} pens, {set_commands} commands.")
+    print(f"set():     {set_time:.3f}s ({SWITCHES / set_time:.0f} switches/s)")
+    print(f"set_pen(): {pen_time:.3f}s ({SWITCHES / pen_time:.0f} switches/s)")
+
+
+if __name__ == "__main__":
+    main()
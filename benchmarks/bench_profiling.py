@@ -0,0 +1,44 @@
+"""
+Benchmark of the overhead of profiling a controller.
+
+Runs workloads of the benchmark suite with and without a profiler attached, reporting the best of several alternating
+runs of each.
+
+Run from the repository root: `python -m benchmarks.bench_profiling`
+"""
+
+import time
+
+from benchmarks.suite import bulk_polylines, controller_for, dense_polylines
+
+REPEAT = 7
+
+
+def timed(workload, profiled):
+    controller = controller_for("mock")
+    if profiled:
+        controller.enable_profiling()
+    start = time.perf_counter()
+    workload(controller)
+    return time.perf_counter() - start
+
+
+def main():
+    for name, workload in (
+        ("dense_polylines", dense_polylines(1.0)),
+        ("bulk_polylines", bulk_polylines(1.0)),
+    ):
+        plain = []
+        profiled = []
+        for i in range(REPEAT):
+            plain.append(timed(workload, False))
+            profiled.append(timed(workload, True))
+        overhead = min(profiled) / min(plain) - 1
+        print(
+            f"{name:16} plain {min(plain):.3f}s, profiled {min(profiled):.3f}s, "
+            f"overhead {overhead * 100:+.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
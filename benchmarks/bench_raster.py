@@ -0,0 +1,58 @@
+"""
+Benchmark of compiling a 4000x4000 image into list packets.
+
+Run from the repository root: `python -m benchmarks.bench_raster`
+"""
+
+import time
+
+import numpy as np
+
+from galvo import GalvoController
+from galvo.raster import Raster
+from galvo.recorder_connection import RecorderConnection
+
+SIZE = 4000
+
+
+def test_image(size=SIZE):
+    y, x = np.mgrid[0:size, 0:size]
+    radius = np.hypot(x - size / 2, y - size / 2)
+    image = 127.5 + 127.5 * np.cos(radius / 40.0)
+    noise = np.random.default_rng(0).normal(0, 8, image.shape)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+
+class CountingConnection(RecorderConnection):
+    """
+    Counts packets without recording them.
+    """
+
+    def write(self, index=0, packet=None):
+        if len(packet) == 0xC00:
+            self.packets += 1
+
+
+def raster_job(image, mode):
+    controller = GalvoController(mock=True)
+    controller.connection = CountingConnection()
+    raster = Raster(image, x=0x1000, y=0x1000, pixel_size=10, mode=mode, levels=8)
+    start = time.perf_counter()
+    with controller.marking() as c:
+        raster(c)
+    elapsed = time.perf_counter() - start
+    return elapsed, controller.connection.packets
+
+
+def main():
+    image = test_image()
+    for mode in ("threshold", "dither", "grayscale"):
+        elapsed, packets = raster_job(image, mode)
+        print(
+            f"{mode:>9}: {SIZE}x{SIZE} in {elapsed:.2f}s, "
+            f"{packets} packets ({packets / elapsed:.0f} packets/s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
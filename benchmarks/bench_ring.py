@@ -0,0 +1,71 @@
+"""
+Benchmark of sending a job from a sender process through the shared memory ring, against sending it in-process.
+
+The connection is a recorder which spends the CPU time of a USB write on each packet, as pyusb does in python. The job
+is built point by point, so building and sending contend for the GIL when in-process. Throughput is the time to build
+and send the job, latency the round trip of a status query.
+
+Run from the repository root: `python -m benchmarks.bench_ring`
+"""
+
+import time
+
+from galvo import GalvoController
+from galvo.connections import create_connection, register_connection
+from galvo.recorder_connection import RecorderConnection
+from galvo.ring_connection import RingConnection
+
+POINTS = 100000
+QUERIES = 1000
+WRITE_TIME = 0.0002
+
+
+class BusyConnection(RecorderConnection):
+    def write(self, index=0, packet=None):
+        end = time.perf_counter() + WRITE_TIME
+        while time.perf_counter() < end:
+            pass
+        super().write(index, packet)
+
+
+register_connection("busy", BusyConnection)
+
+
+def job(connection):
+    controller = GalvoController(mock=True)
+    controller.connection = connection
+    start = time.perf_counter()
+    with controller.marking() as c:
+        c.goto(0x1000, 0x1000)
+        for i in range(POINTS):
+            c.mark(0x1000 + (i % 1000) * 0x20, 0x1000 + (i // 1000) * 0x100)
+    c.wait_finished()
+    elapsed = time.perf_counter() - start
+    packets = c.get_list_status()[1]
+
+    start = time.perf_counter()
+    for i in range(QUERIES):
+        c.get_version()
+    latency = (time.perf_counter() - start) / QUERIES
+    c.disconnect()
+    return elapsed, latency
+
+
+def main():
+    local_time, local_latency = job(create_connection("busy"))
+    ring = RingConnection(sender="busy")
+    ring_time, ring_latency = job(ring)
+    print(f"{POINTS} marks, {WRITE_TIME * 1e6:.0f}us CPU per USB write.")
+    print(
+        f"in-process: {local_time:.3f}s, {POINTS / local_time:.0f} marks/s, "
+        f"query {local_latency * 1e6:.1f}us"
+    )
+    print(
+        f"ring:       {ring_time:.3f}s, {POINTS / ring_time:.0f} marks/s, "
+        f"query {ring_latency * 1e6:.1f}us"
+    )
+    print(ring.stats())
+
+
+if __name__ == "__main__":
+    main()
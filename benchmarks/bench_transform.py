@@ -0,0 +1,82 @@
+"""
+Benchmark of marking paths given in mm through a transform, rotated and offset as for a part on a station.
+
+Compares transforming each point in Python and marking it with `mark()`, as jobs did before transforms, against
+`mark_polylines()` with the controller's transform, which transforms each path with numpy before packing it.
+
+Run from the repository root: `python -m benchmarks.bench_transform`
+"""
+
+import math
+import time
+
+import numpy as np
+
+from galvo import GalvoController
+from galvo.consts import listMarkTo
+from galvo.recorder_connection import RecorderConnection
+
+PATHS = 1000
+POINTS = 200
+ANGLE = 12.5
+OFFSET = (3.0, -2.0)
+
+
+def paths():
+    t = np.linspace(0, 2 * np.pi, POINTS)
+    side = int(math.ceil(math.sqrt(PATHS)))
+    return [
+        np.column_stack(
+            (
+                -50 + (i % side) * 3 + np.cos(t),
+                -50 + (i // side) * 3 + np.sin(t),
+            )
+        )
+        for i in range(PATHS)
+    ]
+
+
+def per_point(paths):
+    controller = GalvoController(mock=True)
+    controller.connection = RecorderConnection()
+    scale = controller.galvos_per_mm
+    cos = math.cos(math.radians(ANGLE))
+    sin = math.sin(math.radians(ANGLE))
+    start = time.perf_counter()
+    with controller.marking() as c:
+        for path in paths:
+            for i, (x, y) in enumerate(path.tolist()):
+                gx = int(round(0x8000 + scale * (cos * x - sin * y + OFFSET[0])))
+                gy = int(round(0x8000 + scale * (sin * x + cos * y + OFFSET[1])))
+                if i:
+                    c.mark(gx, gy)
+                else:
+                    c.goto(gx, gy)
+    return time.perf_counter() - start, controller
+
+
+def bulk(paths):
+    controller = GalvoController(mock=True)
+    controller.connection = RecorderConnection()
+    transform = controller.enable_transform()
+    transform.translate(*OFFSET)
+    transform.rotate(ANGLE)
+    start = time.perf_counter()
+    with controller.marking() as c:
+        c.mark_polylines(paths)
+    return time.perf_counter() - start, controller
+
+
+def main():
+    shapes = paths()
+    points = PATHS * POINTS
+    print(f"{PATHS} paths of {POINTS} points, rotated {ANGLE} degrees and offset {OFFSET}mm.")
+    for name, function in (("per point", per_point), ("transform", bulk)):
+        elapsed, controller = function(shapes)
+        marks = controller.connection.count(listMarkTo)
+        print(f"{name:10} {elapsed:7.3f}s {points / elapsed:12,.0f} points/s, {marks} marks")
+    print(controller.transform.stats())
+
+
+if __name__ == "__main__":
+    main()
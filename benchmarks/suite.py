@@ -0,0 +1,350 @@
+"""
+Benchmark suite of the standard workloads, covering list building, command packing, the spooler and the connections.
+
+Each workload runs offline against the chosen connections and reports the best of several runs: commands/s and
+packets/s written to the connection, the peak memory allocated while running, and for spooled jobs the latency from
+submitting a job to the spooler starting it. Results can be saved as json and compared against a saved baseline, the
+run failing if any workload became slower than the threshold allows.
+
+Run from the repository root: `python -m benchmarks.suite`
+
+    python -m benchmarks.suite --connection mock simulated --json results.json
+    python -m benchmarks.suite --compare results.json --threshold 1.25
+"""
+
+import argparse
+import json
+import statistics
+import struct
+import sys
+import threading
+import time
+import tracemalloc
+from array import array
+
+import numpy as np
+
+from galvo import GalvoController
+from galvo.connections import create_connection
+from galvo.consts import listEndOfList
+from galvo.mock_connection import MockConnection
+
+CONNECTIONS = ("mock", "recorder", "simulated")
+
+READY = 0x20
+
+
+class IdleMockConnection(MockConnection):
+    """
+    Mock connection reporting an idle board ready for packets, rather than a random status, so runs do not wait.
+    """
+
+    def read(self, index=0):
+        if not self.devices[index]:
+            raise ConnectionError
+        return struct.pack("<4H", 0, 0, 0, READY)
+
+
+class CountingConnection:
+    """
+    Counts the packets and the list commands, other than padding, written to a connection.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.list_packets = 0
+        self.realtime_packets = 0
+        self.commands = 0
+
+    def __getattr__(self, item):
+        return getattr(self.connection, item)
+
+    def write(self, index=0, packet=None):
+        if len(packet) == 0xC00:
+            self.list_packets += 1
+            opcodes = array("H", bytes(packet))[0::6]
+            self.commands += len(opcodes) - opcodes.count(listEndOfList)
+        else:
+            self.realtime_packets += 1
+            self.commands += 1
+        self.connection.write(index, packet)
+
+
+def controller_for(connection):
+    controller = GalvoController()
+    if connection == "mock":
+        connection = IdleMockConnection()
+    else:
+        connection = create_connection(connection)
+    controller.connection = CountingConnection(connection)
+    controller.connect_if_needed()
+    counting = controller.connection
+    counting.list_packets = counting.realtime_packets = counting.commands = 0
+    return controller
+
+
+#######################
+# WORKLOADS
+#######################
+
+
+def spiral_paths(count, points):
+    t = np.linspace(0, 8 * np.pi, points)
+    side = int(np.ceil(np.sqrt(count)))
+    paths = []
+    for i in range(count):
+        cx = 0x1000 + (i % side) * (0xE000 // side)
+        cy = 0x1000 + (i // side) * (0xE000 // side)
+        r = (0xE000 // side) / 2 * t / t[-1]
+        paths.append(np.column_stack((cx + r * np.cos(t), cy + r * np.sin(t))))
+    return paths
+
+
+def dense_polylines(scale):
+    """
+    Polylines marked point by point with goto() and mark(), packing each command.
+    """
+    paths = spiral_paths(50, int(4000 * scale) + 2)
+    paths = [path.round().astype(int).tolist() for path in paths]
+
+    def workload(controller):
+        with controller.marking() as c:
+            for path in paths:
+                c.goto(*path[0])
+                for x, y in path[1:]:
+                    c.mark(x, y)
+
+    return workload
+
+
+def bulk_polylines(scale):
+    """
+    Polylines marked with mark_polylines(), packing the commands with numpy.
+    """
+    paths = spiral_paths(200, int(5000 * scale) + 2)
+
+    def workload(controller):
+        with controller.marking() as c:
+            c.mark_polylines(paths)
+
+    return workload
+
+
+def hatch_fill(scale):
+    """
+    Hatch filling a grid of polygons with holes.
+    """
+    outer = np.array([[0, -200], [200, 0], [0, 200], [-200, 0]], dtype=float)
+    inner = np.array([[-50, -50], [50, -50], [50, 50], [-50, 50]], dtype=float)
+    count = int(2000 * scale) + 1
+    side = int(np.ceil(np.sqrt(count)))
+    shapes = []
+    for i in range(count):
+        center = np.array([0x1000 + (i % side) * 450, 0x1000 + (i // side) * 450])
+        shapes.append([outer + center, inner + center])
+
+    def workload(controller):
+        with controller.marking() as c:
+            c.hatch(shapes, spacing=0.02)
+
+    return workload
+
+
+def raster_rows(scale):
+    """
+    Rows of a greyscale image engraved with raster().
+    """
+    size = int(1000 * scale) + 8
+    y, x = np.mgrid[0:size, 0:size]
+    image = (127.5 + 127.5 * np.cos(np.hypot(x - size / 2, y - size / 2) / 20)).astype(
+        np.uint8
+    )
+
+    def workload(controller):
+        with controller.marking() as c:
+            c.raster(image, x=0x2000, y=0x2000, pixel_size=8)
+
+    return workload
+
+
+def parameter_changes(scale):
+    """
+    Marks alternating between parameter sets with set(), each change packing parameter commands.
+    """
+    pens = [
+        {"mark_speed": 100.0 + 50 * i, "power": 20.0 + 10 * i, "frequency": 20.0 + i}
+        for i in range(4)
+    ]
+    count = int(20000 * scale) + 1
+
+    def workload(controller):
+        with controller.marking() as c:
+            for i in range(count):
+                c.set(**pens[i % 4])
+                c.goto(0x5000, 0x5000 + (i & 0xFF))
+                c.mark(0xA000, 0x5000 + (i & 0xFF))
+
+    return workload
+
+
+def realtime_commands(scale):
+    """
+    Realtime commands, each written and its response read.
+    """
+    count = int(5000 * scale) + 1
+
+    def workload(controller):
+        for i in range(count):
+            controller.get_version()
+
+    return workload
+
+
+def short_jobs(scale):
+    """
+    Many short jobs submitted to the spooler, the workload returning the latency of each from submit to start.
+    """
+    count = int(500 * scale) + 1
+
+    def workload(controller):
+        latencies = []
+        finished = threading.Event()
+
+        def job(submitted, last):
+            def mark(c):
+                latencies.append(time.perf_counter() - submitted)
+                with c.marking():
+                    c.goto(0x6000, 0x6000)
+                    c.mark(0x7000, 0x6000)
+                    c.mark(0x7000, 0x7000)
+                if last:
+                    finished.set()
+                return True
+
+            return mark
+
+        for i in range(count):
+            controller.submit(job(time.perf_counter(), i == count - 1))
+        finished.wait()
+        controller.shutdown()
+        return latencies
+
+    return workload
+
+
+WORKLOADS = {
+    "dense_polylines": dense_polylines,
+    "bulk_polylines": bulk_polylines,
+    "hatch_fill": hatch_fill,
+    "raster_rows": raster_rows,
+    "parameter_changes": parameter_changes,
+    "realtime_commands": realtime_commands,
+    "short_jobs": short_jobs,
+}
+
+
+#######################
+# RUNNER
+#######################
+
+
+def run_once(workload, connection, scale, trace=False):
+    workload = WORKLOADS[workload](scale)
+    controller = controller_for(connection)
+    counting = controller.connection
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    latencies = workload(controller)
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    result = {
+        "time": elapsed,
+        "commands": counting.commands,
+        "packets": counting.list_packets + counting.realtime_packets,
+        "peak_memory": peak,
+    }
+    if latencies:
+        result["latency_mean"] = statistics.mean(latencies)
+        result["latency_max"] = max(latencies)
+    return result
+
+
+def run(workload, connection, scale=1.0, repeat=3):
+    """
+    Runs a workload repeatedly, then once more tracing allocations.
+
+    @return: dict of the best time and its rates.
+    """
+    runs = [run_once(workload, connection, scale) for i in range(repeat)]
+    best = min(runs, key=lambda r: r["time"])
+    result = dict(best)
+    result["commands_per_second"] = best["commands"] / best["time"]
+    result["packets_per_second"] = best["packets"] / best["time"]
+    result["peak_memory"] = run_once(workload, connection, scale, trace=True)[
+        "peak_memory"
+    ]
+    return result
+
+
+def compare(results, baseline, threshold):
+    """
+    Workloads slower than the baseline by more than the threshold ratio.
+
+    @return: list of (name, ratio)
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["time"] / baseline[name]["time"]
+        if ratio > threshold:
+            regressions.append((name, ratio))
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("-c", "--connection", nargs="+", default=["mock", "simulated"], choices=CONNECTIONS)
+    parser.add_argument("-w", "--workload", nargs="+", default=list(WORKLOADS), choices=list(WORKLOADS))
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument("-s", "--scale", type=float, default=1.0)
+    parser.add_argument("--json", help="save the results")
+    parser.add_argument("--compare", help="results to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    options = parser.parse_args(args)
+
+    results = {}
+    print(
+        f"{'workload':34} {'time':>9} {'commands/s':>12} {'packets/s':>10} {'peak KiB':>9} {'latency':>9}"
+    )
+    for connection in options.connection:
+        for workload in options.workload:
+            name = f"{workload}[{connection}]"
+            result = run(workload, connection, options.scale, options.repeat)
+            results[name] = result
+            latency = result.get("latency_mean")
+            latency = f"{latency * 1e3:7.2f}ms" if latency is not None else ""
+            print(
+                f"{name:34} {result['time']:8.3f}s {result['commands_per_second']:12.0f} "
+                f"{result['packets_per_second']:10.0f} {result['peak_memory'] / 1024:9.0f} {latency:>9}"
+            )
+    if options.json:
+        with open(options.json, "w") as fp:
+            json.dump(results, fp, indent=2)
+    if options.compare:
+        with open(options.compare) as fp:
+            baseline = json.load(fp)
+        regressions = compare(results, baseline, options.threshold)
+        for name, ratio in regressions:
+            print(f"REGRESSION {name}: {ratio:.2f}x the baseline time")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
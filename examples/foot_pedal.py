@@ -0,0 +1,37 @@
+"""
+Marks a square each time the foot-pedal is pressed.
+
+The input monitor polls the inputs in the background, and calls back when the foot-pedal input is pressed.
+"""
+
+import time
+
+from galvo.controller import GalvoController
+
+controller = GalvoController("default.json")
+
+
+def mark_square(c):
+    with c.marking():
+        c.goto(0x5000, 0x5000)
+        c.mark(0x5000, 0xA000)
+        c.mark(0xA000, 0xA000)
+        c.mark(0xA000, 0x5000)
+        c.mark(0x5000, 0x5000)
+    return True
+
+
+def pressed(state):
+    print("Foot-pedal pressed")
+    controller.submit(mark_square)
+
+
+pedal = 1 << controller.footpedal_pin
+monitor = controller.input_monitor()
+monitor.on_match(pedal, pedal, pressed)
+try:
+    while True:
+        time.sleep(1)
+except KeyboardInterrupt:
+    print(monitor.stats())
+    controller.shutdown()
@@ -1,5 +1,6 @@
 from .consts import *
 from .controller import GalvoController
+from .settings import GalvoSettings
 
 VERSION = "0.1.2"
 
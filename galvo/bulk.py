@@ -0,0 +1,189 @@
+"""
+Galvo Bulk
+
+Builds list commands for many positions at once with numpy. Positions are rounded to galvo units, and the distance of
+each move is computed from the position before it. Lines are clipped to the galvo field: a polyline leaving the field is
+marked to its edge, then jumps to where it comes back, and positions outside the field are never moved to.
+"""
+
+import numpy as np
+
+from .consts import listJumpTo, listMarkTo
+
+FIELD = 0xFFFF
+
+
+def _in_field(points):
+    return np.all((points >= 0) & (points <= FIELD), axis=-1)
+
+
+def _clip(starts, ends):
+    """
+    Clips lines to the field, Liang-Barsky for all lines at once.
+
+    @param starts: (N, 2) float positions.
+    @param ends: (N, 2) float positions.
+    @return: whether each line crosses the field, parameters of the line where the clipped line starts and ends.
+    """
+    count = starts.shape[0]
+    t0 = np.zeros(count)
+    t1 = np.ones(count)
+    crosses = np.ones(count, dtype=bool)
+    delta = ends - starts
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for axis in (0, 1):
+            d = delta[:, axis]
+            s = starts[:, axis]
+            parallel = d == 0
+            crosses &= ~parallel | ((s >= 0) & (s <= FIELD))
+            low = -s / d
+            high = (FIELD - s) / d
+            t0 = np.maximum(t0, np.where(parallel, 0.0, np.where(d > 0, low, high)))
+            t1 = np.minimum(t1, np.where(parallel, 1.0, np.where(d > 0, high, low)))
+    crosses &= t0 <= t1
+    return crosses, t0, t1
+
+
+def _clipped_position(starts, ends, t):
+    positions = np.rint(starts + t[:, None] * (ends - starts))
+    return np.clip(positions, 0, FIELD).astype(np.int64)
+
+
+def _move_words(opcodes, points, last_x, last_y):
+    """
+    Jump or mark words moving through points.
+
+    @param opcodes: opcode of each move.
+    @param points: (N, 2) integer positions.
+    @param last_x: x position before the first move.
+    @param last_y: y position before the first move.
+    @return: (N, 6) uint16 words.
+    """
+    count = points.shape[0]
+    xs = np.empty(count + 1, dtype=np.float64)
+    ys = np.empty(count + 1, dtype=np.float64)
+    xs[0] = last_x
+    ys[0] = last_y
+    xs[1:] = points[:, 0]
+    ys[1:] = points[:, 1]
+    words = np.zeros((count, 6), dtype=np.uint16)
+    words[:, 0] = opcodes
+    words[:, 1] = points[:, 0]
+    words[:, 2] = points[:, 1]
+    words[:, 4] = np.minimum(np.hypot(np.diff(xs), np.diff(ys)), 0xFFFF)
+    return words
+
+
+def segment_words(segments, last_x, last_y):
+    """
+    List commands marking each segment, jumping to its start unless already there.
+
+    @param segments: (N, 2, 2) array of start and end positions.
+    @param last_x: x position before the first segment.
+    @param last_y: y position before the first segment.
+    @return: (M, 6) uint16 words.
+    """
+    segments = np.rint(np.asarray(segments, dtype=np.float64).reshape(-1, 2, 2))
+    crosses, t0, t1 = _clip(segments[:, 0], segments[:, 1])
+    segments = segments[crosses]
+    starts = _clipped_position(segments[:, 0], segments[:, 1], t0[crosses])
+    ends = _clipped_position(segments[:, 0], segments[:, 1], t1[crosses])
+    segments = np.stack((starts, ends), axis=1)
+    segments = segments[np.any(segments[:, 0] != segments[:, 1], axis=1)]
+    count = segments.shape[0]
+    if not count:
+        return np.zeros((0, 6), dtype=np.uint16)
+    points = segments.reshape(-1, 2)
+    opcodes = np.empty(2 * count, dtype=np.uint16)
+    opcodes[0::2] = listJumpTo
+    opcodes[1::2] = listMarkTo
+    words = _move_words(opcodes, points, last_x, last_y)
+    # Jumps to where we already are are not performed.
+    keep = np.ones(2 * count, dtype=bool)
+    previous = np.empty((count, 2), dtype=np.int64)
+    previous[0] = (last_x, last_y)
+    previous[1:] = segments[:-1, 1]
+    keep[0::2] = np.any(segments[:, 0] != previous, axis=1)
+    return words[keep]
+
+
+def _polyline_moves(points, paths):
+    """
+    Moves of polylines given concatenated, clipped to the field. A line leaving the field is marked to its edge, and
+    the next line inside the field is jumped to.
+
+    @param points: (N, 2) float positions, rounded.
+    @param paths: (N,) polyline of each position.
+    @return: opcodes, (M, 2) integer positions.
+    """
+    count = points.shape[0]
+    # Positions alone in their polyline are jumped to, if in the field.
+    alone = np.ones(count, dtype=bool)
+    same = paths[1:] == paths[:-1]
+    alone[1:] &= ~same
+    alone[:-1] &= ~same
+    alone &= _in_field(points)
+    lines = np.flatnonzero(same)
+    crosses, t0, t1 = _clip(points[lines], points[lines + 1])
+    # A line continues the line before it if both are whole up to the position they share.
+    follows = np.zeros(lines.shape[0], dtype=bool)
+    follows[1:] = (lines[1:] == lines[:-1] + 1) & crosses[:-1] & (t1[:-1] == 1)
+    follows &= t0 == 0
+    lines, t0, t1, follows = lines[crosses], t0[crosses], t1[crosses], follows[crosses]
+    starts = _clipped_position(points[lines], points[lines + 1], t0)
+    ends = _clipped_position(points[lines], points[lines + 1], t1)
+    jumps = ~follows
+
+    # Ordered by the position each move starts from, a jump before the mark from there.
+    keys = np.concatenate((2 * np.flatnonzero(alone), 2 * lines[jumps], 2 * lines + 1))
+    opcodes = np.concatenate(
+        (
+            np.full(np.count_nonzero(alone), listJumpTo, dtype=np.uint16),
+            np.full(np.count_nonzero(jumps), listJumpTo, dtype=np.uint16),
+            np.full(lines.shape[0], listMarkTo, dtype=np.uint16),
+        )
+    )
+    moves = np.concatenate((points[alone].astype(np.int64), starts[jumps], ends))
+    order = np.argsort(keys, kind="stable")
+    return opcodes[order], moves[order]
+
+
+def _moves_words(opcodes, points, last_x, last_y):
+    if not points.shape[0]:
+        return np.zeros((0, 6), dtype=np.uint16)
+    # Moves to where we already are are not performed.
+    previous = np.empty_like(points)
+    previous[0] = (last_x, last_y)
+    previous[1:] = points[:-1]
+    keep = np.any(points != previous, axis=1)
+    return _move_words(opcodes, points, last_x, last_y)[keep]
+
+
+def polyline_words(points, last_x, last_y):
+    """
+    List commands jumping to the first point and marking through the rest, clipped to the field.
+
+    @param points: (N, 2) array of positions.
+    @param last_x: x position before the polyline.
+    @param last_y: y position before the polyline.
+    @return: (M, 6) uint16 words.
+    """
+    points = np.rint(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+    opcodes, moves = _polyline_moves(points, np.zeros(points.shape[0], dtype=np.int64))
+    return _moves_words(opcodes, moves, last_x, last_y)
+
+
+def polylines_words(points, lengths, last_x, last_y):
+    """
+    List commands of polyline_words() for each of many polylines, given concatenated.
+
+    @param points: (N, 2) array of the positions of all polylines.
+    @param lengths: number of positions of each polyline, summing to N.
+    @param last_x: x position before the first polyline.
+    @param last_y: y position before the first polyline.
+    @return: (M, 6) uint16 words.
+    """
+    points = np.rint(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+    paths = np.repeat(np.arange(len(lengths)), lengths)
+    opcodes, moves = _polyline_moves(points, paths)
+    return _moves_words(opcodes, moves, last_x, last_y)
@@ -0,0 +1,102 @@
+"""
+Galvo Capture
+
+A captured list holds list commands built once and written many times, such as a preview outline cycled while lighting
+or the static part of a job repeated per part. The commands are kept packed and unpadded, so they may be appended to
+the list at any position without ending the current packet. The list state before and after the commands is kept so
+that writing them leaves the controller believing what the board has been told.
+"""
+
+from .consts import listJumpTo, listMarkTo, listWritePort
+
+# Controller attributes describing what the board has been told by the list so far.
+LIST_STATE = (
+    "_last_x",
+    "_last_y",
+    "_port_bits",
+    "_ready",
+    "_speed",
+    "_travel_speed",
+    "_frequency",
+    "_fpk",
+    "_power",
+    "_pulse_width",
+    "_delay_jump",
+    "_delay_on",
+    "_delay_off",
+    "_delay_poly",
+    "_delay_end",
+)
+
+# The parameters of the list state, cleared before capturing so captured commands set every parameter they use.
+LIST_PARAMETERS = LIST_STATE[3:]
+
+
+class CapturedList:
+    __slots__ = ("data", "start", "end", "_starts_with_mark", "_writes_ports")
+
+    def __init__(self, start=None):
+        self.data = bytearray()
+        self.start = start
+        self.end = None
+        self._starts_with_mark = None
+        self._writes_ports = None
+
+    def __len__(self):
+        """
+        Number of captured commands.
+        """
+        return len(self.data) // 12
+
+    def __bytes__(self):
+        return bytes(self.data)
+
+    def __eq__(self, other):
+        if not isinstance(other, CapturedList):
+            return NotImplemented
+        return self.data == other.data
+
+    def _scan(self):
+        data = self.data
+        self._starts_with_mark = None
+        self._writes_ports = False
+        for i in range(0, len(data), 12):
+            opcode = data[i] | data[i + 1] << 8
+            if self._starts_with_mark is None and (
+                opcode == listJumpTo or opcode == listMarkTo
+            ):
+                self._starts_with_mark = opcode == listMarkTo
+            elif opcode == listWritePort:
+                self._writes_ports = True
+        self._starts_with_mark = bool(self._starts_with_mark)
+
+    @property
+    def starts_with_mark(self):
+        """
+        Whether the first move of the captured commands is a mark, which must start from where it was captured.
+        """
+        if self._starts_with_mark is None:
+            self._scan()
+        return self._starts_with_mark
+
+    @property
+    def writes_ports(self):
+        """
+        Whether the captured commands write the ports, so depend on the ports they were captured with.
+        """
+        if self._writes_ports is None:
+            self._scan()
+        return self._writes_ports
+
+    def packets(self, padding=b"\x02\x80" + bytes(10)):
+        """
+        Captured commands split into whole list packets, the last padded with end of list commands.
+
+        @param padding: command filling the remainder of the last packet.
+        @return: list of 0xC00 byte packets.
+        """
+        data = bytes(self.data)
+        remainder = len(data) % 0xC00
+        if remainder or not data:
+            data += padding * ((0xC00 - remainder) // 12)
+        return [data[i : i + 0xC00] for i in range(0, len(data), 0xC00)]
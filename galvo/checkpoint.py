@@ -0,0 +1,374 @@
+"""
+Galvo Checkpoint
+
+A checkpoint journals the lists of a job as they are sent: the state each list started from, a digest of every
+list packet, and how many packets the board confirmed executed. Should the connection fail mid-job, running the job
+again resumes it. The lists and packets the board already executed are built again, checked against the journal and
+not sent. The first packet not confirmed executed is preceded by a packet restoring what the executed packets left
+set, the last value of each parameter and the position, and the job continues from there.
+
+Jobs must build the same lists when run again, which they do given the same state, the list state and settings. A job
+building other lists raises ValueError where it differs, before anything it built is sent. Packets executed but not yet
+confirmed when the connection failed are marked again; the max_inflight_packets setting bounds how many those can be.
+
+A job spans the lists built from `begin()`, which the spooler calls before running each job, to the next `begin()`.
+Without it, a job is a single list.
+
+The journal is kept in memory, and appended to a file when given a path, so that a job may be resumed by another
+process. Each line of the file is a record: `S` and the state as json when a list starts, `L` and the crc32 of
+each list packet sent, `E` and the packets of the list confirmed executed, and `D` when the list is done.
+"""
+
+import json
+import os
+import struct
+import zlib
+
+from .consts import (
+    listEnableWeldPowerWave,
+    listFiberOpenMO,
+    listFiberYLPMPulseWidth,
+    listFlyDelay,
+    listFlyEnable,
+    listJumpDelay,
+    listJumpSpeed,
+    listJumpTo,
+    listLaserOffDelay,
+    listLaserOnDelay,
+    listMarkCurrent,
+    listMarkFreq,
+    listMarkFreq2,
+    listMarkPowerRatio,
+    listMarkSpeed,
+    listMarkTo,
+    listPolygonDelay,
+    listQSwitchPeriod,
+    listReadyMark,
+    listSetCo2FPK,
+    listSetDaZWord,
+    listSetWeldPowerWave,
+    listWritePort,
+)
+
+MAGIC = "galvocheckpoint1"
+
+# List commands setting a parameter which holds until set again, restored before resuming a list.
+PARAMETERS = frozenset(
+    (
+        listReadyMark,
+        listWritePort,
+        listFiberOpenMO,
+        listJumpSpeed,
+        listMarkSpeed,
+        listLaserOnDelay,
+        listLaserOffDelay,
+        listPolygonDelay,
+        listJumpDelay,
+        listFlyDelay,
+        listFlyEnable,
+        listMarkFreq,
+        listMarkFreq2,
+        listQSwitchPeriod,
+        listMarkPowerRatio,
+        listMarkCurrent,
+        listSetCo2FPK,
+        listFiberYLPMPulseWidth,
+        listSetWeldPowerWave,
+        listEnableWeldPowerWave,
+        listSetDaZWord,
+    )
+)
+
+_COMMAND = struct.Struct("<6H")
+
+
+def _digest(packet):
+    return f"{zlib.crc32(packet):08x}"
+
+
+class JournaledList:
+    __slots__ = ("state", "digests", "executed", "done")
+
+    def __init__(self, state, digests=None, executed=0, done=False):
+        self.state = state
+        self.digests = [] if digests is None else digests
+        self.executed = executed
+        self.done = done
+
+
+class _Restore:
+    """
+    Parameters and position left by the list packets built again while resuming.
+    """
+
+    def __init__(self):
+        self.parameters = {}
+        self.position = None
+
+    def add(self, packet):
+        parameters = self.parameters
+        for command in _COMMAND.iter_unpack(packet):
+            opcode = command[0]
+            if opcode in PARAMETERS:
+                # Kept in the order last set.
+                parameters.pop(opcode, None)
+                parameters[opcode] = command
+            elif opcode == listJumpTo or opcode == listMarkTo:
+                self.position = command[1], command[2]
+
+    def commands(self):
+        data = b"".join(_COMMAND.pack(*command) for command in self.parameters.values())
+        if self.position is not None:
+            # Jumps with the laser off to where marking stopped, as a long jump.
+            data += _COMMAND.pack(listJumpTo, *self.position, 0, 0xFFFF, 0)
+        return data
+
+
+class Checkpoint:
+    def __init__(self, path=None):
+        """
+        @param path: journal file, loaded if it exists. None keeps the journal in memory only.
+        """
+        self.path = path
+        self.lists = []
+        self._file = None
+        self._in_job = False
+        # Index of the next journaled list built again, while resuming.
+        self._resuming = None
+        self._list = None
+        self._skip = 0
+        self._skipped = 0
+        self._restore = None
+        self._offset = 0
+
+        self.resumes = 0
+        self.packets_skipped = 0
+        if path is not None and os.path.exists(path):
+            self.lists = list(self._read(path))
+
+    @staticmethod
+    def _read(path):
+        current = None
+        with open(path) as fp:
+            if fp.readline().strip() != MAGIC:
+                raise ValueError(f"{path} is not a galvo checkpoint.")
+            for line in fp:
+                record, _, value = line.rstrip("\n").partition(" ")
+                if record == "S":
+                    if current is not None:
+                        yield current
+                    current = JournaledList(json.loads(value))
+                elif current is None:
+                    raise ValueError(f"{path} has a record outside of a list.")
+                elif record == "L":
+                    current.digests.append(value)
+                elif record == "E":
+                    current.executed = int(value)
+                elif record == "D":
+                    current.done = True
+                else:
+                    raise ValueError(f"{path} has an unknown record {record!r}.")
+        if current is not None:
+            yield current
+
+    def _write(self, line):
+        if self.path is None:
+            return
+        if self._file is None:
+            new = not os.path.exists(self.path)
+            self._file = open(self.path, "a")
+            if new:
+                self._file.write(MAGIC + "\n")
+        self._file.write(line + "\n")
+        self._file.flush()
+
+    def _rewrite(self):
+        if self.path is None:
+            return
+        self.close()
+        lines = [MAGIC]
+        for journaled in self.lists:
+            lines.append("S " + json.dumps(journaled.state))
+            lines.extend("L " + digest for digest in journaled.digests)
+            if journaled.executed:
+                lines.append(f"E {journaled.executed}")
+            if journaled.done:
+                lines.append("D")
+        temp = self.path + ".tmp"
+        with open(temp, "w") as fp:
+            fp.write("\n".join(lines) + "\n")
+        os.replace(temp, self.path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def clear(self):
+        """
+        Discards the journal, so the next job is not resumed.
+
+        @return:
+        """
+        self.close()
+        self.lists = []
+        self._in_job = False
+        self._resuming = None
+        self._list = None
+        self._skip = 0
+        self._restore = None
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def begin(self):
+        """
+        A job starts. Its lists are journaled, or if the journal was interrupted, the job is resumed.
+
+        @return:
+        """
+        if not self.interrupted:
+            self.clear()
+        self._in_job = True
+
+    @property
+    def interrupted(self):
+        """
+        Whether a list of the journal was not done, so that the job is resumed when run again.
+        """
+        return any(not journaled.done for journaled in self.lists)
+
+    @property
+    def resuming(self):
+        return self._resuming is not None
+
+    #######################
+    # CONTROLLER HOOKS
+    #######################
+
+    def list_started(self, state):
+        """
+        A list starts from the state.
+
+        @param state: json serializable state the list is built from.
+        @return: state to build the list from, that of the journaled list when resuming, None otherwise.
+        """
+        if self._resuming is None and self.interrupted:
+            self._resuming = 0
+            self.resumes += 1
+        if self._resuming is not None:
+            journaled = self.lists[self._resuming]
+            self._resuming += 1
+            self._list = journaled
+            self._skipped = 0
+            self._restore = _Restore()
+            if journaled.done:
+                self._skip = len(journaled.digests)
+            else:
+                self._skip = journaled.executed
+                # Packets after those executed are sent again.
+                del journaled.digests[journaled.executed :]
+                self._rewrite()
+            self._offset = 0
+            return journaled.state
+        if not self._in_job and self.lists and not self.interrupted:
+            # The last list finished, a new one starts.
+            self.clear()
+        self._list = JournaledList(state)
+        self._offset = 0
+        self.lists.append(self._list)
+        self._write("S " + json.dumps(state))
+        return None
+
+    def packet(self, packet):
+        """
+        A list packet is built.
+
+        @param packet: list packet.
+        @return: whether the packet is sent, False if the board already executed it.
+        """
+        journaled = self._list
+        if journaled is None or self._skipped >= self._skip:
+            return True
+        index = self._skipped
+        if journaled.digests[index] != _digest(packet):
+            message = f"The job differs from the checkpoint at packet {index} of list {self._resuming - 1}."
+            # The journal is kept, for the job it belongs to.
+            self._list = None
+            self._resuming = None
+            self._restore = None
+            self._skip = self._skipped = 0
+            raise ValueError(message)
+        self._restore.add(packet)
+        self._skipped += 1
+        self.packets_skipped += 1
+        return False
+
+    def restore(self):
+        """
+        Commands restoring the parameters and position before the first list packet sent when resuming a list.
+
+        @return: packed list commands, None if no packets were skipped.
+        """
+        journaled = self._list
+        if journaled is None or journaled.done or not self._skipped:
+            return None
+        restore = self._restore.commands()
+        # The board counts the restore packet executed, where the journal counts the packets skipped.
+        self._offset = self._skipped - 1
+        self._restore = None
+        self._skipped = self._skip = 0
+        return restore
+
+    def sent(self, packet):
+        """
+        A list packet is sent.
+
+        @param packet: list packet.
+        @return:
+        """
+        if self._list is None:
+            return
+        self._list.digests.append(_digest(packet))
+        self._write("L " + self._list.digests[-1])
+
+    def confirm(self, executed):
+        """
+        The board executed packets of the list.
+
+        @param executed: list packets the board executed.
+        @return:
+        """
+        journaled = self._list
+        if journaled is None:
+            return
+        executed = min(max(executed + self._offset, journaled.executed), len(journaled.digests))
+        if executed != journaled.executed:
+            journaled.executed = executed
+            self._write(f"E {executed}")
+
+    def list_done(self):
+        """
+        The list was executed, or aborted.
+
+        @return:
+        """
+        journaled = self._list
+        if journaled is None:
+            return
+        if not journaled.done:
+            journaled.executed = len(journaled.digests)
+            journaled.done = True
+            self._write("D")
+        self._list = None
+        self._offset = 0
+        if self._resuming is not None and self._resuming >= len(self.lists):
+            self._resuming = None
+
+    def stats(self):
+        return {
+            "lists": len(self.lists),
+            "packets": sum(len(journaled.digests) for journaled in self.lists),
+            "executed": sum(journaled.executed for journaled in self.lists),
+            "resumes": self.resumes,
+            "packets_skipped": self.packets_skipped,
+        }
@@ -0,0 +1,65 @@
+"""
+Galvo Connections
+
+Registry of the connection backends a controller may connect with. Backends are registered by name as a
+"module:Class" string and are only imported when first used, so that importing galvo does not import pyusb, and works
+without libusb installed when only mock, recorded or simulated connections are used.
+"""
+
+import importlib
+
+_backends = {
+    "usb": "galvo.usb_connection:USBConnection",
+    "mock": "galvo.mock_connection:MockConnection",
+    "recorder": "galvo.recorder_connection:RecorderConnection",
+    "simulated": "galvo.simulated_connection:SimulatedConnection",
+    "file": "galvo.file_connection:FileConnection",
+    "ring": "galvo.ring_connection:RingConnection",
+}
+
+
+def register_connection(name, backend):
+    """
+    Registers a connection backend.
+
+    @param name: name of the backend, as given to the backend setting.
+    @param backend: connection class or factory, given the log channel, or a "module:Class" string imported when used.
+    @return:
+    """
+    _backends[name] = backend
+
+
+def connection_backends():
+    return sorted(_backends)
+
+
+def get_connection_class(name):
+    """
+    Connection class or factory of a backend, importing it if needed.
+
+    @param name: name of the backend.
+    @return:
+    """
+    try:
+        backend = _backends[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown connection backend {name!r}, one of {connection_backends()}"
+        ) from None
+    if isinstance(backend, str):
+        module, attr = backend.split(":")
+        backend = getattr(importlib.import_module(module), attr)
+        _backends[name] = backend
+    return backend
+
+
+def create_connection(name, channel=None, **kwargs):
+    """
+    Creates a connection of a backend.
+
+    @param name: name of the backend.
+    @param channel: log function of the connection.
+    @param kwargs: options of the backend, such as the path of the file backend.
+    @return: connection
+    """
+    return get_connection_class(name)(channel, **kwargs)
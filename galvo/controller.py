@@ -5,15 +5,20 @@ The balor controller takes low level lmc galvo commands and converts them into l
 to the hardware controller as both spooled and realtime commands.
 """
 
+import math
 import struct
 import threading
 import time
 from contextlib import contextmanager
 from copy import copy
+from operator import attrgetter
 
+from .capture import LIST_PARAMETERS, LIST_STATE, CapturedList
+from .connections import create_connection
 from .consts import *
-from .mock_connection import MockConnection
-from .usb_connection import USBConnection
+from .input_monitor import InputMonitor
+from .pen import Pen
+from .settings import SCHEMA, GalvoSettings
 
 BUSY = 0x04
 READY = 0x20
@@ -21,6 +26,9 @@ AXIS = 0x40
 
 nop = [0x02, 0x80, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
 empty = bytearray(nop * 0x100)
+# A delay of no time, padding a packet sent before the list ends, as the end of list padding would end it there.
+delay_nop = [0x04, 0x80, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+flush_padding = bytearray(delay_nop * 0x100)
 
 
 class GalvoController:
@@ -78,8 +86,12 @@ class GalvoController:
         delay_jump_long=200.0,
         input_passes_required=3,
         mock=False,
+        backend="usb",
+        backend_path=None,
         machine_index=0,
         usb_log=None,
+        settings=None,
+        profile=None,
     ):
         self._shutdown = False
         self._sending = True
@@ -90,53 +102,67 @@ class GalvoController:
         self._spooler_thread = None
 
         self._list_build_lock = threading.RLock()
-        self.mock = mock
+        self._connection_lock = threading.RLock()
         self.connection = None
-        self.light_pin = light_pin
-        self.footpedal_pin = foot_pin
-        self.laser_pin = 0
-        self.galvos_per_mm = galvos_per_mm
-
-        self.mark_speed = mark_speed
-        self.goto_speed = goto_speed
-        self.light_speed = light_speed
-        self.dark_speed = dark_speed
-        self.travel_speed = travel_speed
-        self.power = power
-        self.fpk = fpk
-        self.frequency = frequency
-
-        self.cor_file = cor_file
-        self.first_pulse_killer = first_pulse_killer
-        self.pwm_pulse_width = pwm_pulse_width
-        self.pwm_half_period = pwm_half_period
-        self.standby_param_1 = standby_p1
-        self.standby_param_2 = standby_p2
-        self.timing_mode = timing_mode
-        self.delay_mode = delay_mode
-        self.laser_mode = laser_mode
-        self.control_mode = control_mode
-        self.fpk_max_voltage = fpk_max_voltage
-        self.fpk_min_voltage = fpk_min_voltage
-        self.fpk_t1 = fpk_t1
-        self.fpk_t2 = fpk_t2
-        self.fly_resolution_1 = fly_resolution_1
-        self.fly_resolution_2 = fly_resolution_2
-        self.fly_resolution_3 = fly_resolution_3
-        self.fly_resolution_4 = fly_resolution_4
-        self.input_passes_required = input_passes_required
-
-        self.pulse_width = pulse_width
-
-        self.delay_laser_on = delay_laser_on
-        self.delay_laser_off = delay_laser_off
-        self.delay_polygon = delay_polygon
-        self.delay_end = delay_end
-        self.delay_open_mo = delay_open_mo
-        self.delay_jump_short = delay_jump_short
-        self.delay_jump_long = delay_jump_long
-
-        self.source = source
+        options = dict(
+            mock=mock,
+            backend=backend,
+            backend_path=backend_path,
+            machine_index=machine_index,
+            source=source,
+            light_pin=light_pin,
+            footpedal_pin=foot_pin,
+            galvos_per_mm=galvos_per_mm,
+            mark_speed=mark_speed,
+            travel_speed=travel_speed,
+            goto_speed=goto_speed,
+            light_speed=light_speed,
+            dark_speed=dark_speed,
+            power=power,
+            fpk=fpk,
+            frequency=frequency,
+            pulse_width=pulse_width,
+            cor_file=cor_file,
+            first_pulse_killer=first_pulse_killer,
+            pwm_pulse_width=pwm_pulse_width,
+            pwm_half_period=pwm_half_period,
+            standby_param_1=standby_p1,
+            standby_param_2=standby_p2,
+            timing_mode=timing_mode,
+            delay_mode=delay_mode,
+            laser_mode=laser_mode,
+            control_mode=control_mode,
+            fpk_max_voltage=fpk_max_voltage,
+            fpk_min_voltage=fpk_min_voltage,
+            fpk_t1=fpk_t1,
+            fpk_t2=fpk_t2,
+            fly_resolution_1=fly_resolution_1,
+            fly_resolution_2=fly_resolution_2,
+            fly_resolution_3=fly_resolution_3,
+            fly_resolution_4=fly_resolution_4,
+            input_passes_required=input_passes_required,
+            delay_laser_on=delay_laser_on,
+            delay_laser_off=delay_laser_off,
+            delay_polygon=delay_polygon,
+            delay_end=delay_end,
+            delay_open_mo=delay_open_mo,
+            delay_jump_short=delay_jump_short,
+            delay_jump_long=delay_jump_long,
+        )
+        if settings is None:
+            settings = GalvoSettings(**options)
+        else:
+            # The controller options default to the default settings, those differing were given.
+            given = [name for name, value in options.items() if value != SCHEMA[name][0]]
+            if given:
+                raise ValueError(f"Settings given along with {', '.join(given)}, set these in the settings instead.")
+            if settings_file is not None:
+                # The settings given may be shared with other controllers, which keep theirs.
+                settings = settings.copy()
+        if settings_file is not None:
+            settings.update(GalvoSettings.read(settings_file, profile, channel=usb_log))
+        self.settings = settings
+        self._pens = {}
 
         # Running attributes
         self._usb_log = usb_log
@@ -145,13 +171,29 @@ class GalvoController:
         self._disable_connect = False
 
         self._port_bits = 0
-        self._machine_index = machine_index
+        self._input_monitor = None
         self.laser_configuration = "initial"
         self._active_list = None
         self._active_index = 0
+        self._capture = None
         self._list_executing = False
         self._number_of_list_packets = 0
+        self._list_status_base = 0
         self.paused = False
+        # Notified when resumed or aborted, waking threads waiting to send list packets.
+        self._pause_condition = threading.Condition()
+        self._pause_start = None
+        self._resume_start = None
+        self._restart_on_resume = False
+        self.pauses = 0
+        self.paused_time = 0.0
+        self.resume_latency = None
+        self.pause_executed = None
+        self.pause_pending = None
+        # Set from abort() until the next list starts, interrupting waits and dropping list packets being built.
+        self._aborted = threading.Event()
+        self.aborts = 0
+        self.abort_latency = None
 
         # Set attributes, these are actively sent to the controller already.
         self._last_x = x
@@ -170,11 +212,24 @@ class GalvoController:
         self._delay_off = None
         self._delay_poly = None
         self._delay_end = None
-        if settings_file is not None:
-            import json
 
-            with open(settings_file, "r") as fp:
-                self.__dict__.update(json.load(fp))
+        self.profiler = None
+        self.checkpoint = None
+        self.transform = None
+
+        # List state statistics.
+        self.parameters_sent = 0
+        self.parameters_saved = 0
+        self.list_state_invalidations = 0
+        # Settings and their conversion changes the retained parameters were converted with.
+        self._conversion_settings = None
+        self._conversions = 0
+
+        # Jump delay statistics, of the current or last job.
+        self._jump_delay_model = None
+        self.jumps = 0
+        self.jump_delay_total = 0
+        self.jump_delay_baseline = 0
 
     #######################
     # SPOOLER MANAGEMENT
@@ -205,6 +260,9 @@ class GalvoController:
             self._spooler_lock.notify_all()
             self._queue.clear()
             self.abort()
+        if self._input_monitor is not None:
+            # A job waiting for inputs returns once the monitor stops.
+            self._input_monitor.stop()
         if self._spooler_thread:
             self._spooler_thread.join()
         if self.is_connected:
@@ -237,10 +295,14 @@ class GalvoController:
             self._current = program
             if self._shutdown:
                 return
+            if self.checkpoint is not None:
+                # A job interrupted by a connection failure is resumed when run again.
+                self.checkpoint.begin()
             try:
                 fully_executed = program(self)
             except ConnectionAbortedError:
                 # Driver could no longer connect to where it was told to send the data.
+                self._spooler_thread = None
                 return
             except ConnectionRefusedError:
                 # Driver connection failed but, we are not giving up.
@@ -290,7 +352,7 @@ class GalvoController:
         """
         if self.connection is None:
             return False
-        return self.connection.is_open(self._machine_index)
+        return self.connection.is_open(self.settings.machine_index)
 
     @property
     def is_connecting(self):
@@ -328,12 +390,19 @@ class GalvoController:
 
     def disconnect(self):
         try:
-            self.connection.close(self._machine_index)
+            self.connection.close(self.settings.machine_index)
         except (ConnectionError, ConnectionRefusedError, AttributeError):
             pass
         self.connection = None
         # Reset error to allow another attempt
         self._disable_connect = False
+        # Whatever list was being sent is lost with the connection.
+        self._list_executing = False
+        self._number_of_list_packets = 0
+        self._active_list = None
+        self._active_index = 0
+        self.laser_configuration = "initial"
+        self.invalidate_list_state()
 
     def connect_if_needed(self):
         if self._disable_connect:
@@ -345,17 +414,21 @@ class GalvoController:
             )
         if self.connection is None:
             if self.mock:
-                self.connection = MockConnection(self.usb_log)
+                self.connection = create_connection("mock", self.usb_log)
                 self.connection.send = print
                 self.connection.recv = print
+            elif self.backend_path is not None:
+                self.connection = create_connection(
+                    self.backend, self.usb_log, path=self.backend_path
+                )
             else:
-                self.connection = USBConnection(self.usb_log)
+                self.connection = create_connection(self.backend, self.usb_log)
         self._is_connecting_to_laser = True
         self._abort_open = False
         count = 0
-        while not self.connection.is_open(self._machine_index):
+        while not self.connection.is_open(self.settings.machine_index):
             try:
-                if self.connection.open(self._machine_index) < 0:
+                if self.connection.open(self.settings.machine_index) < 0:
                     raise ConnectionError
                 self.init_laser()
             except (ConnectionError, ConnectionRefusedError):
@@ -365,8 +438,8 @@ class GalvoController:
                     self._is_connecting_to_laser = False
                     self._abort_open = False
                     return
-                if self.connection.is_open(self._machine_index):
-                    self.connection.close(self._machine_index)
+                if self.connection.is_open(self.settings.machine_index):
+                    self.connection.close(self.settings.machine_index)
                 if count >= 10:
                     # We have failed too many times.
                     self._is_connecting_to_laser = False
@@ -384,22 +457,60 @@ class GalvoController:
     def send(self, data, read=True):
         if not self._sending:
             return -1, -1, -1, -1
-        self.connect_if_needed()
-        try:
-            self.connection.write(self._machine_index, data)
-        except ConnectionError:
-            return -1, -1, -1, -1
-        if read:
+        with self._connection_lock:
+            # Commands may be sent from several threads, a write and its read must not interleave with others.
+            self.connect_if_needed()
             try:
-                r = self.connection.read(self._machine_index)
-                return struct.unpack("<4H", r)
+                self.connection.write(self.settings.machine_index, data)
             except ConnectionError:
                 return -1, -1, -1, -1
+            if read:
+                try:
+                    r = self.connection.read(self.settings.machine_index)
+                    return struct.unpack("<4H", r)
+                except ConnectionError:
+                    return -1, -1, -1, -1
 
     def status(self):
         b0, b1, b2, b3 = self.get_version()
         return b3
 
+    def stream_file(self, path, compression=None):
+        """
+        Streams a job file written by the file backend to the laser. List packets are sent as the board is ready for
+        them, realtime commands as they were sent when the job was generated, after waiting for the list and the axis
+        to finish where the job polled the board. An abort since the last list started, before or during streaming,
+        stops it.
+
+        @param path: job file.
+        @param compression: "gzip", "bz2" or "lzma", None infers the compression from the file name.
+        @return: number of packets sent.
+        """
+        from .file_connection import WAIT, read_job_file
+
+        count = 0
+        for packet in read_job_file(path, compression):
+            if not self._sending or self._aborted.is_set():
+                break
+            if packet is WAIT:
+                self.wait_idle()
+                self.wait_axis()
+                continue
+            if len(packet) == 0xC00:
+                with self._list_build_lock:
+                    self.wait_ready()
+                    if not self._wait_resumed():
+                        break
+                    self.send(packet, False)
+            else:
+                self.send(packet)
+            count += 1
+        # The streamed list ended, so the abort does not drop the lists after it.
+        self._aborted.clear()
+        # The job left the board in a state the controller was not told.
+        self.invalidate_list_state()
+        return count
+
     #######################
     # MODE SHIFTS
     #######################
@@ -425,18 +536,23 @@ class GalvoController:
             return
         self.list_end_of_list()  # Ensure at least one list_end_of_list
         self._list_end()
-        if not self._list_executing and self._number_of_list_packets:
+        if not self._list_executing and self._number_of_list_packets and not self._aborted.is_set():
             # If we never ran the list, and we sent some lists.
             self.execute_list()
         self._list_executing = False
         self._number_of_list_packets = 0
         self.wait_idle()
+        if self.checkpoint is not None:
+            self.checkpoint.list_done()
         if self.source == "fiber":
             self.set_fiber_mo(0)
         self.port_off(bit=self.laser_pin)
         self.write_port()
         marktime = self.get_mark_time()
         self.usb_log(f"Time taken for list execution: {marktime}")
+        if self.jumps:
+            saved = self.jump_delay_baseline - self.jump_delay_total
+            self.usb_log(f"Jump delay saved: {saved}us over {self.jumps} jumps")
         self.laser_configuration = "initial"
 
     def marking_configuration(self):
@@ -450,29 +566,31 @@ class GalvoController:
                 self.set_fiber_mo(1)
         else:
             self.laser_configuration = "marking"
-            self.reset_list()
+            self._aborted.clear()
+            self._reset_jump_delay_stats()
+            self._reset_lists()
+            self._checkpoint_list()
             self.port_on(bit=self.laser_pin)
             self.write_port()
             if self.source == "fiber":
                 self.set_fiber_mo(1)
-            self._ready = None
-            self._speed = None
-            self._travel_speed = None
-            self._frequency = None
-            self._power = None
-            self._pulse_width = None
-
-            self._delay_jump = None
-            self._delay_on = None
-            self._delay_off = None
-            self._delay_poly = None
-            self._delay_end = None
             self.list_ready()
             if self.delay_open_mo and self.source == "fiber":
                 self.list_delay_time(int(self.delay_open_mo * 100))
             self.list_write_port()
         self.set()
 
+    def _reset_lists(self):
+        """
+        Resets the lists of the board to start a new one.
+
+        @return:
+        """
+        if self._number_of_list_packets or self._list_executing:
+            # Lists sent were not fully executed, the board state is unknown.
+            self.invalidate_list_state()
+        self.reset_list()
+
     def lighting_configuration(self):
         if self.laser_configuration == "lighting":
             return
@@ -483,26 +601,329 @@ class GalvoController:
             self.port_on(self.light_pin)
             self.write_port()
         else:
-            self._ready = None
-            self._speed = None
-            self._travel_speed = None
-            self._frequency = None
-            self._power = None
-            self._pulse_width = None
-
-            self._delay_jump = None
-            self._delay_on = None
-            self._delay_off = None
-            self._delay_poly = None
-            self._delay_end = None
-
-            self.reset_list()
+            self._aborted.clear()
+            self._reset_jump_delay_stats()
+            self._reset_lists()
+            self._checkpoint_list()
             self.list_ready()
             self.port_off(self.laser_pin)
             self.port_on(self.light_pin)
             self.list_write_port()
         self.laser_configuration = "lighting"
 
+    #######################
+    # LIST STATE
+    #######################
+
+    def invalidate_list_state(self):
+        """
+        Forget the parameters believed set on the board, so that all parameters are sent again.
+
+        The parameters last sent are retained across lists and mode shifts, since a list which fully executed leaves
+        them set on the board. This is called when that no longer holds: after an abort, a reset of the board, a reset
+        of lists that were sent but not fully executed, or a change of the settings the parameters are converted with.
+
+        @return:
+        """
+        self._ready = None
+        self._speed = None
+        self._travel_speed = None
+        self._frequency = None
+        self._fpk = None
+        self._power = None
+        self._pulse_width = None
+
+        self._delay_jump = None
+        self._delay_on = None
+        self._delay_off = None
+        self._delay_poly = None
+        self._delay_end = None
+        self.list_state_invalidations += 1
+
+    def _check_conversions(self):
+        """
+        Invalidates the list state if the settings the unit conversions depend on changed, or the settings were
+        replaced, since parameters were last converted: the board holds values converted with the old settings.
+
+        @return:
+        """
+        settings = self.settings
+        if settings is self._conversion_settings and settings.conversions == self._conversions:
+            return
+        if self._conversion_settings is not None:
+            self.invalidate_list_state()
+        self._conversion_settings = settings
+        self._conversions = settings.conversions
+
+    @property
+    def list_state_stats(self):
+        """
+        Counts of parameter commands sent and of those not sent because the board already had that value.
+
+        @return:
+        """
+        return {
+            "parameters_sent": self.parameters_sent,
+            "parameters_saved": self.parameters_saved,
+            "invalidations": self.list_state_invalidations,
+        }
+
+    def enable_profiling(self, profiler=None):
+        """
+        Counts the commands sent by opcode, the bytes and packets sent, and the time spent sending and waiting for the
+        board. Without profiling the controller is not instrumented at all.
+
+        @param profiler: `galvo.profiling.Profiler` to count into, a new one by default.
+        @return: Profiler, see snapshot() and prometheus().
+        """
+        from .profiling import Profiler
+
+        self.disable_profiling()
+        if profiler is None:
+            profiler = Profiler()
+        profiler.attach(self)
+        self.profiler = profiler
+        return profiler
+
+    def disable_profiling(self):
+        if self.profiler is not None:
+            self.profiler.detach()
+            self.profiler = None
+
+    def enable_checkpoints(self, checkpoint=None):
+        """
+        Journals the lists sent and how far the board executed them, so that a job interrupted by a connection failure
+        resumes where the board stopped when run again, rather than from the start. This reads the list status for
+        each list packet sent.
+
+        @param checkpoint: `galvo.checkpoint.Checkpoint` to journal into, or a path to journal to, in memory by default.
+        @return: Checkpoint, see stats().
+        """
+        from .checkpoint import Checkpoint
+
+        self.disable_checkpoints()
+        if not isinstance(checkpoint, Checkpoint):
+            checkpoint = Checkpoint(checkpoint)
+        self.checkpoint = checkpoint
+        return checkpoint
+
+    def disable_checkpoints(self):
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+            self.checkpoint = None
+
+    def enable_transform(self, transform=None):
+        """
+        Positions given to the bulk commands, mark_segments(), mark_polyline(), mark_polylines() and hatch(), are in mm
+        and transformed to galvo units, in bulk.
+
+        @param transform: `galvo.transform.Transform`, by default one with the lens scale of the cor_file setting, or
+            of galvos_per_mm without one.
+        @return: Transform, see translate(), rotate(), scale() and stats().
+        """
+        if transform is None:
+            transform = self._default_transform()
+        self.transform = transform
+        return transform
+
+    def _default_transform(self):
+        from .transform import Transform
+
+        cor_file = self.settings.cor_file
+        if cor_file is not None:
+            try:
+                return Transform.from_correction_file(cor_file)
+            except OSError:
+                pass
+        return Transform(self.settings.galvos_per_mm)
+
+    def disable_transform(self):
+        self.transform = None
+
+    def _checkpoint_list(self):
+        """
+        A list starts. When resuming, the list is built from the list state and settings journaled for it, since jobs
+        setting parameters change the settings.
+
+        @return:
+        """
+        if self.checkpoint is None:
+            return
+        state = {"list": self.get_list_state(), "settings": self.settings.to_dict()}
+        state = self.checkpoint.list_started(state)
+        if state is not None:
+            self.settings.update(state["settings"])
+            self.set_list_state(state["list"])
+
+    #######################
+    # CAPTURED LISTS
+    #######################
+
+    def get_list_state(self):
+        return {attr: getattr(self, attr) for attr in LIST_STATE}
+
+    def set_list_state(self, state):
+        for attr, value in state.items():
+            setattr(self, attr, value)
+
+    @contextmanager
+    def capture(self, state=None):
+        """
+        Captures the list commands written within the context, rather than adding them to the list. Realtime commands
+        are still sent. The list state is restored afterwards, as nothing captured was sent.
+
+        By default capturing starts from the current position and ports, with no parameters believed set, so that the
+        captured commands set every parameter they use and may be written anywhere.
+
+        @param state: list state to start capturing from, see get_list_state().
+        @return: CapturedList
+        """
+        with self._list_build_lock:
+            saved = self.get_list_state()
+            if state is None:
+                state = dict(saved)
+                for attr in LIST_PARAMETERS:
+                    state[attr] = None
+            self.set_list_state(state)
+            captured = CapturedList(self.get_list_state())
+            capture = self._capture
+            self._capture = captured.data
+            try:
+                yield captured
+            finally:
+                self._capture = capture
+                captured.end = self.get_list_state()
+                self.set_list_state(saved)
+
+    def capture_repeating(self, draw):
+        """
+        Captures the list commands of draw, to be written repeatedly one after another. If the drawing does not end
+        where it started, it is captured again starting from where it ended, so the distance of the first move and the
+        state of the ports are those at the end of the previous repeat.
+
+        @param draw: function writing list commands, given the controller.
+        @return: CapturedList
+        """
+        with self.capture() as captured:
+            draw(self)
+        start = captured.start
+        end = captured.end
+        if any(start[attr] != end[attr] for attr in ("_last_x", "_last_y", "_port_bits")):
+            state = dict(start)
+            state["_last_x"] = end["_last_x"]
+            state["_last_y"] = end["_last_y"]
+            state["_port_bits"] = end["_port_bits"]
+            with self.capture(state) as captured:
+                draw(self)
+        return captured
+
+    def write_captured(self, captured):
+        """
+        Writes captured list commands into the list, leaving the list state as it was at the end of the capture. If
+        the captured commands write the ports, the ports are first written if they differ from those the capture
+        started from. The galvo is moved if the captured commands start by marking from elsewhere.
+
+        @param captured: CapturedList
+        @return:
+        """
+        with self._list_build_lock:
+            start = captured.start
+            port_bits = self._port_bits
+            if captured.writes_ports and port_bits != start["_port_bits"]:
+                # Captured commands only write the ports they change.
+                self._port_bits = start["_port_bits"]
+                self.list_write_port()
+            if captured.starts_with_mark:
+                # The first mark must start from where it was captured.
+                self.goto(start["_last_x"], start["_last_y"])
+            self._list_write_bytes(captured.data)
+            self.set_list_state(captured.end)
+            if not captured.writes_ports:
+                self._port_bits = port_bits
+
+    def light_preview(self, paths=None, draw=None, abort_on_change=True):
+        """
+        Submits a preview lighting the paths, or the drawing of the draw function, until stopped or removed. The
+        preview is captured once and written again for each frame, it is only rebuilt when updated.
+
+        @param paths: sequence of (N, 2) positions in galvo units, each lit after a dark move to its first point.
+        @param draw: function drawing the preview, given the controller.
+        @param abort_on_change: abort the frames already sent when the preview is updated.
+        @return: LightPreview
+        """
+        from .preview import LightPreview
+
+        preview = LightPreview(paths, draw=draw, abort_on_change=abort_on_change)
+        self.submit(preview)
+        return preview
+
+    def fly_mark(self, draw, parts=None, **kwargs):
+        """
+        Submits on-the-fly marking of parts on a conveyor, the board marking each part as it triggers the part sensor.
+
+        @param draw: function drawing a part, given the controller.
+        @param parts: number of parts to mark, None marks parts until stopped.
+        @param kwargs: further options of `galvo.fly.FlyMarking`.
+        @return: FlyMarking
+        """
+        from .fly import FlyMarking
+
+        job = FlyMarking(draw, parts=parts, **kwargs)
+        self.submit(job)
+        return job
+
+    def mark_repeated(self, draw, count=None, variable=None, values=None, **kwargs):
+        """
+        Submits marking the same part many times. The part is captured once and written for each part, with the
+        variable part drawn for each value if given, such as serial numbers.
+
+        @param draw: function drawing the static part, given the controller.
+        @param count: number of parts, defaults to the number of values.
+        @param variable: function drawing the variable part, given the controller and the value of the part.
+        @param values: values of the parts, given to variable.
+        @param kwargs: further options of `galvo.repeat.RepeatMarking`.
+        @return: RepeatMarking
+        """
+        from .repeat import RepeatMarking
+
+        job = RepeatMarking(draw, count=count, variable=variable, values=values, **kwargs)
+        self.submit(job)
+        return job
+
+    def rotary_mark(self, paths, circumference, steps_per_revolution, **kwargs):
+        """
+        Submits marking unwrapped cylindrical geometry, rotating the axis between bands of the circumference.
+
+        @param paths: sequence of (N, 2) positions in galvo units, y being the distance around the cylinder.
+        @param circumference: circumference of the cylinder in galvo units.
+        @param steps_per_revolution: rotary axis steps per revolution of the cylinder.
+        @param kwargs: further options of `galvo.rotary.RotaryJob`.
+        @return: RotaryJob
+        """
+        from .rotary import RotaryJob
+
+        job = RotaryJob(paths, circumference, steps_per_revolution, **kwargs)
+        self.submit(job)
+        return job
+
+    def preview_outline(self, source, detail="auto", refresh_rate=20.0, tolerance=0.0):
+        """
+        Submits a light preview of the outline of a job.
+
+        @param source: CapturedList, RecorderConnection, an (N, 2) path or a sequence of paths, in galvo units.
+        @param detail: "paths", "hull", "box", or "auto" for the most detailed that can be lit at refresh_rate.
+        @param refresh_rate: frames per second required by "auto".
+        @param tolerance: decimation tolerance of "paths", in galvo units.
+        @return: LightPreview
+        """
+        from .outline import adaptive_outline, outline
+
+        if detail == "auto":
+            paths = adaptive_outline(source, self, refresh_rate)[0]
+        else:
+            paths = outline(source, detail, tolerance)
+        return self.light_preview(paths)
+
     #######################
     # PLOTLIKE SHORTCUTS
     #######################
@@ -521,14 +942,10 @@ class GalvoController:
         if x > 0xFFFF or x < 0 or y > 0xFFFF or y < 0:
             # Moves to out of range are not performed.
             return
-        if long is None:
-            long = self.delay_jump_long
-        if short is None:
-            short = self.delay_jump_short
-        if self.goto_speed is not None:
-            self.set_travel_speed(self.goto_speed)
-        distance = int(abs(complex(x, y) - complex(self._last_x, self._last_y)))
-        delay = long if distance_limit and distance > distance_limit else short
+        settings = self.settings
+        if settings.goto_speed is not None:
+            self.set_travel_speed(settings.goto_speed)
+        delay = self._jump_delay(x, y, long, short, distance_limit)
         if delay:
             self.set_delay_jump(delay)
         self.list_jump(x, y)
@@ -539,15 +956,11 @@ class GalvoController:
         if x > 0xFFFF or x < 0 or y > 0xFFFF or y < 0:
             # Moves to out of range are not performed.
             return
-        if long is None:
-            long = self.delay_jump_long
-        if short is None:
-            short = self.delay_jump_short
+        settings = self.settings
         self.light_on()
-        if self.light_speed is not None:
-            self.set_travel_speed(self.light_speed)
-        distance = int(abs(complex(x, y) - complex(self._last_x, self._last_y)))
-        delay = long if distance_limit and distance > distance_limit else short
+        if settings.light_speed is not None:
+            self.set_travel_speed(settings.light_speed)
+        delay = self._jump_delay(x, y, long, short, distance_limit)
         if delay:
             self.set_delay_jump(delay)
         self.list_jump(x, y)
@@ -558,19 +971,386 @@ class GalvoController:
         if x > 0xFFFF or x < 0 or y > 0xFFFF or y < 0:
             # Moves to out of range are not performed.
             return
-        if long is None:
-            long = self.delay_jump_long
-        if short is None:
-            short = self.delay_jump_short
+        settings = self.settings
         self.light_off()
-        if self.dark_speed is not None:
-            self.set_travel_speed(self.dark_speed)
-        distance = int(abs(complex(x, y) - complex(self._last_x, self._last_y)))
-        delay = long if distance_limit and distance > distance_limit else short
+        if settings.dark_speed is not None:
+            self.set_travel_speed(settings.dark_speed)
+        delay = self._jump_delay(x, y, long, short, distance_limit)
         if delay:
             self.set_delay_jump(delay)
         self.list_jump(x, y)
 
+    #######################
+    # JUMP DELAYS
+    #######################
+
+    @property
+    def jump_delay_model(self):
+        """
+        Model of the jump delay from the distance of each jump, given by the jump_delay_curve setting.
+
+        @return: JumpDelayModel or None if no curve is set.
+        """
+        curve = self.settings.jump_delay_curve
+        if curve is None:
+            return None
+        model = self._jump_delay_model
+        if model is None or model.curve != tuple(sorted(curve)):
+            from .jump_delay import JumpDelayModel
+
+            model = JumpDelayModel(curve)
+            self._jump_delay_model = model
+        return model
+
+    def _jump_delay(self, x, y, long, short, distance_limit):
+        """
+        Jump delay of a jump to x, y. Explicit delays are used if given, otherwise the jump delay model if one is set,
+        otherwise the short delay.
+        """
+        settings = self.settings
+        distance = int(abs(complex(x, y) - complex(self._last_x, self._last_y)))
+        model = None
+        if long is None and short is None and distance_limit is None:
+            model = self.jump_delay_model
+        if model is not None:
+            delay = model.delay(distance)
+        else:
+            if long is None:
+                long = settings.delay_jump_long
+            if short is None:
+                short = settings.delay_jump_short
+            delay = long if distance_limit and distance > distance_limit else short
+        self.jumps += 1
+        self.jump_delay_total += delay or self._delay_jump or 0
+        self.jump_delay_baseline += settings.delay_jump_long or delay or 0
+        return delay
+
+    def _apply_jump_delays(self, words):
+        """
+        Inserts jump delay commands into bulk list commands, wherever the delay of a jump differs from the delay before
+        it. Without a jump delay model the short delay is set before the commands.
+
+        @param words: (N, 6) uint16 array of list commands.
+        @return: (M, 6) uint16 array of list commands.
+        """
+        import numpy as np
+
+        settings = self.settings
+        jumps = np.flatnonzero(words[:, 0] == listJumpTo)
+        count = jumps.shape[0]
+        if not count:
+            return words
+        model = self.jump_delay_model
+        if model is None:
+            if settings.delay_jump_short:
+                self.set_delay_jump(settings.delay_jump_short)
+            delay = self._delay_jump or 0
+            self.jumps += count
+            self.jump_delay_total += delay * count
+            self.jump_delay_baseline += (settings.delay_jump_long or delay) * count
+            return words
+        delays = model.delays(words[jumps, 4])
+        previous = np.empty(count, dtype=np.int64)
+        previous[0] = -1 if self._delay_jump is None else self._delay_jump
+        previous[1:] = delays[:-1]
+        changed = delays != previous
+        changes = int(changed.sum())
+        inserted = np.zeros((changes, 6), dtype=np.uint16)
+        inserted[:, 0] = listJumpDelay
+        inserted[:, 1] = delays[changed]
+        self.parameters_sent += changes
+        self.parameters_saved += count - changes
+        self._delay_jump = int(delays[-1])
+        self.jumps += count
+        self.jump_delay_total += int(delays.sum())
+        self.jump_delay_baseline += (settings.delay_jump_long or 0) * count
+        return np.insert(words, jumps[changed], inserted, axis=0)
+
+    @property
+    def jump_delay_stats(self):
+        """
+        Jump delays of the current or last job, in microseconds. The baseline is the delay had every jump waited the
+        long jump delay, saved is the difference.
+
+        @return:
+        """
+        return {
+            "jumps": self.jumps,
+            "delay": self.jump_delay_total,
+            "baseline": self.jump_delay_baseline,
+            "saved": self.jump_delay_baseline - self.jump_delay_total,
+        }
+
+    def _reset_jump_delay_stats(self):
+        self.jumps = 0
+        self.jump_delay_total = 0
+        self.jump_delay_baseline = 0
+
+    def mark_segments(self, segments):
+        """
+        Marks each segment, jumping to its start unless already there. The list commands are built in bulk.
+
+        @param segments: (N, 2, 2) array-like of start and end positions in galvo units, or mm with a transform.
+        @return:
+        """
+        from .bulk import segment_words
+
+        if self.transform is not None:
+            segments = self.transform(segments)
+        self._list_write_moves(segment_words(segments, self._last_x, self._last_y))
+
+    def mark_polyline(self, points):
+        """
+        Jumps to the first point and marks through the rest. The list commands are built in bulk.
+
+        @param points: (N, 2) array-like of positions in galvo units, or mm with a transform.
+        @return:
+        """
+        if self.transform is not None:
+            points = self.transform(points)
+        self._mark_polyline(points)
+
+    def _mark_polyline(self, points):
+        """
+        mark_polyline() of positions in galvo units, whether or not there is a transform.
+        """
+        from .bulk import polyline_words
+
+        self._list_write_moves(polyline_words(points, self._last_x, self._last_y))
+
+    def _curve_tolerance(self, tolerance):
+        """
+        Tolerance in galvo units, in the units of positions given: mm with a transform.
+        """
+        if self.transform is not None:
+            return self.transform.tolerance(tolerance)
+        return tolerance
+
+    def mark_circle(self, cx, cy, radius, tolerance=0.5):
+        """
+        Marks a circle, from angle 0 around to it again, flattened with `galvo.curves`.
+
+        @param cx: center x in galvo units, or mm with a transform.
+        @param cy: center y in galvo units, or mm with a transform.
+        @param radius: radius in galvo units, or mm with a transform.
+        @param tolerance: largest distance of the marks from the circle in galvo units.
+        @return:
+        """
+        from .curves import circle
+
+        self.mark_polyline(circle(cx, cy, radius, self._curve_tolerance(tolerance)))
+
+    def mark_arc(self, cx, cy, radius, start, sweep, tolerance=0.5):
+        """
+        Marks a circular arc, flattened with `galvo.curves`.
+
+        @param cx: center x in galvo units, or mm with a transform.
+        @param cy: center y in galvo units, or mm with a transform.
+        @param radius: radius in galvo units, or mm with a transform.
+        @param start: angle of the start, in degrees from x towards y.
+        @param sweep: signed angle swept, in degrees.
+        @param tolerance: largest distance of the marks from the arc in galvo units.
+        @return:
+        """
+        from .curves import arc
+
+        self.mark_polyline(
+            arc(
+                cx,
+                cy,
+                radius,
+                math.radians(start),
+                math.radians(sweep),
+                self._curve_tolerance(tolerance),
+            )
+        )
+
+    def mark_ellipse(self, cx, cy, rx, ry, rotation=0.0, tolerance=0.5):
+        """
+        Marks an ellipse, flattened with `galvo.curves`.
+
+        @param cx: center x in galvo units, or mm with a transform.
+        @param cy: center y in galvo units, or mm with a transform.
+        @param rx: radius along the x axis of the ellipse.
+        @param ry: radius along the y axis of the ellipse.
+        @param rotation: rotation of the x axis of the ellipse, in degrees.
+        @param tolerance: largest distance of the marks from the ellipse in galvo units.
+        @return:
+        """
+        from .curves import ellipse
+
+        self.mark_polyline(
+            ellipse(
+                cx,
+                cy,
+                rx,
+                ry,
+                math.radians(rotation),
+                tolerance=self._curve_tolerance(tolerance),
+            )
+        )
+
+    def mark_bezier(self, *points, tolerance=0.5):
+        """
+        Marks a quadratic or cubic Bézier curve, flattened with `galvo.curves`.
+
+        @param points: 3 or 4 control points, x, y in galvo units, or mm with a transform.
+        @param tolerance: largest distance of the marks from the curve in galvo units.
+        @return:
+        """
+        from .curves import bezier
+
+        self.mark_polyline(bezier(points, self._curve_tolerance(tolerance)))
+
+    def mark_file(self, source, file_format=None, tolerance=None, batch_points=4096):
+        """
+        Marks the paths of an svg or dxf file as the file is parsed, so that a large file starts marking before it is
+        read. Positions in the file are in mm, transformed by the transform, or by the lens scale without one.
+
+        @param source: file name or file object, binary for svg.
+        @param file_format: "svg" or "dxf", None infers it from the file name.
+        @param tolerance: largest distance of the marks from the curves of the file in mm, by default half a galvo
+            unit.
+        @param batch_points: paths are written into the list in batches of about this many points.
+        @return: number of paths marked.
+        """
+        import numpy as np
+
+        from .bulk import polylines_words
+        from .ingest import read_paths
+
+        transform = self.transform
+        if transform is None:
+            transform = self._default_transform()
+        if tolerance is None:
+            tolerance = transform.tolerance(0.5)
+        count = 0
+        paths = []
+        points = 0
+
+        def write():
+            words = polylines_words(
+                transform(np.concatenate(paths)),
+                [len(path) for path in paths],
+                self._last_x,
+                self._last_y,
+            )
+            if words.shape[0]:
+                self._list_write_moves(words)
+
+        for path in read_paths(source, tolerance, file_format):
+            count += 1
+            paths.append(path)
+            points += len(path)
+            if points >= batch_points:
+                write()
+                paths = []
+                points = 0
+        if paths:
+            write()
+        return count
+
+    def mark_polylines(self, paths, farm=None):
+        """
+        Marks each path with mark_polyline(), compiled by the worker processes of the compile farm if given.
+
+        @param paths: sequence of (N, 2) array-like positions in galvo units, or mm with a transform.
+        @param farm: `galvo.farm.CompileFarm`, the commands are identical either way.
+        @return:
+        """
+        if farm is not None:
+            farm.mark_polylines(self, paths)
+            return
+        for path in paths:
+            self.mark_polyline(path)
+
+    def hatch(
+        self,
+        polygons,
+        spacing=0.1,
+        angle=0.0,
+        passes=1,
+        angle_step=90.0,
+        bidirectional=True,
+    ):
+        """
+        Fills closed polygons with hatch lines.
+
+        @param polygons: a ring, or a sequence of shapes each being a ring or a sequence of rings (holes), in galvo
+            units, or mm with a transform. Rings are (N, 2) array-like.
+        @param spacing: distance between hatch lines in mm.
+        @param angle: angle of the first pass, in degrees.
+        @param passes: number of passes.
+        @param angle_step: angle between passes, in degrees.
+        @param bidirectional: alternate the direction of each hatch line.
+        @return:
+        """
+        from .hatch import hatch
+
+        if self.transform is not None:
+            # Hatched in mm, so that the spacing holds however the polygons are transformed.
+            self.mark_segments(
+                hatch(
+                    polygons,
+                    spacing,
+                    angle=angle,
+                    passes=passes,
+                    angle_step=angle_step,
+                    bidirectional=bidirectional,
+                )
+            )
+            return
+        segments = hatch(
+            polygons,
+            spacing * abs(self.settings.galvos_per_mm),
+            angle=angle,
+            passes=passes,
+            angle_step=angle_step,
+            bidirectional=bidirectional,
+        )
+        self.mark_segments(segments)
+
+    def _list_write_moves(self, words):
+        """
+        Writes bulk jump and mark commands, with the travel speed and jump delays of goto().
+
+        @param words: (N, 6) uint16 array of jump and mark commands.
+        @return:
+        """
+        if not words.shape[0]:
+            return
+        settings = self.settings
+        if settings.goto_speed is not None:
+            self.set_travel_speed(settings.goto_speed)
+        self._list_write_words(words)
+
+    def _list_write_words(self, words):
+        """
+        Writes bulk list commands ending with a move, with the jump delay of each jump.
+
+        @param words: (N, 6) uint16 array of list commands.
+        @return:
+        """
+        words = self._apply_jump_delays(words)
+        self._list_write_bytes(words.astype("<u2", copy=False).tobytes())
+        self._last_x = int(words[-1, 1])
+        self._last_y = int(words[-1, 2])
+
+    def raster(self, image, x=0x8000, y=0x8000, pixel_size=1.0, **kwargs):
+        """
+        Engraves a 2D image, streaming it into the list one row at a time.
+
+        @param image: 2D numpy array, bool or values 0-255.
+        @param x: x position of the first pixel of each row, in galvo units.
+        @param y: y position of the first row, in galvo units.
+        @param pixel_size: distance between pixels in galvo units.
+        @param kwargs: further options of `galvo.raster.Raster`.
+        @return:
+        """
+        from .raster import Raster
+
+        Raster(image, x=x, y=y, pixel_size=pixel_size, **kwargs)(self)
+
     def dwell(self, time_in_ms, delay_end=True):
         dwell_time = time_in_ms * 100  # Dwell time in ms units in 10 us
         while dwell_time > 0:
@@ -588,34 +1368,51 @@ class GalvoController:
             dwell_time -= d
 
     def wait_for_input(self, mask, value):
+        """
+        Waits for the masked inputs to match value, then shifts to marking.
+
+        @param mask: input bits to wait for.
+        @param value: values of the masked bits to wait for.
+        @return: whether the inputs matched, if not the wait was ended by a shutdown or an abort and marking is not
+            resumed.
+        """
         self.initial_configuration()
-        self._wait_for_input_protocol(mask, value)
+        if not self._wait_for_input_protocol(mask, value):
+            return False
         self.marking_configuration()
+        return True
 
     def _wait_for_input_protocol(self, input_mask, input_value):
-        required_passes = self.input_passes_required
+        monitor = self._input_monitor
+        if monitor is not None and monitor.is_running:
+            return monitor.wait_for(input_mask, input_value)
+        required_passes = self.settings.input_passes_required
         passes = 0
-        while (
-            self.connection and not self.connection.is_shutdown and not self._aborting
-        ):
-            read_port = self.connection.read_port()
-            b = read_port[1]
-            all_matched = True
-            for i in range(16):
-                if (input_mask >> i) & 1 == 0:
-                    continue  # We don't care about this mask.
-                if (input_value >> i) & 1 != (b >> i) & 1:
-                    all_matched = False
-                    time.sleep(0.05)
-                    break
-
-            if all_matched:
+        aborts = self.aborts
+        while self._sending and not self._shutdown and self.aborts == aborts:
+            b = self.read_port()[1]
+            if b >= 0 and (b ^ input_value) & input_mask == 0:
                 passes += 1
                 if passes > required_passes:
                     # Success, we matched the wait for protocol.
-                    return
+                    return True
             else:
                 passes = 0
+                time.sleep(0.005)
+        return False
+
+    def input_monitor(self, interval=0.005):
+        """
+        Starts monitoring the inputs on a background thread, stopped at shutdown.
+
+        @param interval: seconds between polls of the input port.
+        @return: InputMonitor
+        """
+        if self._input_monitor is None:
+            self._input_monitor = InputMonitor(self, interval=interval)
+        self._input_monitor.interval = interval
+        self._input_monitor.start()
+        return self._input_monitor
 
     def jog(self, x, y):
         distance = int(abs(complex(x, y) - complex(self._last_x, self._last_y)))
@@ -624,8 +1421,9 @@ class GalvoController:
         self.goto_xy(x, y, distance=distance)
 
     def light_on(self, override_list=None):
-        if not self.is_port(self.light_pin):
-            self.port_on(self.light_pin)
+        light_pin = self.settings.light_pin
+        if not self.is_port(light_pin):
+            self.port_on(light_pin)
         else:
             # Was already on.
             return
@@ -638,8 +1436,9 @@ class GalvoController:
             self.write_port()
 
     def light_off(self, override_list=None):
-        if self.is_port(self.light_pin):
-            self.port_off(self.light_pin)
+        light_pin = self.settings.light_pin
+        if self.is_port(light_pin):
+            self.port_off(light_pin)
         else:
             # Was already off.
             return
@@ -652,19 +1451,32 @@ class GalvoController:
             self.write_port()
 
     def rotary(self, position, min_speed=100, max_speed=5000, acc_time=100, **kwgs):
+        self.rotary_move(position, min_speed, max_speed, acc_time)
+        self.wait_axis()
+
+    def rotary_move(self, position, min_speed=100, max_speed=5000, acc_time=100):
+        """
+        Starts moving the rotary axis to position, without waiting for the move to finish.
+
+        @param position: axis position in steps, negative positions are sent as sign and magnitude.
+        @param min_speed:
+        @param max_speed:
+        @param acc_time:
+        @return:
+        """
         self.set_axis_motion_param(min_speed & 0xFFFF, max_speed & 0xFFFF)
         self.set_axis_origin_param(acc_time)
         pos = position if position >= 0 else -position + 0x80000000
         p1 = (pos >> 16) & 0xFFFF
-        p0 = (pos & 0xFFFF)
+        p0 = pos & 0xFFFF
         self.move_axis_to(p0, p1)
-        self.wait_axis()
 
     def rotary_position(self):
         pos = self.get_axis_pos(0)
-        position = pos[1] << 16 & pos[2]
+        position = pos[1] << 16 | pos[2]
         if position >= 0x80000000:
-            return position - 0x80000000
+            # Sign and magnitude, as sent by rotary().
+            return -(position - 0x80000000)
         return position
 
     def get_last_xy(self):
@@ -691,27 +1503,23 @@ class GalvoController:
         return bool(status & READY) and not bool(status & BUSY)
 
     def wait_finished(self):
-        while not self.is_ready_and_not_busy():
-            time.sleep(0.01)
-            if not self._sending:
+        while self._wait_resumed() and not self.is_ready_and_not_busy():
+            if self._aborted.wait(0.01) or not self._sending:
                 return
 
     def wait_axis(self):
         while self.is_axis():
-            time.sleep(0.01)
-            if not self._sending:
+            if self._aborted.wait(0.01) or not self._sending:
                 return
 
     def wait_ready(self):
-        while not self.is_ready():
-            time.sleep(0.01)
-            if not self._sending:
+        while self._wait_resumed() and not self.is_ready():
+            if self._aborted.wait(0.01) or not self._sending:
                 return
 
     def wait_idle(self):
-        while self.is_busy():
-            time.sleep(0.01)
-            if not self._sending:
+        while self._wait_resumed() and self.is_busy():
+            if self._aborted.wait(0.01) or not self._sending:
                 return
 
     #######################
@@ -749,19 +1557,38 @@ class GalvoController:
                 self._spooler_lock.wait()
 
     def abort(self, dummy_packet=True):
+        """
+        Stops the laser. Execution is stopped before waiting for the list being built, whose waits return at once, and
+        list packets built after the abort are dropped until the next list starts.
+
+        @param dummy_packet: sends and executes an empty list packet after resetting the list.
+        @return:
+        """
+        start = time.perf_counter()
+        self._aborted.set()
+        with self._pause_condition:
+            self._pause_condition.notify_all()
+        if self._input_monitor is not None:
+            self._input_monitor.interrupt()
+        self.stop_execute()
+        self.abort_latency = time.perf_counter() - start
+        self.aborts += 1
         with self._list_build_lock:
-            self.stop_execute()
+            self.invalidate_list_state()
             if self.source == "fiber":
                 self.set_fiber_mo(0)
             self.reset_list()
             if dummy_packet:
                 self._list_new()
                 self.list_end_of_list()  # Ensure packet is sent on end.
-                self._list_end()
+                self._list_send()
                 if not self._list_executing:
                     self.execute_list()
             self._list_executing = False
             self._number_of_list_packets = 0
+            if self.checkpoint is not None:
+                # An aborted job is not resumed.
+                self.checkpoint.list_done()
             if self.source == "fiber":
                 self.set_fiber_mo(0)
             self.port_off(self.laser_pin)
@@ -769,15 +1596,91 @@ class GalvoController:
             self.laser_configuration = "initial"
 
     def pause(self):
-        self.paused = True
-        self.stop_list()
+        """
+        Stops the list where the board is, list packets are not sent until resumed. The packets of the list the board
+        executed and those sent and still pending are recorded in pause_stats.
+
+        @return:
+        """
+        with self._pause_condition:
+            if self.paused:
+                return
+            self.paused = True
+            self._pause_start = time.perf_counter()
+            self.pauses += 1
+            # A list not yet started is started by the job, not by resuming.
+            self._restart_on_resume = self._list_executing or self.is_busy()
+            self.stop_list()
+            executed = self._list_packets_executed()
+            self.pause_executed = executed
+            if executed is not None:
+                self.pause_pending = max(self._number_of_list_packets - executed, 0)
 
     def resume(self):
-        self.restart_list()
-        self.paused = False
+        """
+        Restarts the list where it was stopped, and wakes the threads waiting to send list packets.
+
+        @return:
+        """
+        with self._pause_condition:
+            if self.paused:
+                start = time.perf_counter()
+                if self._restart_on_resume or self._list_executing:
+                    executed = self._list_packets_executed()
+                    if None not in (executed, self.pause_executed) and executed != self.pause_executed:
+                        self.usb_log(f"Packets executed while paused: {executed - self.pause_executed}")
+                    self.restart_list()
+                self.paused = False
+                self._resume_start = start
+                self.paused_time += start - self._pause_start
+                self.resume_latency = time.perf_counter() - start
+                self._pause_condition.notify_all()
+        # The spooler waits on its own lock, whether or not paused here.
         with self._spooler_lock:
             self._spooler_lock.notify_all()
 
+    def _wait_resumed(self):
+        """
+        Waits while paused, without polling.
+
+        @return: whether to continue, False once aborted or no longer sending.
+        """
+        if self.paused:
+            with self._pause_condition:
+                while self.paused and self._sending and not self._aborted.is_set():
+                    self._pause_condition.wait()
+                if self._resume_start is not None and not self.paused:
+                    latency = time.perf_counter() - self._resume_start
+                    self.resume_latency = max(self.resume_latency, latency)
+        return self._sending and not self._aborted.is_set()
+
+    def _list_packets_executed(self):
+        """
+        List packets of the current list executed by the board, as reported by the list status.
+
+        @return: packets executed, None if the board could not be read.
+        """
+        executed = self.get_list_status()[1]
+        if executed < 0:
+            return None
+        return (executed - self._list_status_base) & 0xFFFF
+
+    @property
+    def pause_stats(self):
+        """
+        Pauses so far and the time spent paused, the packets the board executed and those pending at the last pause,
+        and the seconds from the last resume until the list restarted and the job continued sending.
+
+        @return:
+        """
+        return {
+            "pauses": self.pauses,
+            "paused_time": self.paused_time,
+            "executed": self.pause_executed,
+            "pending": self.pause_pending,
+            "resume_latency": self.resume_latency,
+        }
+
     def init_laser(self):
         self.usb_log("Initializing Laser")
         serial_number = self.get_serial_number()
@@ -943,49 +1846,51 @@ class GalvoController:
         delay_off=None,
         delay_polygon=None,
     ):
+        settings = self.settings
+        # Settings are validated as they change, not on each set() of the values they already have.
         if mark_speed is None:
-            mark_speed = self.mark_speed
-        else:
-            self.mark_speed = mark_speed
+            mark_speed = settings.mark_speed
+        elif mark_speed != settings.mark_speed:
+            settings.mark_speed = mark_speed
         if travel_speed is None:
-            travel_speed = self.travel_speed
-        else:
-            self.travel_speed = travel_speed
+            travel_speed = settings.travel_speed
+        elif travel_speed != settings.travel_speed:
+            settings.travel_speed = travel_speed
         if power is None:
-            power = self.power
-        else:
-            self.power = power
+            power = settings.power
+        elif power != settings.power:
+            settings.power = power
         if fpk is None:
-            fpk = self.fpk
-        else:
-            self.fpk = fpk
+            fpk = settings.fpk
+        elif fpk != settings.fpk:
+            settings.fpk = fpk
         if frequency is None:
-            frequency = self.frequency
-        else:
-            self.frequency = frequency
+            frequency = settings.frequency
+        elif frequency != settings.frequency:
+            settings.frequency = frequency
         if pulse_width is None:
-            pulse_width = self.pulse_width
-        else:
-            self.pulse_width = pulse_width
+            pulse_width = settings.pulse_width
+        elif pulse_width != settings.pulse_width:
+            settings.pulse_width = pulse_width
         if delay_on is None:
-            delay_on = self.delay_laser_on
-        else:
-            self.delay_laser_on = delay_on
+            delay_on = settings.delay_laser_on
+        elif delay_on != settings.delay_laser_on:
+            settings.delay_laser_on = delay_on
         if delay_off is None:
-            delay_off = self.delay_laser_off
-        else:
-            self.delay_laser_off = delay_off
+            delay_off = settings.delay_laser_off
+        elif delay_off != settings.delay_laser_off:
+            settings.delay_laser_off = delay_off
         if delay_polygon is None:
-            delay_polygon = self.delay_polygon
-        else:
-            self.delay_polygon = self.delay_polygon
+            delay_polygon = settings.delay_polygon
+        elif delay_polygon != settings.delay_polygon:
+            settings.delay_polygon = delay_polygon
 
         self.set_travel_speed(travel_speed)
-        if self.source == "co2":
+        if settings.source == "co2":
             self.set_frequency(frequency)
             self.set_fpk(fpk)
             self.set_power(power)
-        elif self.source == "fiber":
+        elif settings.source == "fiber":
             self.set_pulse_width(pulse_width)
             self.set_power(power)
             self.set_fpk(fpk)
@@ -995,41 +1900,114 @@ class GalvoController:
         self.set_delay_off(delay_off)
         self.set_delay_polygon(delay_polygon)
 
+    def add_pen(self, name, **kwargs):
+        """
+        Adds a named pen. Parameters not given are taken from the current settings.
+
+        @param name: name of the pen.
+        @param kwargs: parameters accepted by `set()`.
+        @return: Pen
+        """
+        parameters = {
+            "mark_speed": self.mark_speed,
+            "travel_speed": self.travel_speed,
+            "power": self.power,
+            "fpk": self.fpk,
+            "frequency": self.frequency,
+            "pulse_width": self.pulse_width,
+            "delay_on": self.delay_laser_on,
+            "delay_off": self.delay_laser_off,
+            "delay_polygon": self.delay_polygon,
+        }
+        parameters.update(kwargs)
+        pen = Pen(name, **parameters)
+        self._pens[name] = pen
+        return pen
+
+    def remove_pen(self, name):
+        del self._pens[name]
+
+    @property
+    def pens(self):
+        return self._pens
+
+    def set_pen(self, pen):
+        """
+        Switches to the given pen, equivalent to calling `set()` with the pen parameters.
+
+        Only the parameters that differ from those last sent are written, as pre-packed commands. If all parameters
+        differ the compiled block is copied whole.
+
+        @param pen: Pen or name of pen.
+        @return:
+        """
+        if not isinstance(pen, Pen):
+            pen = self._pens[pen]
+        self._check_conversions()
+        entries, block = pen.compile(self)
+        changed = [e for e in entries if getattr(self, e[0]) != e[1]]
+        self.parameters_sent += len(changed)
+        self.parameters_saved += len(entries) - len(changed)
+        if len(changed) == len(entries):
+            self._list_write_bytes(block)
+        elif changed:
+            self._list_write_bytes(b"".join(e[2] for e in changed))
+        for attr, value, packed in changed:
+            setattr(self, attr, value)
+        settings = self.settings
+        for setting, value in pen.settings():
+            if value is not None and getattr(settings, setting) != value:
+                setattr(settings, setting, value)
+
     def set_travel_speed(self, speed):
+        self._check_conversions()
         if self._travel_speed == speed:
+            self.parameters_saved += 1
             return
         if speed and self._travel_speed != speed:
+            self.parameters_sent += 1
             self.list_jump_speed(self._convert_speed(speed))
             self._travel_speed = speed
 
     def set_mark_speed(self, speed):
+        self._check_conversions()
         if self._speed == speed:
+            self.parameters_saved += 1
             return
+        self.parameters_sent += 1
         self._speed = speed
         c_speed = self._convert_speed(speed)
         self.list_mark_speed(c_speed)
 
     def set_delay_on(self, delay):
         if self._delay_on == delay:
+            self.parameters_saved += 1
             return
+        self.parameters_sent += 1
         self._delay_on = delay
         self.list_laser_on_delay(delay)
 
     def set_delay_off(self, delay):
         if self._delay_off == delay:
+            self.parameters_saved += 1
             return
+        self.parameters_sent += 1
         self._delay_off = delay
         self.list_laser_off_delay(delay)
 
     def set_delay_polygon(self, delay):
         if self._delay_poly == delay:
+            self.parameters_saved += 1
             return
+        self.parameters_sent += 1
         self._delay_poly = delay
         self.list_polygon_delay(delay)
 
     def set_delay_jump(self, delay):
         if self._delay_jump == delay:
+            self.parameters_saved += 1
             return
+        self.parameters_sent += 1
         self._delay_jump = delay
         self.list_jump_delay(delay)
 
@@ -1040,8 +2018,13 @@ class GalvoController:
         @param power:
         @return:
         """
-        if self._power == power or power is None:
+        if power is None:
+            return
+        self._check_conversions()
+        if self._power == power:
+            self.parameters_saved += 1
             return
+        self.parameters_sent += 1
         self._power = power
         if self.source == "co2":
             power_ratio = int(round(200 * power / self._frequency))
@@ -1059,15 +2042,25 @@ class GalvoController:
         if self.source != "co2":
             # FPK only used for CO2 source.
             return
-        if self._fpk == fpk or fpk is None:
+        if fpk is None:
+            return
+        self._check_conversions()
+        if self._fpk == fpk:
+            self.parameters_saved += 1
             return
+        self.parameters_sent += 1
         self._fpk = fpk
         first_pulse_killer = int(round(2000.0 / self._frequency))
         self.list_set_co2_fpk(first_pulse_killer)
 
     def set_frequency(self, frequency):
-        if self._frequency == frequency or frequency is None:
+        if frequency is None:
+            return
+        self._check_conversions()
+        if self._frequency == frequency:
+            self.parameters_saved += 1
             return
+        self.parameters_sent += 1
         self._frequency = frequency
         if self.source == "fiber":
             self.list_qswitch_period(self._convert_frequency(frequency, base=20000.0))
@@ -1075,8 +2068,12 @@ class GalvoController:
             self.list_mark_frequency(self._convert_frequency(frequency, base=10000.0))
 
     def set_pulse_width(self, pulse_width):
-        if self._pulse_width == pulse_width or pulse_width is None:
+        if pulse_width is None:
             return
+        if self._pulse_width == pulse_width:
+            self.parameters_saved += 1
+            return
+        self.parameters_sent += 1
         self._pulse_width = self.pulse_width
         self.list_fiber_ylpm_pulse_width(self.pulse_width)
 
@@ -1093,8 +2090,7 @@ class GalvoController:
         @return:
         """
         # return int(speed / 2)
-        galvos_per_mm = abs(self.galvos_per_mm)
-        return int(speed * galvos_per_mm / 1000.0)
+        return self.settings.convert_speed(speed)
 
     def _convert_frequency(self, frequency_khz, base=20000.0):
         """
@@ -1105,33 +2101,150 @@ class GalvoController:
         @param frequency_khz: Frequency to convert
         @return:
         """
-        return int(round(base / frequency_khz)) & 0xFFFF
+        return self.settings.convert_frequency(frequency_khz, base=base)
 
     def _convert_power(self, power):
         """
         Converts power percent to int value
         @return:
         """
-        return int(round(power * 0xFFF / 100.0))
+        return self.settings.convert_power(power)
 
     #######################
     # LIST MANGEMENT
     #######################
 
     def _list_end(self):
+        # Wait out a pause before the build lock, so that it is not held while paused where the caller does not hold it.
+        self._wait_resumed()
         with self._list_build_lock:
             if self._active_list and self._active_index:
-                self.wait_ready()
-                while self.paused:
-                    time.sleep(0.3)
-                self.send(self._active_list, False)
-                self.set_end_of_list(0)
-                self._number_of_list_packets += 1
+                if not self._aborted.is_set():
+                    self.wait_ready()
+                    self._wait_in_flight()
+                with self._pause_condition:
+                    # Sent and counted under the pause lock, a pause neither falls between the two nor sends alongside it.
+                    if not self._wait_resumed():
+                        # The list was aborted, the rest of it is never sent.
+                        self._active_list = None
+                        self._active_index = 0
+                        return
+                    self._list_send()
+
+    def _list_send(self):
+        checkpoint = self.checkpoint
+        if checkpoint is not None and not self._aborted.is_set():
+            try:
+                resent = checkpoint.packet(self._active_list)
+            except ValueError:
+                # Nothing of a job other than the one journaled is sent.
+                self.abort(dummy_packet=False)
+                raise
+            if not resent:
+                # Resuming, the board already executed this packet.
                 self._active_list = None
                 self._active_index = 0
-                if self._number_of_list_packets > 2 and not self._list_executing:
-                    self.execute_list()
-                    self._list_executing = True
+                return
+            restore = checkpoint.restore()
+            if restore is not None:
+                # Sets what the packets not sent left set, before the first packet sent.
+                packet = copy(empty)
+                packet[: len(restore)] = restore
+                self._list_send_packet(packet)
+        else:
+            checkpoint = None
+        packet = self._active_list
+        self._active_list = None
+        self._active_index = 0
+        self._list_send_packet(packet)
+        if checkpoint is not None:
+            checkpoint.sent(packet)
+        if self._aborted.is_set():
+            # Sent while aborting, the packet is cleared with the list rather than executed.
+            return
+        if self._number_of_list_packets > 2 and not self._list_executing:
+            self.execute_list()
+            self._list_executing = True
+
+    def _list_send_packet(self, packet):
+        if not self._number_of_list_packets:
+            # Nothing of the list is in flight, packets of the list executed are counted from here.
+            self._list_status_base = max(self.get_list_status()[1], 0)
+        elif self.checkpoint is not None:
+            executed = self._list_packets_executed()
+            if executed is not None:
+                self.checkpoint.confirm(executed)
+        self.send(packet, False)
+        self.set_end_of_list(0)
+        self._number_of_list_packets += 1
+
+    def _wait_in_flight(self):
+        """
+        Waits for the board to execute list packets until fewer than max_inflight_packets are sent and not executed.
+        The board buffers several packets, which it executes even should the controller stop sending, the cap bounds
+        how long the laser runs without the controller.
+
+        @return:
+        """
+        limit = self.settings.max_inflight_packets
+        if limit is None or not self._number_of_list_packets:
+            return
+        while True:
+            executed = self._list_packets_executed()
+            if executed is None or self._number_of_list_packets - executed < limit:
+                return
+            if not self._list_executing:
+                # Fewer packets than usual start the list, it would otherwise never execute any.
+                self.execute_list()
+                self._list_executing = True
+            if not self._wait_resumed() or self._aborted.wait(0.01):
+                return
+
+    def _list_flush(self):
+        """
+        Sends the current list packet, even if not full, and executes the list if not yet executing, so that all list
+        commands written so far reach the board. The packet is padded with delays of no time, and the list carries on
+        with the packets sent after it.
+
+        @return:
+        """
+        with self._list_build_lock:
+            if self._active_list and self._active_index:
+                index = self._active_index
+                self._active_list[index:] = flush_padding[index:]
+                self._active_index = 0xC00
+            self._list_end()
+            if self._aborted.is_set():
+                return
+            if self._number_of_list_packets and not self._list_executing:
+                self.execute_list()
+                self._list_executing = True
+
+    def _list_write_bytes(self, data):
+        """
+        Writes pre-packed list commands, splitting them across packets as needed.
+
+        @param data: bytes-like, a whole number of 12 byte commands.
+        @return:
+        """
+        data = memoryview(data).cast("B")
+        # Held for the whole write, so that neither a capture starting nor the writes of other threads split the data.
+        with self._list_build_lock:
+            if self._capture is not None:
+                self._capture += data
+                return
+            length = len(data)
+            position = 0
+            while position < length:
+                if self._active_index >= 0xC00:
+                    self._list_end()
+                if self._active_list is None:
+                    self._list_new()
+                index = self._active_index
+                size = min(length - position, 0xC00 - index)
+                self._active_list[index : index + size] = data[position : position + size]
+                self._active_index += size
+                position += size
 
     def _list_new(self):
         with self._list_build_lock:
@@ -1139,15 +2252,22 @@ class GalvoController:
             self._active_index = 0
 
     def _list_write(self, command, v1=0, v2=0, v3=0, v4=0, v5=0):
-        if self._active_index >= 0xC00:
+        packed = struct.pack(
+            "<6H", int(command), int(v1), int(v2), int(v3), int(v4), int(v5)
+        )
+        with self._list_build_lock:
+            # Checked under the lock that capture() holds, other threads write to their list once the capture ends.
+            if self._capture is not None:
+                self._capture += packed
+                return
+            full = self._active_index >= 0xC00
+        if full:
             self._list_end()
         with self._list_build_lock:
             if self._active_list is None:
                 self._list_new()
             index = self._active_index
-            self._active_list[index : index + 12] = struct.pack(
-                "<6H", int(command), int(v1), int(v2), int(v3), int(v4), int(v5)
-            )
+            self._active_list[index : index + 12] = packed
             self._active_index += 12
 
     def _command(self, command, v1=0, v2=0, v3=0, v4=0, v5=0, read=True):
@@ -1582,6 +2702,7 @@ class GalvoController:
         return self._command(SetFpkParam, param)
 
     def reset(self):
+        self.invalidate_list_state()
         return self._command(Reset)
 
     def get_fly_speed(self):
@@ -1620,3 +2741,18 @@ class GalvoController:
 
     def set_fly_res(self, fly_res1, fly_res2, fly_res3, fly_res4):
         return self._command(SetFlyRes, fly_res1, fly_res2, fly_res3, fly_res4)
+
+
+def _setting(name):
+    def set_setting(self, value):
+        setattr(self.settings, name, value)
+
+    return property(
+        attrgetter(f"settings.{name}"),
+        set_setting,
+        doc=f"Setting {name}, stored in the controller GalvoSettings.",
+    )
+
+
+for _name in SCHEMA:
+    setattr(GalvoController, _name, _setting(_name))
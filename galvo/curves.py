@@ -0,0 +1,255 @@
+"""
+Galvo Curves
+
+Flattens circles, arcs, ellipses and Bézier curves into polylines whose chords are within a tolerance of the curve.
+The number of segments follows from the tolerance and the size of the curve, rounded up to a multiple of four unless
+one chord will do, so that curves of nearby sizes share a segment count. The vertices of the unit shape for each
+segment count, cos and sin of the angles of a circle or the Bernstein basis of a Bézier curve, are kept in an LRU
+cache: a curve is its unit shape scaled, rotated and moved with one matrix product, without trig per vertex. Arcs of
+other sweeps, such as those of svg and dxf files, are kept in a cache of their own, so that they do not push the
+circles out.
+
+Angles are in radians, positions in any unit as long as the tolerance is in the same unit.
+"""
+
+import math
+from functools import lru_cache
+
+import numpy as np
+
+TAU = 2 * math.pi
+
+# Segment counts are rounded up to a multiple of this.
+QUANTUM = 4
+
+
+def _check_tolerance(tolerance):
+    if not tolerance > 0:
+        raise ValueError(f"Expected a positive tolerance, not {tolerance}.")
+
+
+def _count(segments):
+    if segments <= 1:
+        return 1
+    return -(-segments // QUANTUM) * QUANTUM
+
+
+def arc_segments(radius, sweep, tolerance):
+    """
+    Number of segments for the chords of an arc to be within the tolerance of it, their sagitta.
+
+    @param radius: largest radius of the arc.
+    @param sweep: angle swept, radians.
+    @param tolerance: largest distance of the chords from the arc.
+    @return: segment count.
+    """
+    _check_tolerance(tolerance)
+    radius = abs(radius)
+    if radius <= tolerance:
+        step = math.pi / 2
+    else:
+        step = 2 * math.acos(1 - tolerance / radius)
+    return _count(int(math.ceil(abs(sweep) / step)))
+
+
+def bezier_segments(length, tolerance):
+    """
+    Number of segments for n chords uniform in t, whose distance from the curve is at most length / n², to be within
+    the tolerance.
+
+    @param length: bound of the curve, 3/4 of the largest second difference of the control points of a cubic, 1/4 of
+        that of a quadratic.
+    @param tolerance: largest distance of the chords from the curve.
+    @return: segment count.
+    """
+    _check_tolerance(tolerance)
+    return _count(int(math.ceil(math.sqrt(length / tolerance))))
+
+
+@lru_cache(maxsize=256)
+def _unit_circle(n):
+    """
+    cos and sin of n + 1 angles evenly around from 0 to a full turn, the vertices of a unit circle.
+
+    @return: (n + 1, 2) read-only array, closed.
+    """
+    angles = np.linspace(0.0, TAU, n + 1)
+    unit = np.column_stack((np.cos(angles), np.sin(angles)))
+    unit[-1] = unit[0]
+    unit.flags.writeable = False
+    return unit
+
+
+@lru_cache(maxsize=256)
+def _unit_arc(n, sweep):
+    """
+    cos and sin of n + 1 angles evenly from 0 to the sweep, the vertices of a unit arc.
+
+    @return: (n + 1, 2) read-only array.
+    """
+    angles = np.linspace(0.0, sweep, n + 1)
+    unit = np.column_stack((np.cos(angles), np.sin(angles)))
+    unit.flags.writeable = False
+    return unit
+
+
+@lru_cache(maxsize=256)
+def _bernstein(degree, n):
+    """
+    Bernstein basis of a Bézier curve of the degree at n uniform steps of t after its start.
+
+    @return: (n, degree + 1) read-only array.
+    """
+    t = np.arange(1, n + 1) / n
+    mt = 1 - t
+    if degree == 2:
+        basis = np.column_stack((mt * mt, 2 * mt * t, t * t))
+    else:
+        basis = np.column_stack((mt * mt * mt, 3 * mt * mt * t, 3 * mt * t * t, t * t * t))
+    basis.flags.writeable = False
+    return basis
+
+
+def cache_info():
+    """
+    Hits and misses of the caches of unit shapes.
+
+    @return: dict of the cache_info() of the circle, arc and Bézier tables.
+    """
+    return {
+        "circle": _unit_circle.cache_info(),
+        "arc": _unit_arc.cache_info(),
+        "bezier": _bernstein.cache_info(),
+    }
+
+
+def cache_clear():
+    _unit_circle.cache_clear()
+    _unit_arc.cache_clear()
+    _bernstein.cache_clear()
+
+
+#######################
+# ARCS
+#######################
+
+
+def ellipse(cx, cy, rx, ry, rotation=0.0, start=0.0, sweep=TAU, tolerance=0.5):
+    """
+    Points of an elliptical arc, from its start to its end. Affine, the ellipse is within its larger radius times the
+    distance of the chords of the unit arc from it.
+
+    @param cx: center x.
+    @param cy: center y.
+    @param rx: radius along the x axis of the ellipse.
+    @param ry: radius along the y axis of the ellipse.
+    @param rotation: rotation of the x axis of the ellipse, radians.
+    @param start: angle of the start, radians.
+    @param sweep: signed angle swept, radians, a whole ellipse by default.
+    @param tolerance: largest distance of the chords from the ellipse.
+    @return: (N, 2) array.
+    """
+    sweep = float(sweep)
+    n = arc_segments(max(abs(rx), abs(ry)), sweep, tolerance)
+    if abs(sweep) == TAU:
+        unit = _unit_circle(n)
+    else:
+        unit = _unit_arc(n, sweep)
+    cos = math.cos(rotation)
+    sin = math.sin(rotation)
+    cos_start = math.cos(start)
+    sin_start = math.sin(start)
+    # Rotation of the ellipse, times its radii, times the rotation to the start.
+    a = cos * rx
+    b = -sin * ry
+    c = sin * rx
+    d = cos * ry
+    matrix = np.array(
+        (
+            (a * cos_start + b * sin_start, b * cos_start - a * sin_start),
+            (c * cos_start + d * sin_start, d * cos_start - c * sin_start),
+        )
+    )
+    if sweep == -TAU:
+        # Around the other way from the unit circle, the sines of its angles are negated.
+        matrix[:, 1] = -matrix[:, 1]
+    points = unit @ matrix.T
+    points += (cx, cy)
+    return points
+
+
+def arc(cx, cy, radius, start, sweep, tolerance=0.5):
+    """
+    Points of a circular arc, from its start to its end.
+
+    @param start: angle of the start, radians.
+    @param sweep: signed angle swept, radians.
+    @return: (N, 2) array.
+    """
+    return ellipse(cx, cy, radius, radius, 0.0, start, sweep, tolerance)
+
+
+def circle(cx, cy, radius, tolerance=0.5):
+    """
+    Points of a circle from angle 0 around to it again.
+
+    @return: (N, 2) array, closed.
+    """
+    return ellipse(cx, cy, radius, radius, 0.0, 0.0, TAU, tolerance)
+
+
+def elliptical_arc(cx, cy, rx, ry, rotation, start, sweep, tolerance):
+    """
+    Points of an elliptical arc after its start, as ellipse().
+
+    @return: (N, 2) array.
+    """
+    return ellipse(cx, cy, rx, ry, rotation, start, sweep, tolerance)[1:]
+
+
+#######################
+# BÉZIER CURVES
+#######################
+
+
+def cubic(p0, p1, p2, p3, tolerance):
+    """
+    Points of a cubic Bézier curve after its start, uniformly in t. The distance of n chords from the curve is at
+    most 3/4 of the largest second difference of the control points over n squared.
+
+    @return: (N, 2) array ending at p3.
+    """
+    dd = max(
+        math.hypot(p0[0] - 2 * p1[0] + p2[0], p0[1] - 2 * p1[1] + p2[1]),
+        math.hypot(p1[0] - 2 * p2[0] + p3[0], p1[1] - 2 * p2[1] + p3[1]),
+    )
+    return _bernstein(3, bezier_segments(0.75 * dd, tolerance)) @ np.array((p0, p1, p2, p3), dtype=np.float64)
+
+
+def quadratic(p0, p1, p2, tolerance):
+    """
+    Points of a quadratic Bézier curve after its start, the distance of n chords from it being at most a quarter of
+    the second difference of the control points over n squared.
+
+    @return: (N, 2) array ending at p2.
+    """
+    dd = math.hypot(p0[0] - 2 * p1[0] + p2[0], p0[1] - 2 * p1[1] + p2[1])
+    return _bernstein(2, bezier_segments(0.25 * dd, tolerance)) @ np.array((p0, p1, p2), dtype=np.float64)
+
+
+def bezier(points, tolerance=0.5):
+    """
+    Points of a quadratic or cubic Bézier curve, from its start to its end.
+
+    @param points: 3 or 4 control points.
+    @param tolerance: largest distance of the chords from the curve.
+    @return: (N, 2) array.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if points.shape == (4, 2):
+        after = cubic(*points, tolerance)
+    elif points.shape == (3, 2):
+        after = quadratic(*points, tolerance)
+    else:
+        raise ValueError(f"Expected 3 or 4 control points, not {points.shape}.")
+    return np.concatenate((points[:1], after))
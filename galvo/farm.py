@@ -0,0 +1,249 @@
+"""
+Galvo Farm
+
+A compile farm builds the list commands of large jobs in worker processes, so building is not limited to one core by
+the GIL. The paths of a job are split into chunks, each chunk is captured in a worker and its commands returned in
+shared memory, then written into the list in order as they complete, so the first packets are sent while later chunks
+are still compiling.
+
+Each chunk depends on the list state left by the chunks before it: the position, from which the distance of its first
+jump is measured, and the parameters believed set, such as the jump delay. The position is computed from the paths.
+The parameters are found by capturing the last path of the previous chunk before the chunk itself, as marking a path
+sets every parameter that marking it depends on. When writing each chunk, the state it was compiled from is compared
+with the state the list is actually in, and the chunk is compiled again in-process should they differ, so the
+commands written are always those compiled serially.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from .capture import LIST_STATE
+
+# Counters of the controller accumulated from the chunks compiled by workers.
+COUNTERS = (
+    "jumps",
+    "jump_delay_total",
+    "jump_delay_baseline",
+    "parameters_sent",
+    "parameters_saved",
+)
+
+_worker_controller = None
+
+
+def _controller(settings):
+    global _worker_controller
+    controller = _worker_controller
+    if controller is None or controller.settings.to_dict() != settings:
+        from .controller import GalvoController
+        from .settings import GalvoSettings
+
+        controller = GalvoController(settings=GalvoSettings(**settings))
+        _worker_controller = controller
+    return controller
+
+
+def _compile(controller, state, warmup, paths):
+    """
+    Captures the paths from the list state, after the warmup path.
+
+    @return: CapturedList, dict of counter increments.
+    """
+    if warmup is not None:
+        with controller.capture(state) as captured:
+            controller.mark_polyline(warmup)
+        state = captured.end
+    before = [getattr(controller, name) for name in COUNTERS]
+    with controller.capture(state) as captured:
+        for path in paths:
+            controller.mark_polyline(path)
+    counters = {
+        name: getattr(controller, name) - value for name, value in zip(COUNTERS, before)
+    }
+    return captured, counters
+
+
+def _compile_chunk(settings, state, warmup, paths):
+    """
+    Worker process, compiles a chunk into a shared memory block.
+
+    @return: shared memory name, size, start state, end state, counters.
+    """
+    controller = _controller(settings)
+    captured, counters = _compile(controller, state, warmup, paths)
+    size = len(captured.data)
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    block.buf[:size] = captured.data
+    name = block.name
+    block.close()
+    # The block is unlinked by the process writing it into the list.
+    resource_tracker.unregister(block._name, "shared_memory")
+    return name, size, captured.start, captured.end, counters
+
+
+def _discard(name):
+    block = shared_memory.SharedMemory(name=name)
+    block.close()
+    block.unlink()
+
+
+def end_positions(paths, x, y):
+    """
+    Position after marking each path with mark_polyline(), starting from x, y.
+
+    @param paths: sequence of (N, 2) array-like positions.
+    @param x: x position before the first path.
+    @param y: y position before the first path.
+    @return: list of (x, y)
+    """
+    positions = []
+    for path in paths:
+        points = np.rint(np.asarray(path, dtype=np.float64).reshape(-1, 2))
+        points = points[np.all((points >= 0) & (points <= 0xFFFF), axis=1)]
+        if points.shape[0]:
+            x, y = int(points[-1, 0]), int(points[-1, 1])
+        positions.append((x, y))
+    return positions
+
+
+def split_chunks(paths, chunks):
+    """
+    Splits paths into consecutive chunks of similar numbers of points.
+
+    @param paths: list of (N, 2) arrays.
+    @param chunks: number of chunks.
+    @return: list of (first, last) path index ranges.
+    """
+    count = len(paths)
+    if not count:
+        return []
+    sizes = np.cumsum([len(path) for path in paths])
+    bounds = np.searchsorted(sizes, np.linspace(0, sizes[-1], chunks + 1)[1:-1])
+    bounds = np.unique(np.concatenate(([0], bounds + 1, [count])))
+    bounds = bounds[bounds <= count]
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if a < b]
+
+
+class CompileFarm:
+    def __init__(self, workers=None, chunks_per_worker=4, min_points=20000):
+        """
+        @param workers: worker processes, defaults to the number of cores.
+        @param chunks_per_worker: chunks each worker compiles per job, more balance the load better.
+        @param min_points: jobs with fewer points are compiled in-process.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.chunks_per_worker = chunks_per_worker
+        self.min_points = min_points
+        self._executor = None
+
+        self.chunks = 0
+        self.recompiled = 0
+        self.compile_time = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers)
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def mark_polylines(self, controller, paths):
+        """
+        Marks each path with mark_polyline(), compiling the list commands in the worker processes. The commands
+        written are identical to those of calling mark_polyline() for each path.
+
+        @param controller: GalvoController
+        @param paths: sequence of (N, 2) array-like positions in galvo units, or mm if the controller has a transform.
+        @return:
+        """
+        start_time = time.perf_counter()
+        paths = [np.asarray(path, dtype=np.float64).reshape(-1, 2) for path in paths]
+        if controller.transform is not None:
+            paths = [controller.transform(path) for path in paths]
+        points = sum(path.shape[0] for path in paths)
+        if points < self.min_points or self.workers < 2:
+            for path in paths:
+                controller._mark_polyline(path)
+            self.compile_time += time.perf_counter() - start_time
+            return
+        with controller._list_build_lock:
+            state = controller.get_list_state()
+            positions = end_positions(paths, state["_last_x"], state["_last_y"])
+            settings = controller.settings.to_dict()
+            futures = []
+            for first, last in split_chunks(paths, self.workers * self.chunks_per_worker):
+                chunk_state = dict(state)
+                warmup = None
+                if first:
+                    warmup = paths[first - 1]
+                    previous = positions[first - 2] if first > 1 else (
+                        state["_last_x"],
+                        state["_last_y"],
+                    )
+                    chunk_state["_last_x"], chunk_state["_last_y"] = previous
+                futures.append(
+                    (
+                        first,
+                        last,
+                        self.executor.submit(
+                            _compile_chunk,
+                            settings,
+                            chunk_state,
+                            warmup,
+                            paths[first:last],
+                        ),
+                    )
+                )
+            written = 0
+            try:
+                for first, last, future in futures:
+                    written += 1
+                    self._write_chunk(controller, paths[first:last], future.result())
+            finally:
+                for first, last, future in futures[written:]:
+                    # Discard the chunks of a failed job.
+                    if not future.cancel() and future.exception() is None:
+                        _discard(future.result()[0])
+        self.compile_time += time.perf_counter() - start_time
+
+    def _write_chunk(self, controller, paths, result):
+        name, size, start, end, counters = result
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            self.chunks += 1
+            state = controller.get_list_state()
+            if any(start[attr] != state[attr] for attr in LIST_STATE):
+                # Compiled from a state the list is not in, compile again from the actual state.
+                self.recompiled += 1
+                for path in paths:
+                    controller._mark_polyline(path)
+                return
+            controller._list_write_bytes(block.buf[:size])
+            controller.set_list_state(end)
+            for counter, value in counters.items():
+                setattr(controller, counter, getattr(controller, counter) + value)
+        finally:
+            block.close()
+            block.unlink()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "chunks": self.chunks,
+            "recompiled": self.recompiled,
+            "compile_time": self.compile_time,
+        }
@@ -0,0 +1,219 @@
+"""
+File Connection for Galvo
+
+The file connection streams the packets sent to it into a job file rather than engaging any hardware, so jobs can be
+generated on machines without a laser, and the job file streamed to the laser later with
+`GalvoController.stream_file()`. The connection answers as an idle board ready for more packets, having executed every
+list packet, so job generation never waits.
+
+Job files start with `MAGIC`, followed by one record per packet: `b"L"` and a 0xC00 byte list packet, or `b"R"` and a
+0xC byte realtime command. Queries of the board are not recorded, as they do not change it, but where the board was
+queried the job may have polled it until it finished the list, moved the axis, or executed enough of the list, so a
+`b"W"` record tells the laser to wait until it is idle. The status read for the board to be ready for each list packet
+is not such a wait, the laser waits for it anyway. Job files named `.gz`, `.bz2` or `.xz` are compressed.
+"""
+
+import bz2
+import gzip
+import lzma
+import struct
+
+from .consts import (
+    GetAxisPos,
+    GetFlySpeed,
+    GetFlyWaitCount,
+    GetListStatus,
+    GetMarkCount,
+    GetMarkTime,
+    GetPositionXY,
+    GetSerialNo,
+    GetUserData,
+    GetVersion,
+    ReadPort,
+)
+
+MAGIC = b"galvojob1\n"
+
+LIST_RECORD = b"L"
+REALTIME_RECORD = b"R"
+WAIT_RECORD = b"W"
+
+# Packet yielded for wait records.
+WAIT = b""
+
+READY = 0x20
+
+# Realtime commands which only query the board.
+QUERIES = frozenset(
+    (
+        GetAxisPos,
+        GetFlySpeed,
+        GetFlyWaitCount,
+        GetListStatus,
+        GetMarkCount,
+        GetMarkTime,
+        GetPositionXY,
+        GetSerialNo,
+        GetUserData,
+        GetVersion,
+        ReadPort,
+    )
+)
+
+COMPRESSIONS = {
+    None: open,
+    "gzip": gzip.open,
+    "bz2": bz2.open,
+    "lzma": lzma.open,
+}
+
+_SUFFIXES = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "lzma",
+    ".lzma": "lzma",
+}
+
+
+def _(data):
+    return data
+
+
+def _open(path, mode, compression=None):
+    if compression is None:
+        for suffix, name in _SUFFIXES.items():
+            if str(path).endswith(suffix):
+                compression = name
+                break
+    try:
+        opener = COMPRESSIONS[compression]
+    except KeyError:
+        raise ValueError(
+            f"Unknown compression {compression!r}, one of {list(COMPRESSIONS)}"
+        ) from None
+    return opener(path, mode)
+
+
+def read_job_file(path, compression=None):
+    """
+    Packets of a job file, in the order they were sent.
+
+    @param path: job file.
+    @param compression: "gzip", "bz2" or "lzma", None infers the compression from the file name.
+    @return: generator of 0xC00 byte list packets, 0xC byte realtime commands and WAIT.
+    """
+    with _open(path, "rb", compression) as fp:
+        if fp.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a galvo job file.")
+        while True:
+            record = fp.read(1)
+            if not record:
+                return
+            if record == WAIT_RECORD:
+                yield WAIT
+                continue
+            if record == LIST_RECORD:
+                size = 0xC00
+            elif record == REALTIME_RECORD:
+                size = 0xC
+            else:
+                raise ValueError(f"{path} has an unknown record {record!r}.")
+            packet = fp.read(size)
+            if len(packet) != size:
+                raise ValueError(f"{path} is truncated.")
+            yield packet
+
+
+class FileConnection:
+    def __init__(self, channel=None, path=None, compression=None):
+        """
+        @param channel: log function.
+        @param path: job file written.
+        @param compression: "gzip", "bz2" or "lzma", None infers the compression from the file name.
+        """
+        if path is None:
+            raise ValueError("The file connection requires a path.")
+        self._log = channel
+        self.path = path
+        self.compression = compression
+        self.devices = {}
+        self.interface = {}
+        self.backend_error_code = None
+        self.timeout = 0
+        self._file = None
+        # Queries since the last packet recorded.
+        self._queries = []
+        self._response = struct.pack("<4H", 0, 0, 0, READY)
+        self.list_packets = 0
+        self.realtime_packets = 0
+
+    def channel(self, data):
+        if self._log:
+            self._log(data)
+
+    def is_open(self, index=0):
+        try:
+            dev = self.devices[index]
+            if dev:
+                return True
+        except KeyError:
+            pass
+        return False
+
+    def open(self, index=0):
+        """Opens device, returns index."""
+        self.channel(_(f"Attempting connection to {self.path}."))
+        if self._file is None:
+            self._file = _open(self.path, "wb", self.compression)
+            self._file.write(MAGIC)
+        self.devices[index] = True
+        self.channel(_("File Connected."))
+        return index
+
+    def close(self, index=0):
+        """Closes device."""
+        device = self.devices.get(index)
+        self.channel(_(f"Attempting disconnection from {self.path}."))
+        if device is not None:
+            del self.devices[index]
+            if not self.devices and self._file is not None:
+                self._file.close()
+                self._file = None
+            self.channel(_("File Disconnection Successful.\n"))
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def write(self, index=0, packet=None):
+        packet_length = len(packet)
+        assert packet_length == 0xC or packet_length == 0xC00
+        if not self.devices.get(index):
+            raise ConnectionError
+        queries = self._queries
+        if packet_length == 0xC00:
+            if queries and queries[-1] == GetVersion:
+                # The board being ready for the packet is waited for as the laser will.
+                queries.pop()
+            record = LIST_RECORD
+            self.list_packets += 1
+        else:
+            opcode = packet[0] | packet[1] << 8
+            if opcode in QUERIES:
+                queries.append(opcode)
+                # Every list packet is executed at once.
+                executed = self.list_packets & 0xFFFF if opcode == GetListStatus else 0
+                self._response = struct.pack("<4H", 0, executed, 0, READY)
+                return
+            record = REALTIME_RECORD
+            self.realtime_packets += 1
+        if queries:
+            queries.clear()
+            self._file.write(WAIT_RECORD)
+        self._file.write(record)
+        self._file.write(packet)
+
+    def read(self, index=0):
+        if not self.devices.get(index):
+            raise ConnectionError
+        return self._response
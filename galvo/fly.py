@@ -0,0 +1,153 @@
+"""
+Galvo Fly
+
+On-the-fly marking marks parts moving past the head on a conveyor. The part is captured into list commands once, each
+copy waiting for the part-present input before marking, and copies are kept armed on the board ahead of the parts. The
+board marks each part as it arrives without waiting on the host, which only tops up the armed copies and reads the
+counters of the board.
+"""
+
+import threading
+import time
+
+
+class FlyMarking:
+    def __init__(
+        self,
+        draw,
+        parts=None,
+        delay=0,
+        encoder_count=None,
+        ahead=4,
+        interval=0.005,
+    ):
+        """
+        @param draw: function drawing a part, given the controller.
+        @param parts: number of parts to mark, None marks parts until stopped.
+        @param delay: fly delay between the part trigger and marking, sent with list_fly_delay().
+        @param encoder_count: encoder count sent with list_fly_encoder_count() for each part, if given.
+        @param ahead: parts kept armed on the board ahead of those marked.
+        @param interval: seconds to wait between reads of the counters while enough parts are armed.
+        """
+        self.draw = draw
+        self.parts = parts
+        self.delay = delay
+        self.encoder_count = encoder_count
+        self.ahead = max(1, ahead)
+        self.interval = interval
+        self.block = None
+        self._stopped = False
+        self._lock = threading.Lock()
+
+        self.armed = 0
+        self.marked = 0
+        self.triggers = 0
+        self._counts = None
+        self._start_time = None
+        self._first_mark_time = None
+        self._last_mark_time = None
+
+    def __call__(self, controller):
+        """
+        Spooler job, tops up the armed parts.
+
+        @param controller: GalvoController
+        @return: whether the marking is finished.
+        """
+        if self._stopped:
+            if self.block is not None and self.armed > self.marked:
+                # Parts armed but never triggered are waiting on the board.
+                controller.abort()
+            return True
+        if self.block is None:
+            self._start(controller)
+        self.poll(controller)
+        if self.parts is not None and self.marked >= self.parts:
+            controller.list_fly_enable(0)
+            return True
+        wanted = self.ahead - (self.armed - self.marked)
+        if self.parts is not None:
+            wanted = min(wanted, self.parts - self.armed)
+        if wanted > 0:
+            for i in range(wanted):
+                controller.write_captured(self.block)
+            self.armed += wanted
+            controller._list_flush()
+        else:
+            time.sleep(self.interval)
+        return False
+
+    def _start(self, controller):
+        controller.marking_configuration()
+        controller.list_fly_enable(1)
+        self.block = controller.capture_repeating(self._draw_part)
+        self._counts = (
+            controller.get_mark_count()[1],
+            controller.get_fly_wait_count()[1],
+        )
+        self._start_time = time.perf_counter()
+
+    def _draw_part(self, controller):
+        controller.list_fly_wait_input()
+        if self.delay:
+            controller.list_fly_delay(self.delay)
+        if self.encoder_count is not None:
+            controller.list_fly_encoder_count(self.encoder_count)
+        self.draw(controller)
+
+    def poll(self, controller):
+        """
+        Reads the mark and fly wait counters of the board. The counters are 16 bit, so are accumulated as differences.
+
+        @param controller: GalvoController
+        @return:
+        """
+        marks = controller.get_mark_count()[1]
+        waits = controller.get_fly_wait_count()[1]
+        if marks < 0 or waits < 0:
+            # Not connected.
+            return
+        with self._lock:
+            last_marks, last_waits = self._counts
+            marked = (marks - last_marks) & 0xFFFF
+            self.triggers += (waits - last_waits) & 0xFFFF
+            self._counts = marks, waits
+            if marked:
+                now = time.perf_counter()
+                if self._first_mark_time is None:
+                    self._first_mark_time = now
+                self._last_mark_time = now
+                self.marked += marked
+
+    def stop(self):
+        """
+        Ends the marking, parts armed but not yet triggered are aborted.
+
+        @return:
+        """
+        self._stopped = True
+
+    @property
+    def missed(self):
+        """
+        Parts which triggered the part sensor while no part was armed.
+        """
+        return max(0, self.triggers - self.marked)
+
+    @property
+    def parts_per_minute(self):
+        start = self._start_time
+        last = self._last_mark_time
+        if start is None or last is None or last == start:
+            return 0.0
+        return 60.0 * self.marked / (last - start)
+
+    def stats(self):
+        return {
+            "armed": self.armed,
+            "marked": self.marked,
+            "triggers": self.triggers,
+            "missed": self.missed,
+            "parts_per_minute": self.parts_per_minute,
+            "commands_per_part": len(self.block) if self.block is not None else 0,
+        }
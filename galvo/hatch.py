@@ -0,0 +1,138 @@
+"""
+Galvo Hatch
+
+Hatch fills closed polygons with parallel lines. All edges of all polygons are intersected with all scanlines at once
+with numpy, so large layouts such as text fill quickly. Polygons are filled by the even-odd rule, so holes are given as
+further rings of the same shape.
+"""
+
+import math
+
+import numpy as np
+
+
+def _is_ring(shape):
+    if isinstance(shape, np.ndarray):
+        return shape.ndim == 2
+    return len(shape) != 0 and np.ndim(shape[0]) == 1
+
+
+def _rings(polygons):
+    """
+    Flattens shapes into rings, with the index of the shape of each ring.
+
+    @param polygons: a ring, or a sequence of shapes each being a ring or a sequence of rings.
+    @return: list of (N, 2) arrays, list of shape indexes.
+    """
+    if _is_ring(polygons):
+        polygons = [polygons]
+    rings = []
+    shapes = []
+    for index, shape in enumerate(polygons):
+        if _is_ring(shape):
+            shape = [shape]
+        for ring in shape:
+            ring = np.asarray(ring, dtype=np.float64).reshape(-1, 2)
+            if ring.shape[0] >= 3:
+                rings.append(ring)
+                shapes.append(index)
+    return rings, shapes
+
+
+def _edges(rings, shapes):
+    points = np.concatenate(rings)
+    lengths = np.array([ring.shape[0] for ring in rings])
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    following = np.arange(1, points.shape[0] + 1)
+    following[ends - 1] = starts
+    shape_of_point = np.repeat(np.asarray(shapes), lengths)
+    return points, points[following], shape_of_point
+
+
+def _rotation(angle):
+    cos = math.cos(angle)
+    sin = math.sin(angle)
+    return np.array([[cos, -sin], [sin, cos]])
+
+
+def hatch_lines(polygons, spacing, angle=0.0, bidirectional=True):
+    """
+    Hatch segments filling the polygons at a single angle.
+
+    @param polygons: a ring, or a sequence of shapes each being a ring or a sequence of rings. Rings are (N, 2) arrays.
+    @param spacing: distance between hatch lines.
+    @param angle: angle of the hatch lines, in radians.
+    @param bidirectional: alternate the direction of each hatch line, otherwise all lines run the same direction.
+    @return: (N, 2, 2) array of segments, ordered by shape then hatch line.
+    """
+    if spacing <= 0:
+        raise ValueError("Hatch spacing must be positive.")
+    rings, shapes = _rings(polygons)
+    if not rings:
+        return np.zeros((0, 2, 2))
+    start, end, shape = _edges(rings, shapes)
+    # Rotate so hatch lines are horizontal.
+    rotation = _rotation(angle)
+    start = start @ rotation
+    end = end @ rotation
+    low = np.minimum(start[:, 1], end[:, 1]) / spacing
+    high = np.maximum(start[:, 1], end[:, 1]) / spacing
+    # Scanlines at whole multiples of spacing, edges include their low end only.
+    first = np.ceil(low).astype(np.int64)
+    counts = np.ceil(high).astype(np.int64) - first
+    counts[counts < 0] = 0
+    total = int(counts.sum())
+    if not total:
+        return np.zeros((0, 2, 2))
+    edge = np.repeat(np.arange(counts.shape[0]), counts)
+    offsets = np.cumsum(counts) - counts
+    line = first[edge] + np.arange(total) - offsets[edge]
+    y = line * spacing
+    x0 = start[edge, 0]
+    y0 = start[edge, 1]
+    x = x0 + (y - y0) * (end[edge, 0] - x0) / (end[edge, 1] - y0)
+    shape = shape[edge]
+
+    if bidirectional:
+        direction = np.where(line & 1, -1.0, 1.0)
+    else:
+        direction = np.ones(total)
+    order = np.lexsort((x * direction, line, shape))
+    x = x[order]
+    y = y[order]
+    # Each shape and line has an even number of crossings, pairs of crossings are inside.
+    segments = np.empty((total // 2, 2, 2))
+    segments[:, 0, 0] = x[0::2]
+    segments[:, 1, 0] = x[1::2]
+    segments[:, 0, 1] = y[0::2]
+    segments[:, 1, 1] = y[1::2]
+    segments = segments[segments[:, 0, 0] != segments[:, 1, 0]]
+    # Rotate back.
+    return segments @ rotation.T
+
+
+def hatch(
+    polygons, spacing, angle=0.0, passes=1, angle_step=90.0, bidirectional=True
+):
+    """
+    Hatch segments filling the polygons, in one or more passes at rotated angles.
+
+    @param polygons: a ring, or a sequence of shapes each being a ring or a sequence of rings. Rings are (N, 2) arrays.
+    @param spacing: distance between hatch lines.
+    @param angle: angle of the first pass, in degrees.
+    @param passes: number of passes.
+    @param angle_step: angle between passes, in degrees.
+    @param bidirectional: alternate the direction of each hatch line, otherwise all lines run the same direction.
+    @return: (N, 2, 2) array of segments.
+    """
+    segments = [
+        hatch_lines(
+            polygons,
+            spacing,
+            angle=math.radians(angle + angle_step * i),
+            bidirectional=bidirectional,
+        )
+        for i in range(passes)
+    ]
+    return np.concatenate(segments)
@@ -0,0 +1,607 @@
+"""
+Galvo Ingest
+
+Reads the paths of vector files, SVG and DXF, as they are parsed. Each path is yielded as an (N, 2) array in mm as
+soon as it is read, so that marking starts while the rest of a large file is still being parsed. Curves are flattened
+into as few points as keep every point of the curve within the tolerance of the polyline.
+
+SVG: path, polyline, polygon, line, rect, circle and ellipse elements, with the transforms of their groups. The
+width, height and viewBox of the root give the size of a user unit, a CSS pixel of 1/96 inch without them. Positions
+are as in the file, y down.
+
+DXF: LWPOLYLINE with bulges, ARC, CIRCLE and LINE entities of the ENTITIES section, in the units of $INSUNITS, mm
+without it.
+"""
+
+import io
+import math
+import os
+import re
+import xml.etree.ElementTree as ElementTree
+
+import numpy as np
+
+from .curves import cubic, elliptical_arc, quadratic
+
+#######################
+# FLATTENING
+#######################
+
+
+def _endpoint_arc(x1, y1, rx, ry, rotation, large, sweep, x2, y2, tolerance):
+    """
+    Points of an svg arc from x1, y1 to x2, y2, by the endpoint to center conversion of the svg specification.
+    """
+    if x1 == x2 and y1 == y2:
+        return np.zeros((0, 2))
+    rx = abs(rx)
+    ry = abs(ry)
+    if not rx or not ry:
+        return np.array([[x2, y2]])
+    phi = math.radians(rotation)
+    cos = math.cos(phi)
+    sin = math.sin(phi)
+    dx = (x1 - x2) / 2
+    dy = (y1 - y2) / 2
+    x = cos * dx + sin * dy
+    y = -sin * dx + cos * dy
+    scale = (x * x) / (rx * rx) + (y * y) / (ry * ry)
+    if scale > 1:
+        # Radii too small for the endpoints are scaled up.
+        scale = math.sqrt(scale)
+        rx *= scale
+        ry *= scale
+    numerator = rx * rx * ry * ry - rx * rx * y * y - ry * ry * x * x
+    denominator = rx * rx * y * y + ry * ry * x * x
+    factor = math.sqrt(max(numerator, 0) / denominator)
+    if large == sweep:
+        factor = -factor
+    cx_ = factor * rx * y / ry
+    cy_ = -factor * ry * x / rx
+    cx = cos * cx_ - sin * cy_ + (x1 + x2) / 2
+    cy = sin * cx_ + cos * cy_ + (y1 + y2) / 2
+    start = math.atan2((y - cy_) / ry, (x - cx_) / rx)
+    end = math.atan2((-y - cy_) / ry, (-x - cx_) / rx)
+    delta = end - start
+    if sweep and delta < 0:
+        delta += 2 * math.pi
+    elif not sweep and delta > 0:
+        delta -= 2 * math.pi
+    points = elliptical_arc(cx, cy, rx, ry, phi, start, delta, tolerance)
+    # The last point is exactly the endpoint.
+    points[-1] = (x2, y2)
+    return points
+
+
+#######################
+# SVG
+#######################
+
+_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_TOKEN = re.compile(r"[MmZzLlHhVvCcSsQqTtAa]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_TRANSFORM = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+_LENGTH = re.compile(r"\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*([a-z%]*)")
+
+# mm of each svg length unit.
+UNITS = {
+    "": 25.4 / 96,
+    "px": 25.4 / 96,
+    "pt": 25.4 / 72,
+    "pc": 25.4 / 6,
+    "in": 25.4,
+    "cm": 10.0,
+    "mm": 1.0,
+    "q": 0.25,
+}
+
+_ARGUMENTS = {"M": 2, "L": 2, "H": 1, "V": 1, "C": 6, "S": 4, "Q": 4, "T": 2, "A": 7, "Z": 0}
+
+_SHAPES = {"path", "polyline", "polygon", "line", "rect", "circle", "ellipse"}
+
+# Elements whose content is not drawn where it is.
+_HIDDEN = {"defs", "clipPath", "mask", "marker", "pattern", "symbol", "metadata", "title", "desc", "style"}
+
+
+class _Tokens:
+    """
+    Commands and numbers of svg path data.
+    """
+
+    def __init__(self, data):
+        self.tokens = _TOKEN.findall(data)
+        self.index = 0
+
+    def command(self):
+        tokens = self.tokens
+        while self.index < len(tokens):
+            token = tokens[self.index]
+            self.index += 1
+            if token.isalpha():
+                return token
+        return None
+
+    def arguments(self, command):
+        """
+        Arguments of the next segment of the command.
+
+        @return: list of floats, None if no segment follows.
+        """
+        index = self.index
+        count = _ARGUMENTS[command]
+        if command == "A":
+            return self._arc()
+        tokens = self.tokens[index : index + count]
+        if len(tokens) < count:
+            return None
+        try:
+            values = [float(token) for token in tokens]
+        except ValueError:
+            # A command.
+            return None
+        self.index = index + count
+        return values
+
+    def _arc(self):
+        tokens = self.tokens
+        index = self.index
+        values = []
+        try:
+            while len(values) < 7:
+                token = tokens[index]
+                if len(values) in (3, 4) and len(token) > 1 and token[0] in "01":
+                    # Flags may be written without separators, "a1 1 0 01 10 10" being tokenized "01" and "10".
+                    values.append(float(token[0]))
+                    tokens[index] = token[1:]
+                    continue
+                values.append(float(token))
+                index += 1
+        except (IndexError, ValueError):
+            return None
+        self.index = index
+        return values
+
+
+def path_data(d, tolerance):
+    """
+    Subpaths of svg path data.
+
+    @param d: path data.
+    @param tolerance: in user units.
+    @return: generator of (N, 2) arrays in user units.
+    """
+    scanner = _Tokens(d)
+    subpath = []
+    x = y = start_x = start_y = 0.0
+    # Last control point of a curve, reflected by the smooth curves following it.
+    control = None
+    last = None
+    command = scanner.command()
+    while command is not None:
+        upper = command.upper()
+        relative = command != upper
+        if upper == "Z":
+            if len(subpath) > 1:
+                subpath.append(np.array([[start_x, start_y]]))
+                yield np.concatenate(subpath)
+            subpath = []
+            x, y = start_x, start_y
+            last = upper
+            command = scanner.command()
+            continue
+        values = scanner.arguments(upper)
+        if values is None:
+            # Malformed path data, the rest of it is ignored as in browsers.
+            break
+        while values is not None:
+            ox, oy = (x, y) if relative else (0.0, 0.0)
+            if upper == "M":
+                if len(subpath) > 1:
+                    yield np.concatenate(subpath)
+                x, y = values[0] + ox, values[1] + oy
+                start_x, start_y = x, y
+                subpath = [np.array([[x, y]])]
+                # Further coordinate pairs are lines.
+                last = upper
+                upper = "L"
+                values = scanner.arguments(upper)
+                continue
+            if not subpath:
+                # Drawing on after a close starts from the start of the closed subpath.
+                subpath = [np.array([[x, y]])]
+            if upper == "L" or upper == "H" or upper == "V":
+                if upper != "V":
+                    x = values[0] + ox
+                if upper != "H":
+                    y = values[-1] + oy
+                subpath.append(np.array([[x, y]]))
+            elif upper == "C" or upper == "S":
+                if upper == "C":
+                    p1 = (values[0] + ox, values[1] + oy)
+                    values = values[2:]
+                elif last == "C" or last == "S":
+                    p1 = (2 * x - control[0], 2 * y - control[1])
+                else:
+                    p1 = (x, y)
+                p2 = (values[0] + ox, values[1] + oy)
+                p3 = (values[2] + ox, values[3] + oy)
+                subpath.append(cubic((x, y), p1, p2, p3, tolerance))
+                control = p2
+                x, y = p3
+            elif upper == "Q" or upper == "T":
+                if upper == "Q":
+                    p1 = (values[0] + ox, values[1] + oy)
+                    values = values[2:]
+                elif last == "Q" or last == "T":
+                    p1 = (2 * x - control[0], 2 * y - control[1])
+                else:
+                    p1 = (x, y)
+                p2 = (values[0] + ox, values[1] + oy)
+                subpath.append(quadratic((x, y), p1, p2, tolerance))
+                control = p1
+                x, y = p2
+            else:
+                rx, ry, rotation, large, sweep, ex, ey = values
+                ex += ox
+                ey += oy
+                subpath.append(_endpoint_arc(x, y, rx, ry, rotation, large, sweep, ex, ey, tolerance))
+                x, y = ex, ey
+            last = upper
+            values = scanner.arguments(upper)
+        command = scanner.command()
+    if len(subpath) > 1:
+        yield np.concatenate(subpath)
+
+
+def _length(value, default=0.0):
+    """
+    An svg length in user units.
+    """
+    if value is None:
+        return default
+    match = _LENGTH.match(value)
+    if match is None:
+        return default
+    number, unit = match.groups()
+    return float(number) * UNITS.get(unit, UNITS["px"]) / UNITS["px"]
+
+
+def _transform(value):
+    """
+    Matrix of an svg transform attribute.
+    """
+    matrix = np.identity(3)
+    if not value:
+        return matrix
+    for name, arguments in _TRANSFORM.findall(value):
+        values = [float(v) for v in _NUMBER.findall(arguments)]
+        if name == "matrix" and len(values) == 6:
+            a, b, c, d, e, f = values
+        elif name == "translate" and values:
+            a, b, c, d, e, f = 1.0, 0.0, 0.0, 1.0, values[0], values[1] if len(values) > 1 else 0.0
+        elif name == "scale" and values:
+            a, b, c, d, e, f = values[0], 0.0, 0.0, values[-1], 0.0, 0.0
+        elif name == "rotate" and values:
+            angle = math.radians(values[0])
+            cx, cy = values[1:3] if len(values) == 3 else (0.0, 0.0)
+            cos = math.cos(angle)
+            sin = math.sin(angle)
+            a, b, c, d = cos, sin, -sin, cos
+            e = cx - cos * cx + sin * cy
+            f = cy - sin * cx - cos * cy
+        elif name == "skewX" and values:
+            a, b, c, d, e, f = 1.0, 0.0, math.tan(math.radians(values[0])), 1.0, 0.0, 0.0
+        elif name == "skewY" and values:
+            a, b, c, d, e, f = 1.0, math.tan(math.radians(values[0])), 0.0, 1.0, 0.0, 0.0
+        else:
+            continue
+        matrix = matrix @ np.array([[a, c, e], [b, d, f], [0.0, 0.0, 1.0]])
+    return matrix
+
+
+def _viewport(element):
+    """
+    Matrix from the user units of the root svg element to mm.
+    """
+    px = UNITS["px"]
+    view_box = [float(v) for v in _NUMBER.findall(element.get("viewBox", ""))]
+    width = element.get("width")
+    height = element.get("height")
+    if width is not None and width.strip().endswith("%"):
+        width = None
+    if height is not None and height.strip().endswith("%"):
+        height = None
+    if len(view_box) != 4 or view_box[2] <= 0 or view_box[3] <= 0:
+        return np.diag((px, px, 1.0))
+    x, y, w, h = view_box
+    width = _length(width, w) * px
+    height = _length(height, h) * px
+    # preserveAspectRatio xMidYMid meet, the default.
+    scale = min(width / w, height / h)
+    dx = (width - w * scale) / 2 - x * scale
+    dy = (height - h * scale) / 2 - y * scale
+    return np.array([[scale, 0.0, dx], [0.0, scale, dy], [0.0, 0.0, 1.0]])
+
+
+def _ellipse(cx, cy, rx, ry):
+    return (
+        f"M{cx + rx},{cy}A{rx},{ry},0,1,1,{cx - rx},{cy}"
+        f"A{rx},{ry},0,1,1,{cx + rx},{cy}Z"
+    )
+
+
+def _shape(name, element, tolerance):
+    """
+    Subpaths of an svg shape element, in user units.
+    """
+    get = element.get
+    if name == "path":
+        yield from path_data(get("d", ""), tolerance)
+    elif name == "polyline" or name == "polygon":
+        values = [float(v) for v in _NUMBER.findall(get("points", ""))]
+        points = np.array(values[: len(values) // 2 * 2]).reshape(-1, 2)
+        if name == "polygon" and points.shape[0] > 1:
+            points = np.concatenate((points, points[:1]))
+        if points.shape[0] > 1:
+            yield points
+    elif name == "line":
+        yield np.array(
+            [
+                [_length(get("x1")), _length(get("y1"))],
+                [_length(get("x2")), _length(get("y2"))],
+            ]
+        )
+    elif name == "rect":
+        x, y = _length(get("x")), _length(get("y"))
+        width, height = _length(get("width")), _length(get("height"))
+        if width <= 0 or height <= 0:
+            return
+        rx = _length(get("rx"), None)
+        ry = _length(get("ry"), None)
+        rx = min(abs(rx if rx is not None else ry or 0.0), width / 2)
+        ry = min(abs(ry if ry is not None else rx), height / 2)
+        if not rx or not ry:
+            d = f"M{x},{y}h{width}v{height}h{-width}Z"
+        else:
+            d = (
+                f"M{x + rx},{y}h{width - 2 * rx}a{rx},{ry},0,0,1,{rx},{ry}v{height - 2 * ry}"
+                f"a{rx},{ry},0,0,1,{-rx},{ry}h{2 * rx - width}a{rx},{ry},0,0,1,{-rx},{-ry}"
+                f"v{2 * ry - height}a{rx},{ry},0,0,1,{rx},{-ry}Z"
+            )
+        yield from path_data(d, tolerance)
+    elif name == "circle" or name == "ellipse":
+        if name == "circle":
+            rx = ry = _length(get("r"))
+        else:
+            rx, ry = _length(get("rx")), _length(get("ry"))
+        if rx > 0 and ry > 0:
+            yield from path_data(_ellipse(_length(get("cx")), _length(get("cy")), rx, ry), tolerance)
+
+
+def _hidden(element):
+    if element.get("display") == "none":
+        return True
+    style = element.get("style")
+    return style is not None and "display:none" in style.replace(" ", "")
+
+
+def read_svg(source, tolerance=0.01):
+    """
+    Paths of an svg file, as the file is parsed.
+
+    @param source: file name or binary file object.
+    @param tolerance: largest distance of the paths from the curves they flatten, in mm.
+    @return: generator of (N, 2) arrays in mm.
+    """
+    # Matrix to mm, its largest stretch and whether hidden, of each open element.
+    stack = []
+    elements = []
+    for event, element in ElementTree.iterparse(source, events=("start", "end")):
+        if event == "end":
+            stack.pop()
+            elements.pop()
+            element.clear()
+            if elements:
+                # Every earlier sibling ended too, none is needed again.
+                del elements[-1][:]
+            continue
+        name = element.tag.rpartition("}")[2]
+        transform = element.get("transform")
+        if not stack:
+            matrix = _viewport(element) @ _transform(transform)
+            scale = np.linalg.norm(matrix[:2, :2], 2)
+            hidden = _hidden(element)
+        else:
+            matrix, scale, hidden = stack[-1]
+            hidden = hidden or name in _HIDDEN or _hidden(element)
+            if transform is not None:
+                matrix = matrix @ _transform(transform)
+                scale = np.linalg.norm(matrix[:2, :2], 2)
+        stack.append((matrix, scale, hidden))
+        elements.append(element)
+        if hidden or not scale or name not in _SHAPES:
+            continue
+        for points in _shape(name, element, tolerance / scale):
+            yield points @ matrix[:2, :2].T + matrix[:2, 2]
+
+
+#######################
+# DXF
+#######################
+
+# mm of each $INSUNITS.
+DXF_UNITS = {
+    0: 1.0,
+    1: 25.4,
+    2: 304.8,
+    3: 1609344.0,
+    4: 1.0,
+    5: 10.0,
+    6: 1000.0,
+    7: 1000000.0,
+    8: 0.0000254,
+    9: 0.0254,
+    10: 914.4,
+    13: 0.001,
+    14: 100.0,
+}
+
+
+def _pairs(fp):
+    """
+    Group codes and values of a dxf file.
+    """
+    for code in fp:
+        value = fp.readline()
+        try:
+            yield int(code), value.strip()
+        except ValueError:
+            raise ValueError(f"Invalid dxf group code {code.strip()!r}.") from None
+
+
+def _bulge(x1, y1, x2, y2, bulge, tolerance):
+    """
+    Points of the arc of a polyline segment after its start, bulge being the tangent of a quarter of its angle,
+    counterclockwise if positive.
+    """
+    if not bulge:
+        return np.array([[x2, y2]])
+    dx = x2 - x1
+    dy = y2 - y1
+    chord = math.hypot(dx, dy)
+    if not chord:
+        return np.zeros((0, 2))
+    angle = 4 * math.atan(bulge)
+    # Distance of the center from the middle of the chord, to its left when counterclockwise.
+    offset = chord / 2 / math.tan(angle / 2)
+    cx = (x1 + x2) / 2 - dy / chord * offset
+    cy = (y1 + y2) / 2 + dx / chord * offset
+    radius = math.hypot(x1 - cx, y1 - cy)
+    start = math.atan2(y1 - cy, x1 - cx)
+    points = elliptical_arc(cx, cy, radius, radius, 0.0, start, angle, tolerance)
+    points[-1] = (x2, y2)
+    return points
+
+
+def _entity(kind, groups, tolerance):
+    """
+    Path of a dxf entity, in its units and object coordinates.
+    """
+    values = dict(groups)
+    if kind == "LINE":
+        return np.array(
+            [
+                [float(values.get(10, 0)), float(values.get(20, 0))],
+                [float(values.get(11, 0)), float(values.get(21, 0))],
+            ]
+        )
+    if kind == "CIRCLE" or kind == "ARC":
+        cx = float(values.get(10, 0))
+        cy = float(values.get(20, 0))
+        radius = float(values.get(40, 0))
+        if radius <= 0:
+            return None
+        if kind == "CIRCLE":
+            start, sweep = 0.0, 2 * math.pi
+        else:
+            start = math.radians(float(values.get(50, 0)))
+            sweep = (math.radians(float(values.get(51, 0))) - start) % (2 * math.pi) or 2 * math.pi
+        first = np.array([[cx + radius * math.cos(start), cy + radius * math.sin(start)]])
+        return np.concatenate(
+            (first, elliptical_arc(cx, cy, radius, radius, 0.0, start, sweep, tolerance))
+        )
+    if kind == "LWPOLYLINE":
+        vertices = []
+        for code, value in groups:
+            if code == 10:
+                vertices.append([float(value), 0.0, 0.0])
+            elif vertices and code == 20:
+                vertices[-1][1] = float(value)
+            elif vertices and code == 42:
+                vertices[-1][2] = float(value)
+        if len(vertices) < 2:
+            return None
+        if int(values.get(70, 0)) & 1:
+            vertices.append(vertices[0])
+        points = [np.array([vertices[0][:2]])]
+        for (x1, y1, bulge), (x2, y2, _) in zip(vertices, vertices[1:]):
+            points.append(_bulge(x1, y1, x2, y2, bulge, tolerance))
+        return np.concatenate(points)
+    return None
+
+
+def read_dxf(source, tolerance=0.01):
+    """
+    Paths of the entities of a dxf file, as the file is parsed.
+
+    @param source: file name or file object.
+    @param tolerance: largest distance of the paths from the arcs they flatten, in mm.
+    @return: generator of (N, 2) arrays in mm.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, encoding="utf-8", errors="replace") as fp:
+            yield from read_dxf(fp, tolerance)
+        return
+    if isinstance(source, io.BufferedIOBase) or "b" in getattr(source, "mode", ""):
+        source = io.TextIOWrapper(source, encoding="utf-8", errors="replace")
+    scale = 1.0
+    section = None
+    variable = None
+    kind = None
+    groups = []
+    for code, value in _pairs(source):
+        if code == 0:
+            if kind is not None:
+                points = _entity(kind, groups, tolerance / scale)
+                if points is not None:
+                    if float(dict(groups).get(230, 1)) < 0:
+                        # Extruded towards -z, the object x axis is the world -x axis.
+                        points[:, 0] = -points[:, 0]
+                    yield points * scale
+            kind = None
+            if value == "ENDSEC":
+                section = None
+            elif section == "ENTITIES" and value != "SECTION":
+                kind = value
+                groups = []
+            elif value == "SECTION":
+                section = ""
+            elif value == "EOF":
+                return
+        elif section == "":
+            if code == 2:
+                section = value
+        elif section == "HEADER":
+            if code == 9:
+                variable = value
+            elif code == 70 and variable == "$INSUNITS":
+                scale = DXF_UNITS.get(int(value), 1.0)
+        elif kind is not None:
+            groups.append((code, value))
+
+
+#######################
+# FILES
+#######################
+
+FORMATS = {".svg": read_svg, ".dxf": read_dxf}
+
+
+def read_paths(source, tolerance=0.01, file_format=None):
+    """
+    Paths of an svg or dxf file, as the file is parsed.
+
+    @param source: file name or file object, binary for svg.
+    @param tolerance: largest distance of the paths from the curves they flatten, in mm.
+    @param file_format: "svg" or "dxf", None infers it from the file name.
+    @return: generator of (N, 2) arrays in mm.
+    """
+    if file_format is None:
+        name = source if isinstance(source, (str, os.PathLike)) else getattr(source, "name", "")
+        file_format = os.path.splitext(os.fspath(name))[1]
+    else:
+        file_format = "." + file_format.lstrip(".")
+    try:
+        reader = FORMATS[file_format.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown vector file format {file_format!r}.") from None
+    return reader(source, tolerance)
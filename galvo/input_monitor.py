@@ -0,0 +1,227 @@
+"""
+Galvo Input Monitor
+
+The input monitor polls the input port of the controller board on a background thread. Changes are debounced, requiring
+the same value to be read several times in a row, and then delivered as edge-triggered callbacks or to threads waiting
+for a given input state. This permits foot-pedals and part-present sensors to trigger jobs.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class InputMonitor:
+    def __init__(self, controller, interval=0.005, passes_required=None, read=None):
+        """
+        @param controller: GalvoController whose inputs are monitored.
+        @param interval: seconds between polls of the input port.
+        @param passes_required: consecutive equal reads needed to accept a change, defaults to input_passes_required.
+        @param read: function returning the 16 input bits, defaults to reading the port of the controller.
+        """
+        self.controller = controller
+        self.interval = interval
+        if passes_required is None:
+            passes_required = controller.input_passes_required
+        self.passes_required = max(1, passes_required)
+        if read is None:
+            read = self._read_port
+        self._read = read
+        self._watchers = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+        self.state = None
+        # Seconds between checks of the controller for a shutdown or abort ending a wait.
+        self.cancel_interval = 0.05
+        self._candidate = None
+        self._candidate_passes = 0
+        self._candidate_time = None
+
+        self.polls = 0
+        self.changes = 0
+        self.latencies = deque(maxlen=1000)
+        self._start_time = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _read_port(self):
+        return self.controller.read_port()[1]
+
+    @property
+    def is_running(self):
+        return self._running
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self.interrupt()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self._thread = None
+
+    #######################
+    # WATCHERS
+    #######################
+
+    def on_change(self, mask, callback):
+        """
+        Calls callback(old, new) when any of the masked input bits change.
+
+        @param mask: input bits to watch.
+        @param callback: called with the old and new debounced input states.
+        @return: callback
+        """
+        self._watchers.append((mask, None, callback))
+        return callback
+
+    def on_match(self, mask, value, callback):
+        """
+        Calls callback(state) when the masked input bits change to match value.
+
+        @param mask: input bits to watch.
+        @param value: values of the masked bits to match.
+        @param callback: called with the new debounced input state.
+        @return: callback
+        """
+        self._watchers.append((mask, value & mask, callback))
+        return callback
+
+    def interrupt(self):
+        """
+        Wakes the threads waiting for inputs, to check whether the controller was shut down, aborted or stopped
+        sending.
+        """
+        with self._condition:
+            self._condition.notify_all()
+
+    def _cancelled(self, aborts):
+        controller = self.controller
+        if controller._shutdown or not controller._sending:
+            return True
+        # Aborted since the wait began, an abort of an earlier job does not end it.
+        return controller.aborts != aborts[0] or (controller._aborted.is_set() and not aborts[1])
+
+    def remove(self, callback):
+        self._watchers = [w for w in self._watchers if w[2] is not callback]
+
+    def matches(self, mask, value):
+        state = self.state
+        return state is not None and (state ^ value) & mask == 0
+
+    def wait_for(self, mask, value, timeout=None, edge=False):
+        """
+        Blocks until the masked input bits match value.
+
+        @param mask: input bits to wait for.
+        @param value: values of the masked bits to wait for.
+        @param timeout: seconds to wait, None waits until matched, stopped, or the controller is shut down, aborted or
+            stops sending during the wait.
+        @param edge: if True, an input already matching does not count. The inputs must change to match.
+        @return: whether the inputs matched.
+        """
+        if not self._running:
+            self.start()
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        aborts = self.controller.aborts, self.controller._aborted.is_set()
+        with self._condition:
+            changes = self.changes
+            while self._running:
+                if self.matches(mask, value) and (not edge or self.changes != changes):
+                    return True
+                if self._cancelled(aborts):
+                    return False
+                wait = self.cancel_interval
+                if deadline is not None:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        return False
+                    wait = min(wait, remaining)
+                self._condition.wait(wait)
+        return False
+
+    #######################
+    # POLLING
+    #######################
+
+    def poll(self):
+        """
+        Reads the inputs once, debouncing and dispatching any change.
+
+        @return: debounced input state.
+        """
+        value = self._read()
+        now = time.perf_counter()
+        self.polls += 1
+        if value is None or value < 0:
+            # Not connected or not sending.
+            return self.state
+        if value == self.state:
+            self._candidate = None
+            return self.state
+        if value != self._candidate:
+            self._candidate = value
+            self._candidate_passes = 0
+            self._candidate_time = now
+        self._candidate_passes += 1
+        if self._candidate_passes >= self.passes_required:
+            self._accept(value, self._candidate_time)
+        return self.state
+
+    def _accept(self, value, first_seen):
+        old = self.state
+        with self._condition:
+            self.state = value
+            self.changes += 1
+            self._candidate = None
+            self._condition.notify_all()
+        if old is not None:
+            for mask, match, callback in self._watchers:
+                if (old ^ value) & mask == 0:
+                    continue
+                if match is None:
+                    callback(old, value)
+                elif value & mask == match:
+                    callback(value)
+        self.latencies.append(time.perf_counter() - first_seen)
+
+    def _run(self):
+        while self._running:
+            try:
+                self.poll()
+            except (ConnectionError, ConnectionRefusedError):
+                pass
+            time.sleep(self.interval)
+
+    def stats(self):
+        """
+        Polling rate achieved and latency from the first read of a changed input to its callbacks completing.
+
+        @return: dict of statistics.
+        """
+        elapsed = 0.0
+        if self._start_time is not None:
+            elapsed = time.perf_counter() - self._start_time
+        latencies = list(self.latencies)
+        return {
+            "polls": self.polls,
+            "poll_rate": self.polls / elapsed if elapsed else 0.0,
+            "changes": self.changes,
+            "latency_min": min(latencies) if latencies else None,
+            "latency_mean": sum(latencies) / len(latencies) if latencies else None,
+            "latency_max": max(latencies) if latencies else None,
+        }
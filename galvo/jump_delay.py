@@ -0,0 +1,61 @@
+"""
+Galvo Jump Delay
+
+The jump delay is the time the galvos are given to settle after a jump. Short jumps settle quickly and long jumps
+slowly, so a single delay either wastes time on short jumps or under-settles long ones. The jump delay model gives the
+delay of each jump from its distance, interpolated within a table of distances and delays.
+"""
+
+from bisect import bisect_right
+
+import numpy as np
+
+
+class JumpDelayModel:
+    def __init__(self, curve):
+        """
+        @param curve: sequence of (distance, delay) pairs, distances in galvo units and delays in microseconds of at
+            least 1. Delays are interpolated between the given distances and held beyond the first and last.
+        """
+        curve = tuple(sorted((float(d), float(delay)) for d, delay in curve))
+        if not curve:
+            raise ValueError("Jump delay curve requires at least one point.")
+        self.curve = curve
+        self._distances = np.array([d for d, delay in curve])
+        self._delays = np.array([delay for d, delay in curve])
+        self._points = [d for d, delay in curve]
+
+    def __eq__(self, other):
+        if not isinstance(other, JumpDelayModel):
+            return NotImplemented
+        return self.curve == other.curve
+
+    def __repr__(self):
+        return f"JumpDelayModel({list(self.curve)!r})"
+
+    def delay(self, distance):
+        """
+        Delay of a single jump.
+
+        @param distance: distance of the jump in galvo units.
+        @return: delay in whole microseconds.
+        """
+        curve = self.curve
+        index = bisect_right(self._points, distance)
+        if index == 0:
+            return int(round(curve[0][1]))
+        if index == len(curve):
+            return int(round(curve[-1][1]))
+        d0, delay0 = curve[index - 1]
+        d1, delay1 = curve[index]
+        return int(round(delay0 + (delay1 - delay0) * (distance - d0) / (d1 - d0)))
+
+    def delays(self, distances):
+        """
+        Delays of many jumps.
+
+        @param distances: array of distances of the jumps in galvo units.
+        @return: int64 array of delays in whole microseconds.
+        """
+        delays = np.interp(distances, self._distances, self._delays)
+        return np.rint(delays).astype(np.int64)
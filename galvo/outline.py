@@ -0,0 +1,241 @@
+"""
+Galvo Outline
+
+Outlines of a job for aiming. The marked paths of a job are taken from input geometry, from captured list commands or
+from recorded commands, and reduced to decimated paths, the convex hull or the bounding box. The level of detail may be
+chosen so that the outline can be lit at a target refresh rate.
+"""
+
+import numpy as np
+
+from .consts import listJumpTo, listMarkTo
+
+OUTLINE_DETAILS = ("paths", "hull", "box")
+
+
+def _command_words(source):
+    """
+    List command words of captured commands or of a recorder, realtime commands excluded.
+    """
+    if hasattr(source, "opcode") and hasattr(source, "realtime"):
+        words = np.column_stack(
+            [
+                np.frombuffer(source.opcode, dtype=np.uint16),
+                np.frombuffer(source.v1, dtype=np.uint16),
+                np.frombuffer(source.v2, dtype=np.uint16),
+            ]
+        )
+        return words[np.frombuffer(source.realtime, dtype=np.uint8) == 0]
+    data = bytes(source)
+    return np.frombuffer(data, dtype="<u2").reshape(-1, 6)[:, :3]
+
+
+def marked_paths(source, start=(0x8000, 0x8000)):
+    """
+    Marked paths of a job.
+
+    @param source: CapturedList, RecorderConnection, an (N, 2) path or a sequence of paths.
+    @param start: position before the first command, for recorded commands.
+    @return: list of (N, 2) float arrays.
+    """
+    state = getattr(source, "start", None)
+    if isinstance(state, dict):
+        # Captured commands start from the position they were captured from.
+        start = state["_last_x"], state["_last_y"]
+    if isinstance(source, np.ndarray) and source.ndim == 2:
+        return [source.astype(np.float64)]
+    if isinstance(source, (list, tuple, np.ndarray)):
+        return [np.asarray(path, dtype=np.float64).reshape(-1, 2) for path in source]
+    words = _command_words(source)
+    moves = words[(words[:, 0] == listJumpTo) | (words[:, 0] == listMarkTo)]
+    points = np.empty((moves.shape[0] + 1, 2), dtype=np.float64)
+    points[0] = start
+    points[1:] = moves[:, 1:3]
+    marks = np.zeros(points.shape[0], dtype=bool)
+    marks[1:] = moves[:, 0] == listMarkTo
+    # A path is a run of marks, together with the position the first mark started from.
+    starts = np.flatnonzero(~marks[:-1] & marks[1:])
+    ends = np.flatnonzero(marks & ~np.append(marks[1:], False))
+    paths = [points[first : last + 1] for first, last in zip(starts, ends)]
+    return paths
+
+
+def bounding_box(points):
+    """
+    Closed path around the bounding box of the points.
+
+    @param points: (N, 2) array.
+    @return: (5, 2) array.
+    """
+    x0, y0 = points.min(axis=0)
+    x1, y1 = points.max(axis=0)
+    return np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]])
+
+
+def _cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def convex_hull(points):
+    """
+    Closed path around the convex hull of the points.
+
+    Points within the octagon of the extreme points cannot be on the hull and are discarded at once, the remaining
+    points are joined by the monotone chain algorithm.
+
+    @param points: (N, 2) array.
+    @return: (M, 2) array.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if points.shape[0] > 8:
+        x = points[:, 0]
+        y = points[:, 1]
+        extremes = points[
+            [
+                np.argmin(x),
+                np.argmin(x + y),
+                np.argmin(y),
+                np.argmax(x - y),
+                np.argmax(x),
+                np.argmax(x + y),
+                np.argmax(y),
+                np.argmin(x - y),
+            ]
+        ]
+        following = np.roll(extremes, -1, axis=0)
+        edge = following - extremes
+        # Counter-clockwise octagon, points left of every edge are strictly inside.
+        side = edge[:, 0] * (y[:, None] - extremes[:, 1]) - edge[:, 1] * (
+            x[:, None] - extremes[:, 0]
+        )
+        points = points[~np.all(side > 0, axis=1)]
+    points = np.unique(points, axis=0)
+    if points.shape[0] < 3:
+        return np.concatenate((points, points[:1]))
+    hull = []
+    for sequence in (points, points[::-1]):
+        chain = []
+        for p in sequence.tolist():
+            while len(chain) >= 2 and _cross(chain[-2], chain[-1], p) <= 0:
+                chain.pop()
+            chain.append(p)
+        hull.extend(chain[:-1])
+    hull.append(hull[0])
+    return np.array(hull)
+
+
+def decimate(path, tolerance):
+    """
+    Ramer-Douglas-Peucker decimation, removing points closer than tolerance to the line through those kept.
+
+    @param path: (N, 2) array.
+    @param tolerance: largest distance of a removed point from the decimated path.
+    @return: (M, 2) array.
+    """
+    count = path.shape[0]
+    if tolerance <= 0 or count < 3:
+        return path
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start = path[first]
+        chord = path[last] - start
+        offsets = path[first + 1 : last] - start
+        length = np.hypot(chord[0], chord[1])
+        if length:
+            distances = np.abs(chord[0] * offsets[:, 1] - chord[1] * offsets[:, 0])
+            distances /= length
+        else:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            index += first + 1
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return path[keep]
+
+
+def outline(source, detail="hull", tolerance=0.0, start=(0x8000, 0x8000)):
+    """
+    Outline of a job at the given level of detail.
+
+    @param source: CapturedList, RecorderConnection, an (N, 2) path or a sequence of paths.
+    @param detail: "paths", "hull" or "box".
+    @param tolerance: decimation tolerance of "paths", in galvo units.
+    @param start: position before the first command, for recorded commands.
+    @return: list of (N, 2) arrays.
+    """
+    if detail not in OUTLINE_DETAILS:
+        raise ValueError(f"Outline detail must be one of {OUTLINE_DETAILS}")
+    paths = [path for path in marked_paths(source, start) if path.shape[0]]
+    if not paths:
+        return []
+    if detail == "paths":
+        return [decimate(path, tolerance) for path in paths]
+    points = np.concatenate(paths)
+    if detail == "hull":
+        return [convex_hull(points)]
+    return [bounding_box(points)]
+
+
+def frame_time(paths, light_speed, dark_speed, jump_delay=0.0):
+    """
+    Seconds to light the paths once, returning to the start.
+
+    @param paths: list of (N, 2) arrays in galvo units.
+    @param light_speed: lit speed in galvo units per second.
+    @param dark_speed: unlit speed in galvo units per second.
+    @param jump_delay: delay after each move, in seconds.
+    @return:
+    """
+    if not paths:
+        return 0.0
+    lit = sum(float(np.hypot(*np.diff(path, axis=0).T).sum()) for path in paths)
+    ends = np.array([path[-1] for path in paths])
+    starts = np.roll(np.array([path[0] for path in paths]), -1, axis=0)
+    dark = float(np.hypot(*(starts - ends).T).sum())
+    moves = sum(path.shape[0] for path in paths)
+    return lit / light_speed + dark / dark_speed + moves * jump_delay
+
+
+def adaptive_outline(source, controller, refresh_rate=20.0, start=(0x8000, 0x8000)):
+    """
+    Most detailed outline that can be lit at the refresh rate with the speeds and jump delay of the controller.
+
+    The paths are tried with increasing decimation tolerance, then the convex hull, then the bounding box.
+
+    @param source: CapturedList, RecorderConnection, an (N, 2) path or a sequence of paths.
+    @param controller: GalvoController whose light speed is used.
+    @param refresh_rate: frames per second required.
+    @param start: position before the first command, for recorded commands.
+    @return: paths, detail, tolerance
+    """
+    settings = controller.settings
+    units = abs(settings.galvos_per_mm)
+    light_speed = (settings.light_speed or settings.travel_speed) * units
+    dark_speed = (settings.dark_speed or settings.travel_speed) * units
+    jump_delay = (settings.delay_jump_short or 0) / 1e6
+    budget = 1.0 / refresh_rate
+
+    paths = [path for path in marked_paths(source, start) if path.shape[0]]
+    if not paths:
+        return [], "box", 0.0
+    points = np.concatenate(paths)
+    size = float(np.max(points.max(axis=0) - points.min(axis=0)))
+    tolerance = 0.0
+    while tolerance <= size / 16:
+        decimated = [decimate(path, tolerance) for path in paths]
+        if frame_time(decimated, light_speed, dark_speed, jump_delay) <= budget:
+            return decimated, "paths", tolerance
+        tolerance = max(1.0, tolerance * 4)
+    for detail in ("hull", "box"):
+        reduced = outline(paths, detail)
+        if detail == "box" or (
+            frame_time(reduced, light_speed, dark_speed, jump_delay) <= budget
+        ):
+            return reduced, detail, 0.0
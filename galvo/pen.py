@@ -0,0 +1,183 @@
+"""
+Galvo Pens
+
+A pen is a named set of laser parameters. Pens are compiled once into the encoded list commands needed to set those
+parameters, so switching between pens in a job copies pre-packed commands rather than converting and packing each
+parameter again.
+"""
+
+import struct
+
+from .consts import *
+
+PEN_PARAMETERS = (
+    "mark_speed",
+    "travel_speed",
+    "power",
+    "fpk",
+    "frequency",
+    "pulse_width",
+    "delay_on",
+    "delay_off",
+    "delay_polygon",
+)
+
+
+def _pack(command, v1=0, v2=0, v3=0, v4=0, v5=0):
+    return struct.pack(
+        "<6H", int(command), int(v1), int(v2), int(v3), int(v4), int(v5)
+    )
+
+
+def _pack_delay(command, delay):
+    return _pack(command, abs(delay), 0x0000 if delay > 0 else 0x8000)
+
+
+class Pen:
+    """
+    Named laser parameters, as accepted by `GalvoController.set()`.
+
+    The compiled form is a tuple of `(cache_attribute, value, packed_command)` entries in the same order `set()` would
+    emit them. The cache_attribute is the controller attribute holding the value the board was last sent.
+    """
+
+    def __init__(
+        self,
+        name,
+        mark_speed=None,
+        travel_speed=None,
+        power=None,
+        fpk=None,
+        frequency=None,
+        pulse_width=None,
+        delay_on=None,
+        delay_off=None,
+        delay_polygon=None,
+    ):
+        self.name = name
+        self.mark_speed = mark_speed
+        self.travel_speed = travel_speed
+        self.power = power
+        self.fpk = fpk
+        self.frequency = frequency
+        self.pulse_width = pulse_width
+        self.delay_on = delay_on
+        self.delay_off = delay_off
+        self.delay_polygon = delay_polygon
+        self._compiled = {}
+
+    def __setattr__(self, key, value):
+        object.__setattr__(self, key, value)
+        if key in PEN_PARAMETERS:
+            # Compiled commands are stale.
+            object.__setattr__(self, "_compiled", {})
+
+    def __repr__(self):
+        parameters = ", ".join(f"{p}={getattr(self, p)!r}" for p in PEN_PARAMETERS)
+        return f"Pen({self.name!r}, {parameters})"
+
+    def parameters(self):
+        return {p: getattr(self, p) for p in PEN_PARAMETERS}
+
+    def settings(self):
+        """
+        The controller settings set by this pen.
+
+        @return: tuples of setting name and value.
+        """
+        return (
+            ("mark_speed", self.mark_speed),
+            ("travel_speed", self.travel_speed),
+            ("power", self.power),
+            ("fpk", self.fpk),
+            ("frequency", self.frequency),
+            ("pulse_width", self.pulse_width),
+            ("delay_laser_on", self.delay_on),
+            ("delay_laser_off", self.delay_off),
+            ("delay_polygon", self.delay_polygon),
+        )
+
+    def compile(self, controller):
+        """
+        Compiles the pen for the source and unit conversions of the given controller.
+
+        @param controller: GalvoController whose source and galvos_per_mm are used, and for co2 pens without a
+            frequency its frequency.
+        @return: compiled entries, and the packed block of all entries.
+        """
+        frequency = self.frequency
+        if frequency is None and controller.source == "co2":
+            # The power ratio and first pulse killer are relative to the frequency, that last sent to the board, else
+            # the frequency setting, sent with them.
+            frequency = controller._frequency
+            if frequency is None:
+                frequency = controller.settings.frequency
+        key = (controller.source, controller.galvos_per_mm, frequency)
+        try:
+            return self._compiled[key]
+        except KeyError:
+            pass
+        entries = []
+        if self.travel_speed:
+            speed = min(controller._convert_speed(self.travel_speed), 0xFFFF)
+            entries.append(
+                ("_travel_speed", self.travel_speed, _pack(listJumpSpeed, speed))
+            )
+        if controller.source == "co2":
+            if frequency is not None:
+                period = controller._convert_frequency(frequency, base=10000.0)
+                entries.append(("_frequency", frequency, _pack(listMarkFreq, period)))
+            if self.fpk is not None:
+                first_pulse_killer = int(round(2000.0 / frequency))
+                entries.append(
+                    (
+                        "_fpk",
+                        self.fpk,
+                        _pack(listSetCo2FPK, first_pulse_killer, first_pulse_killer),
+                    )
+                )
+            if self.power is not None:
+                power_ratio = int(round(200 * self.power / frequency))
+                entries.append(
+                    ("_power", self.power, _pack(listMarkPowerRatio, power_ratio))
+                )
+        elif controller.source == "fiber":
+            if self.pulse_width is not None:
+                entries.append(
+                    (
+                        "_pulse_width",
+                        self.pulse_width,
+                        _pack(listFiberYLPMPulseWidth, self.pulse_width),
+                    )
+                )
+            if self.power is not None:
+                current = controller._convert_power(self.power)
+                entries.append(("_power", self.power, _pack(listMarkCurrent, current)))
+            if frequency is not None:
+                period = controller._convert_frequency(frequency, base=20000.0)
+                entries.append(
+                    ("_frequency", frequency, _pack(listQSwitchPeriod, period))
+                )
+        speed = min(controller._convert_speed(self.mark_speed), 0xFFFF)
+        entries.append(("_speed", self.mark_speed, _pack(listMarkSpeed, speed)))
+        entries.append(
+            ("_delay_on", self.delay_on, _pack_delay(listLaserOnDelay, self.delay_on))
+        )
+        entries.append(
+            (
+                "_delay_off",
+                self.delay_off,
+                _pack_delay(listLaserOffDelay, self.delay_off),
+            )
+        )
+        entries.append(
+            (
+                "_delay_poly",
+                self.delay_polygon,
+                _pack_delay(listPolygonDelay, self.delay_polygon),
+            )
+        )
+        entries = tuple(entries)
+        compiled = entries, b"".join(e[2] for e in entries)
+        self._compiled[key] = compiled
+        return compiled
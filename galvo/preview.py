@@ -0,0 +1,122 @@
+"""
+Galvo Preview
+
+A light preview is a spooler job cycling the same outline in light until stopped. The outline is captured into list
+commands once and the captured commands are written again for each frame, so an unchanging preview costs no more than
+copying its commands into the list. The preview is only rebuilt when it is updated.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class LightPreview:
+    def __init__(self, paths=None, draw=None, abort_on_change=True):
+        """
+        @param paths: sequence of (N, 2) positions in galvo units, each lit after a dark move to its first point.
+        @param draw: function drawing the preview, given the controller. Used instead of paths.
+        @param abort_on_change: abort the frames already sent when the preview is updated, so the update shows at once.
+        """
+        self.abort_on_change = abort_on_change
+        self._lock = threading.Lock()
+        self._draw = None
+        self._changed = False
+        self._stopped = False
+        self._frame = None
+
+        self.frames = 0
+        self.builds = 0
+        self._frame_times = deque(maxlen=100)
+        self.update(paths, draw=draw)
+
+    def __call__(self, controller):
+        """
+        Spooler job, writes one frame of the preview.
+
+        @param controller: GalvoController
+        @return: whether the preview is finished.
+        """
+        if self._stopped:
+            return True
+        with self._lock:
+            changed = self._changed
+            draw = self._draw
+            self._changed = False
+        if changed and self._frame is not None and self.abort_on_change:
+            controller.abort()
+        controller.lighting_configuration()
+        if changed:
+            self._frame = self.build(controller, draw)
+        controller.write_captured(self._frame)
+        self.frames += 1
+        self._frame_times.append(time.perf_counter())
+        return False
+
+    def update(self, paths=None, draw=None):
+        """
+        Replaces what is previewed, the preview is rebuilt before the next frame.
+
+        @param paths: sequence of (N, 2) positions in galvo units, each lit after a dark move to its first point.
+        @param draw: function drawing the preview, given the controller. Used instead of paths.
+        @return:
+        """
+        if draw is None:
+            paths = [] if paths is None else list(paths)
+
+            def draw(c):
+                for path in paths:
+                    points = iter(path)
+                    for x, y in points:
+                        c.dark(int(x), int(y))
+                        break
+                    for x, y in points:
+                        c.light(int(x), int(y))
+
+        with self._lock:
+            self._draw = draw
+            self._changed = True
+
+    def stop(self):
+        """
+        Ends the preview, the spooler removes it at its next frame.
+
+        @return:
+        """
+        self._stopped = True
+
+    def build(self, controller, draw):
+        """
+        Captures a frame of the preview. Frames follow one another, so the frame is captured as repeating.
+
+        @param controller: GalvoController
+        @param draw: function drawing the preview.
+        @return: CapturedList
+        """
+        frame = controller.capture_repeating(draw)
+        self.builds += 1
+        return frame
+
+    @property
+    def frame(self):
+        return self._frame
+
+    @property
+    def frames_sent_per_s(self):
+        """
+        Frames per second written to the list over the recent frames. Once the board buffers are full the host writes
+        frames as fast as they are drawn, though it runs ahead of the board by the frames buffered.
+        """
+        times = self._frame_times
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def stats(self):
+        frame = self._frame
+        return {
+            "frames": self.frames,
+            "builds": self.builds,
+            "frames_sent_per_s": self.frames_sent_per_s,
+            "commands_per_frame": len(frame) if frame is not None else 0,
+        }
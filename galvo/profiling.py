@@ -0,0 +1,243 @@
+"""
+Galvo Profiling
+
+Optional instrumentation of a controller: the commands sent by opcode, the bytes and packets sent, and the time spent
+sending and waiting for the board to be ready. The profiler replaces the `send` and `wait_ready` methods of the
+controller instance while attached, so a controller without a profiler runs the methods unchanged.
+
+List commands are counted when their packet is sent, whether written one at a time, in bulk or from captured lists.
+Rather than counting the opcodes of each packet as it is sent, packets are tallied by their sequence of opcodes and each
+distinct sequence is counted once with numpy. The packets of a job repeat few sequences, so the cost per packet stays
+small against building it. The padding filling the end of a packet, end of list commands or the delays of no time of
+a packet flushed part way, is counted on its own.
+"""
+
+import struct
+import time
+
+from .consts import listDelayTime, listEndOfList, list_command_lookup, single_command_lookup
+
+# Distinct opcode sequences tallied before counting them.
+SEQUENCES = 256
+
+_END_OF_LIST = bytes((listEndOfList & 0xFF,))
+_DELAY_NOP = struct.pack("<6H", listDelayTime, 0, 0, 0, 0, 0)
+
+
+def _padding(data, opcodes):
+    """
+    Commands padding the end of a list packet.
+
+    @param data: list packet.
+    @param opcodes: low byte of the opcode of each command of the packet.
+    @return: number of commands of padding.
+    """
+    count = len(opcodes) - len(opcodes.rstrip(_END_OF_LIST))
+    if count:
+        return count
+    count = len(opcodes) - len(opcodes.rstrip(_DELAY_NOP[:1]))
+    while count and data[-12 * count :] != _DELAY_NOP * count:
+        count -= 1
+    return count
+
+
+class Profiler:
+    def __init__(self):
+        self.controller = None
+        self._sequences = {}
+        self._list_counts = None
+        self.reset()
+
+    def reset(self):
+        self._flush()
+        self._list_counts = None
+        self.realtime_counts = {}
+        self.bytes_sent = 0
+        self.padding_commands = 0
+        self.list_packets = 0
+        self.realtime_packets = 0
+        self.send_time = 0.0
+        self.wait_ready_time = 0.0
+        self.wait_ready_calls = 0
+        self.start_time = time.perf_counter()
+
+    def attach(self, controller):
+        """
+        Instruments the controller.
+
+        @param controller: GalvoController
+        @return:
+        """
+        if self.controller is not None:
+            self.detach()
+        self.controller = controller
+        cls = type(controller)
+        send = cls.send.__get__(controller)
+        wait_ready = cls.wait_ready.__get__(controller)
+        clock = time.perf_counter
+        sequences = self._sequences
+
+        def profiled_send(data, read=True):
+            start = clock()
+            result = send(data, read)
+            self.send_time += clock() - start
+            self.bytes_sent += len(data)
+            if len(data) == 0xC00:
+                self.list_packets += 1
+                # Low byte of each opcode, all list opcodes being 0x80xx.
+                key = bytes(data[0::12])
+                padding = _padding(data, key)
+                if padding:
+                    self.padding_commands += padding
+                    key = key[:-padding]
+                sequences[key] = sequences.get(key, 0) + 1
+                if len(sequences) > SEQUENCES:
+                    self._flush()
+            else:
+                self.realtime_packets += 1
+                opcode = data[0] | data[1] << 8
+                counts = self.realtime_counts
+                counts[opcode] = counts.get(opcode, 0) + 1
+            return result
+
+        def profiled_wait_ready():
+            start = clock()
+            wait_ready()
+            self.wait_ready_time += clock() - start
+            self.wait_ready_calls += 1
+
+        controller.send = profiled_send
+        controller.wait_ready = profiled_wait_ready
+
+    def detach(self):
+        """
+        Removes the instrumentation, the counts are kept.
+
+        @return:
+        """
+        controller = self.controller
+        if controller is None:
+            return
+        for name in ("send", "wait_ready"):
+            controller.__dict__.pop(name, None)
+        self._flush()
+        self.controller = None
+
+    def _flush(self):
+        sequences = self._sequences
+        if not sequences:
+            return
+        import numpy as np
+
+        counts = np.zeros(0x100, dtype=np.int64)
+        for key, repeats in sequences.items():
+            counts += np.bincount(np.frombuffer(key, dtype=np.uint8), minlength=0x100) * repeats
+        if self._list_counts is not None:
+            counts += self._list_counts
+        self._list_counts = counts
+        sequences.clear()
+
+    @property
+    def list_counts(self):
+        """
+        List commands sent, by opcode, other than padding.
+        """
+        self._flush()
+        counts = self._list_counts
+        if counts is None:
+            return {}
+        return {0x8000 | int(i): int(counts[i]) for i in counts.nonzero()[0]}
+
+    def snapshot(self):
+        """
+        Counts and times so far, commands keyed by name.
+
+        @return: dict
+        """
+        list_commands = {
+            list_command_lookup.get(opcode, f"0x{opcode:04x}"): count
+            for opcode, count in self.list_counts.items()
+        }
+        realtime_commands = {
+            single_command_lookup.get(opcode, f"0x{opcode:04x}"): count
+            for opcode, count in self.realtime_counts.items()
+        }
+        return {
+            "list_commands": list_commands,
+            "realtime_commands": realtime_commands,
+            "padding_commands": self.padding_commands,
+            "bytes_sent": self.bytes_sent,
+            "list_packets": self.list_packets,
+            "realtime_packets": self.realtime_packets,
+            "send_time": self.send_time,
+            "wait_ready_time": self.wait_ready_time,
+            "wait_ready_calls": self.wait_ready_calls,
+            "elapsed": time.perf_counter() - self.start_time,
+        }
+
+    def prometheus(self, prefix="galvo", labels=None):
+        """
+        Snapshot in the Prometheus text exposition format.
+
+        @param prefix: prefix of the metric names.
+        @param labels: dict of labels added to every sample, such as the machine.
+        @return: str
+        """
+        snapshot = self.snapshot()
+        extra = "".join(f',{key}="{value}"' for key, value in (labels or {}).items())
+        plain = "{" + extra[1:] + "}" if extra else ""
+        lines = []
+
+        def metric(name, kind, description, samples):
+            lines.append(f"# HELP {prefix}_{name} {description}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for label, value in samples:
+                lines.append(f"{prefix}_{name}{label} {value}")
+
+        metric(
+            "list_commands_total",
+            "counter",
+            "List commands sent, by opcode.",
+            [
+                (f'{{opcode="{name}"{extra}}}', count)
+                for name, count in sorted(snapshot["list_commands"].items())
+            ],
+        )
+        metric(
+            "realtime_commands_total",
+            "counter",
+            "Realtime commands sent, by opcode.",
+            [
+                (f'{{opcode="{name}"{extra}}}', count)
+                for name, count in sorted(snapshot["realtime_commands"].items())
+            ],
+        )
+        metric(
+            "packets_total",
+            "counter",
+            "Packets sent, by kind.",
+            [
+                (f'{{kind="list"{extra}}}', snapshot["list_packets"]),
+                (f'{{kind="realtime"{extra}}}', snapshot["realtime_packets"]),
+            ],
+        )
+        metric(
+            "padding_commands_total",
+            "counter",
+            "Commands padding the end of list packets.",
+            [(plain, snapshot["padding_commands"])],
+        )
+        metric("bytes_sent_total", "counter", "Bytes sent.", [(plain, snapshot["bytes_sent"])])
+        metric(
+            "send_seconds_total",
+            "counter",
+            "Seconds spent sending packets and reading responses.",
+            [(plain, snapshot["send_time"])],
+        )
+        metric(
+            "wait_ready_seconds_total",
+            "counter",
+            "Seconds spent waiting for the board to be ready for a list packet.",
+            [(plain, snapshot["wait_ready_time"])],
+        )
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,256 @@
+"""
+Galvo Raster
+
+The raster engine engraves images. Each row of the image is thresholded or dithered, converted into runs of equal
+value, and written as jumps and marks directly into the list, one row at a time, so a large image is never converted
+as a whole. Grayscale images set the power of each run.
+"""
+
+import numpy as np
+
+from .consts import listJumpTo, listMarkCurrent, listMarkPowerRatio, listMarkTo
+
+RASTER_MODES = ("threshold", "dither", "grayscale")
+
+
+def bayer_matrix(order=3):
+    """
+    Ordered dither matrix of size 2**order, with values 0 to 1.
+
+    @param order:
+    @return:
+    """
+    matrix = np.zeros((1, 1))
+    for i in range(order):
+        matrix = np.block(
+            [[4 * matrix, 4 * matrix + 2], [4 * matrix + 3, 4 * matrix + 1]]
+        )
+    return (matrix + 0.5) / matrix.size
+
+
+class Raster:
+    """
+    Raster engraving of a 2D image, either 1-bit or 8-bit grayscale.
+
+    Dark pixels are marked, unless inverted. Positions are in galvo units, x, y being the position of the first pixel.
+    A run of pixels is marked from the start of its first pixel to the end of its last pixel.
+    """
+
+    def __init__(
+        self,
+        image,
+        x=0x8000,
+        y=0x8000,
+        pixel_size=1.0,
+        mode="threshold",
+        threshold=128,
+        levels=16,
+        power_min=0.0,
+        power_max=None,
+        bidirectional=True,
+        overscan=0,
+        invert=False,
+    ):
+        """
+        @param image: 2D array, bool or values 0-255.
+        @param x: x position of the first pixel of each row.
+        @param y: y position of the first row.
+        @param pixel_size: distance between pixels in galvo units.
+        @param mode: "threshold", "dither" or "grayscale".
+        @param threshold: value below which pixels are marked in threshold mode.
+        @param levels: number of power levels in grayscale mode, including unmarked.
+        @param power_min: power in percent of the lightest marked level in grayscale mode.
+        @param power_max: power in percent of the darkest level in grayscale mode, defaults to the controller power.
+        @param bidirectional: mark alternate rows in reverse.
+        @param overscan: distance in galvo units to jump before the first run of each row.
+        @param invert: mark light pixels rather than dark pixels.
+        """
+        image = np.asarray(image)
+        if image.ndim != 2:
+            raise ValueError("Raster image must be 2D.")
+        if mode not in RASTER_MODES:
+            raise ValueError(f"Raster mode must be one of {RASTER_MODES}")
+        if image.dtype == bool:
+            image = np.where(image, 0, 255).astype(np.uint8)
+        height, width = image.shape
+        right = x + width * pixel_size
+        bottom = y + (height - 1) * pixel_size
+        if (
+            min(x, right) - overscan < 0
+            or max(x, right) + overscan > 0xFFFF
+            or min(y, bottom) < 0
+            or max(y, bottom) > 0xFFFF
+        ):
+            raise ValueError("Raster does not fit within the galvo field.")
+        self.image = image
+        self.x = x
+        self.y = y
+        self.pixel_size = pixel_size
+        self.mode = mode
+        self.threshold = threshold
+        self.levels = max(2, int(levels))
+        self.power_min = power_min
+        self.power_max = power_max
+        self.bidirectional = bidirectional
+        self.overscan = overscan
+        self.invert = invert
+        self._dither = bayer_matrix() * 255.0
+
+    @property
+    def width(self):
+        return self.image.shape[1]
+
+    @property
+    def height(self):
+        return self.image.shape[0]
+
+    def row_levels(self, index):
+        """
+        Marking level of each pixel of the row, 0 being unmarked.
+
+        @param index: row index
+        @return: uint8 array
+        """
+        row = self.image[index]
+        if self.invert:
+            row = 255 - row.astype(np.int16)
+        if self.mode == "threshold":
+            return (row < self.threshold).view(np.uint8)
+        if self.mode == "dither":
+            tile = self._dither[index % self._dither.shape[0]]
+            matrix = np.resize(tile, row.shape[0])
+            return (row < matrix).view(np.uint8)
+        darkness = 255 - row.astype(np.int16)
+        return ((darkness * (self.levels - 1) + 127) // 255).astype(np.uint8)
+
+    def row_runs(self, index):
+        """
+        Runs of equal marking level within a row.
+
+        @param index: row index
+        @return: start pixels, end pixels (exclusive), levels
+        """
+        levels = self.row_levels(index)
+        padded = np.zeros(levels.shape[0] + 2, dtype=np.int16)
+        padded[1:-1] = levels
+        edges = np.flatnonzero(np.diff(padded))
+        starts = edges[:-1]
+        ends = edges[1:]
+        run_levels = padded[starts + 1]
+        marked = run_levels != 0
+        return starts[marked], ends[marked], run_levels[marked]
+
+    def power_words(self, controller):
+        """
+        Encoded power command for each level, for the source of the controller.
+
+        @param controller:
+        @return: array of words, indexed by level.
+        """
+        power_max = self.power_max
+        if power_max is None:
+            power_max = controller.power
+        words = np.zeros((self.levels, 6), dtype=np.uint16)
+        if self.mode != "grayscale":
+            return words, [power_max] * self.levels
+        # Level 0 is never marked.
+        powers = [0.0]
+        for level in range(1, self.levels):
+            if self.levels > 2:
+                ratio = (level - 1) / (self.levels - 2)
+                powers.append(self.power_min + (power_max - self.power_min) * ratio)
+            else:
+                powers.append(power_max)
+        for level, power in enumerate(powers):
+            if controller.source == "co2":
+                words[level, 0] = listMarkPowerRatio
+                words[level, 1] = int(round(200 * power / controller.frequency))
+            else:
+                words[level, 0] = listMarkCurrent
+                words[level, 1] = controller._convert_power(power)
+        return words, powers
+
+    def rows(self, controller):
+        """
+        Yields the list commands for each row with any marks, starting from the current controller position.
+
+        @param controller: GalvoController, whose source and power are used.
+        @return: generator of row index and (N, 6) uint16 arrays of list commands.
+        """
+        power_words, powers = self.power_words(controller)
+        grayscale = self.mode == "grayscale"
+        last_x, last_y = controller.get_last_xy()
+        last_level = -1
+        reverse = False
+        for index in range(self.height):
+            starts, ends, levels = self.row_runs(index)
+            count = starts.shape[0]
+            if not count:
+                continue
+            y = int(round(self.y + index * self.pixel_size))
+            start_x = np.rint(self.x + starts * self.pixel_size).astype(np.int64)
+            end_x = np.rint(self.x + ends * self.pixel_size).astype(np.int64)
+            overscan = self.overscan
+            if reverse:
+                start_x, end_x = end_x[::-1], start_x[::-1]
+                levels = levels[::-1]
+                overscan = -overscan
+            if self.bidirectional:
+                reverse = not reverse
+
+            # Each run: power, jump to start, mark to end.
+            words = np.zeros((count, 3, 6), dtype=np.uint16)
+            keep = np.ones((count, 3), dtype=bool)
+            if grayscale:
+                words[:, 0] = power_words[levels]
+                previous = np.empty(count, dtype=levels.dtype)
+                previous[0] = last_level
+                previous[1:] = levels[:-1]
+                keep[:, 0] = levels != previous
+                last_level = int(levels[-1])
+            else:
+                keep[:, 0] = False
+            words[:, 1, 0] = listJumpTo
+            words[:, 1, 1] = start_x
+            words[:, 1, 2] = y
+            words[:, 2, 0] = listMarkTo
+            words[:, 2, 1] = end_x
+            words[:, 2, 2] = y
+
+            xs = np.empty(2 * count + 1, dtype=np.float64)
+            ys = np.full(2 * count + 1, y, dtype=np.float64)
+            xs[1::2] = start_x
+            xs[2::2] = end_x
+            lead_in = None
+            if overscan:
+                lead_in = int(start_x[0] - overscan)
+                xs[0] = lead_in
+            else:
+                xs[0] = last_x
+                ys[0] = last_y
+            distances = np.minimum(np.hypot(np.diff(xs), np.diff(ys)), 0xFFFF)
+            words[:, 1, 4] = distances[0::2]
+            words[:, 2, 4] = distances[1::2]
+            words = words[keep]
+            if lead_in is not None:
+                distance = int(abs(complex(lead_in, y) - complex(last_x, last_y)))
+                lead = np.array(
+                    [[listJumpTo, lead_in, y, 0, min(distance, 0xFFFF), 0]],
+                    dtype=np.uint16,
+                )
+                words = np.concatenate((lead, words))
+            last_x = int(end_x[-1])
+            last_y = y
+            yield index, words
+        if grayscale and last_level >= 0:
+            controller._power = powers[last_level]
+
+    def __call__(self, controller):
+        """
+        Writes the raster into the current list of the controller, row by row.
+
+        @param controller: GalvoController
+        @return:
+        """
+        for index, words in self.rows(controller):
+            controller._list_write_words(words)
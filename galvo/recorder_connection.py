@@ -0,0 +1,269 @@
+"""
+Recorder Connection for Galvo
+
+The recorder connection stores every command sent to it rather than engaging any hardware. Commands are kept in a
+compact column store, one `array` per field, so that tests and analysis tools can query jobs of many millions of
+commands without the overhead of a python object per command.
+"""
+
+import math
+import struct
+import sys
+from array import array
+from itertools import compress
+
+from .consts import listJumpTo, listMarkTo, list_command_lookup, single_command_lookup
+
+READY = 0x20
+
+
+def _(data):
+    return data
+
+
+def _words(packet):
+    words = array("H", bytes(packet))
+    if sys.byteorder != "little":
+        words.byteswap()
+    return words
+
+
+class RecorderConnection:
+    def __init__(self, channel=None, status=READY):
+        self._log = channel
+        self.devices = {}
+        self.interface = {}
+        self.backend_error_code = None
+        self.timeout = 0
+        self.status = status
+        self.packets = 0
+        self.realtime = array("B")
+        self.packet = array("L")
+        self.opcode = array("H")
+        self.v1 = array("H")
+        self.v2 = array("H")
+        self.v3 = array("H")
+        self.v4 = array("H")
+        self.v5 = array("H")
+
+    def channel(self, data):
+        if self._log:
+            self._log(data)
+
+    def clear(self):
+        """
+        Forget all recorded commands.
+
+        @return:
+        """
+        self.packets = 0
+        for column in self.columns():
+            del column[:]
+
+    def columns(self):
+        return (
+            self.realtime,
+            self.packet,
+            self.opcode,
+            self.v1,
+            self.v2,
+            self.v3,
+            self.v4,
+            self.v5,
+        )
+
+    def is_open(self, index=0):
+        try:
+            dev = self.devices[index]
+            if dev:
+                return True
+        except KeyError:
+            pass
+        return False
+
+    def open(self, index=0):
+        """Opens device, returns index."""
+        self.channel(_("Attempting connection to Recorder."))
+        self.devices[index] = True
+        self.channel(_("Recorder Connected."))
+        return index
+
+    def close(self, index=0):
+        """Closes device."""
+        device = self.devices[index]
+        self.channel(_("Attempting disconnection from Recorder."))
+        if device is not None:
+            self.channel(_("Recorder Disconnection Successful.\n"))
+            del self.devices[index]
+
+    def write(self, index=0, packet=None):
+        packet_length = len(packet)
+        assert packet_length == 0xC or packet_length == 0xC00
+        device = self.devices[index]
+        if not device:
+            raise ConnectionError
+        words = _words(packet)
+        count = packet_length // 12
+        self.realtime.extend(bytes([packet_length == 0xC]) * count)
+        self.packet.extend(array("L", [self.packets]) * count)
+        self.opcode.extend(words[0::6])
+        self.v1.extend(words[1::6])
+        self.v2.extend(words[2::6])
+        self.v3.extend(words[3::6])
+        self.v4.extend(words[4::6])
+        self.v5.extend(words[5::6])
+        self.packets += 1
+
+    def read(self, index=0):
+        device = self.devices[index]
+        if not device:
+            raise ConnectionError
+        return struct.pack("<4H", 0, 0, 0, self.status)
+
+    #######################
+    # QUERIES
+    #######################
+
+    def __len__(self):
+        return len(self.opcode)
+
+    def _selector(self, opcode=None, realtime=None):
+        if opcode is None and realtime is None:
+            return None
+        if realtime is None:
+            return map(opcode.__eq__, self.opcode)
+        if opcode is None:
+            return map(bool(realtime).__eq__, map(bool, self.realtime))
+        return map(
+            (opcode, int(bool(realtime))).__eq__, zip(self.opcode, self.realtime)
+        )
+
+    def command(self, index):
+        """
+        Recorded command at the given index.
+
+        @param index:
+        @return: opcode, v1, v2, v3, v4, v5
+        """
+        return (
+            self.opcode[index],
+            self.v1[index],
+            self.v2[index],
+            self.v3[index],
+            self.v4[index],
+            self.v5[index],
+        )
+
+    def commands(self, opcode=None, realtime=None):
+        """
+        Yields the recorded commands, optionally filtered by opcode and by realtime/list.
+
+        @param opcode: opcode to match, None matches any opcode.
+        @param realtime: True for realtime commands, False for list commands, None for both.
+        @return: generator of opcode, v1, v2, v3, v4, v5 tuples.
+        """
+        rows = zip(self.opcode, self.v1, self.v2, self.v3, self.v4, self.v5)
+        selector = self._selector(opcode, realtime)
+        if selector is None:
+            return rows
+        return compress(rows, selector)
+
+    def values(self, opcode, field=1, realtime=None):
+        """
+        All values of a single field for the commands matching opcode.
+
+        @param opcode: opcode to match.
+        @param field: 1-5, the parameter index of the command.
+        @param realtime: True for realtime commands, False for list commands, None for both.
+        @return: array of values.
+        """
+        column = self.columns()[field + 2]
+        return array("H", compress(column, self._selector(opcode, realtime)))
+
+    def last_value(self, opcode, field=1, default=None, realtime=None):
+        """
+        The most recent value of a parameter, for example the last mark speed set.
+
+        @param opcode: opcode to match.
+        @param field: 1-5, the parameter index of the command.
+        @param default: value returned if no command matched.
+        @param realtime: True for realtime commands, False for list commands, None for both.
+        @return:
+        """
+        column = self.columns()[field + 2]
+        realtime_flag = None if realtime is None else int(bool(realtime))
+        for i in range(len(self.opcode) - 1, -1, -1):
+            if self.opcode[i] != opcode:
+                continue
+            if realtime_flag is not None and self.realtime[i] != realtime_flag:
+                continue
+            return column[i]
+        return default
+
+    def count(self, opcode=None, realtime=None):
+        """
+        Number of recorded commands matching opcode.
+
+        @param opcode: opcode to match, None matches any opcode.
+        @param realtime: True for realtime commands, False for list commands, None for both.
+        @return:
+        """
+        selector = self._selector(opcode, realtime)
+        if selector is None:
+            return len(self.opcode)
+        return sum(selector)
+
+    def opcode_counts(self):
+        """
+        Counts of each recorded command keyed by command name.
+
+        @return:
+        """
+        counts = {}
+        for is_realtime, opcode in zip(self.realtime, self.opcode):
+            if is_realtime:
+                name = single_command_lookup.get(opcode, "Unknown")
+            else:
+                name = list_command_lookup.get(opcode, "Unknown")
+            counts[name] = counts.get(name, 0) + 1
+        return counts
+
+    def positions(self):
+        """
+        Yields the list jump and mark commands as positions.
+
+        @return: generator of opcode, x, y
+        """
+        for opcode, x, y, is_realtime in zip(
+            self.opcode, self.v1, self.v2, self.realtime
+        ):
+            if not is_realtime and (opcode == listJumpTo or opcode == listMarkTo):
+                yield opcode, x, y
+
+    def _distance(self, match, start):
+        last_x, last_y = start
+        total = 0.0
+        for opcode, x, y in self.positions():
+            if opcode == match:
+                total += math.hypot(x - last_x, y - last_y)
+            last_x = x
+            last_y = y
+        return total
+
+    def jump_distance(self, start=(0x8000, 0x8000)):
+        """
+        Total distance in galvo units travelled by list jumps.
+
+        @param start: position of the galvo before the first recorded command.
+        @return:
+        """
+        return self._distance(listJumpTo, start)
+
+    def mark_distance(self, start=(0x8000, 0x8000)):
+        """
+        Total distance in galvo units travelled by list marks.
+
+        @param start: position of the galvo before the first recorded command.
+        @return:
+        """
+        return self._distance(listMarkTo, start)
@@ -0,0 +1,113 @@
+"""
+Galvo Repeat
+
+Repeated marking marks the same part many times, such as a batch of identical parts or parts which differ only by a
+serial number. The static part is captured into list commands once and written again for each part, only the variable
+part is drawn for each part. The parts are counted on the host, a part is sent once the list packet holding its last
+command is sent to the board.
+"""
+
+import time
+from collections import deque
+
+
+class RepeatMarking:
+    def __init__(self, draw, count=None, variable=None, values=None, batch=16):
+        """
+        @param draw: function drawing the static part, given the controller.
+        @param count: number of parts, defaults to the number of values.
+        @param variable: function drawing the variable part, given the controller and the value of the part.
+        @param values: values of the parts, such as serial numbers, given to variable.
+        @param batch: parts written per spooler iteration.
+        """
+        if values is not None and count is None:
+            count = len(values)
+        if count is None:
+            raise ValueError("Repeated marking requires a count or values.")
+        if values is not None:
+            values = iter(values)
+        elif variable is not None:
+            values = iter(range(count))
+        self.draw = draw
+        self.count = count
+        self.variable = variable
+        self.values = values
+        self.batch = max(1, batch)
+        self.static = None
+        self._stopped = False
+
+        self.written = 0
+        self.sent = 0
+        # List packet of the last command of each part written and not yet sent.
+        self._part_packets = deque()
+        self._start_time = None
+        self.compile_time = 0.0
+
+    def __call__(self, controller):
+        """
+        Spooler job, writes the next batch of parts.
+
+        @param controller: GalvoController
+        @return: whether all parts were written.
+        """
+        if self._stopped:
+            return True
+        if self.static is None:
+            controller.marking_configuration()
+            self._start_time = time.perf_counter()
+            if self.variable is None:
+                # Each part directly follows the last.
+                self.static = controller.capture_repeating(self.draw)
+            else:
+                with controller.capture() as static:
+                    self.draw(controller)
+                self.static = static
+            self.compile_time = time.perf_counter() - self._start_time
+        for i in range(self.batch):
+            if self.written >= self.count:
+                return True
+            self.write_part(controller)
+        return self.written >= self.count
+
+    def write_part(self, controller):
+        """
+        Writes the next part, the captured static part followed by the variable part drawn for its value.
+
+        @param controller: GalvoController
+        @return:
+        """
+        controller.write_captured(self.static)
+        if self.variable is not None:
+            self.variable(controller, next(self.values))
+        self.written += 1
+        self._part_packets.append(controller._number_of_list_packets)
+
+    def stop(self):
+        self._stopped = True
+
+    def poll(self, controller):
+        """
+        Counts the parts whose list commands were all sent to the board, all of those written once the list ended.
+
+        @param controller: GalvoController
+        @return: parts sent.
+        """
+        packets = self._part_packets
+        if controller.laser_configuration == "initial":
+            self.sent += len(packets)
+            packets.clear()
+        else:
+            sent = controller._number_of_list_packets
+            while packets and packets[0] < sent:
+                packets.popleft()
+                self.sent += 1
+        return self.sent
+
+    def stats(self):
+        return {
+            "count": self.count,
+            "written": self.written,
+            "sent": self.sent,
+            "compile_time": self.compile_time,
+            "commands_per_part": len(self.static) if self.static is not None else 0,
+        }
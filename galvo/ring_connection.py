@@ -0,0 +1,377 @@
+"""
+Ring Connection for Galvo
+
+The ring connection runs the connection to the laser in a sender process, so that building a job and talking to the
+laser do not contend for one GIL. Packets are passed to the sender through a ring of slots in shared memory, each
+0xC00 byte list packet copied once into its slot and written to the laser straight from there. The sender writes list
+packets only as the board has room for them, so a full board fills the ring, and a full ring blocks the controller.
+
+List packets and commands which change the board are queued without waiting, commands which query the board wait for
+the sender to reach them and return the answer of the board. Status reads while packets are queued are answered
+without waiting: busy, and ready once the ring has a free slot. Stopping execution discards list packets still queued.
+"""
+
+import multiprocessing
+import struct
+import time
+from multiprocessing import shared_memory
+
+from .consts import GetVersion, ResetList, StopExecute
+from .file_connection import QUERIES
+
+BUSY = 0x04
+READY = 0x20
+
+# Header: completed count, discard list packets before this sequence, response, open result.
+_HEADER = struct.Struct("<QQ8si")
+_HEADER_SIZE = 64
+# Slot: sequence, kind, length, then the packet.
+_SLOT = struct.Struct("<QII")
+_SLOT_SIZE = _SLOT.size + 0xC00
+
+LIST = 0
+REALTIME = 1
+QUERY = 2
+OPEN = 3
+CLOSE = 4
+STOP = 5
+
+_STATUS = struct.pack("<6H", GetVersion, 0, 0, 0, 0, 0)
+
+
+def _(data):
+    return data
+
+
+class PacketRing:
+    """
+    Ring of packet slots in shared memory, written by one process and read by another.
+    """
+
+    def __init__(self, slots=32, name=None, semaphores=None):
+        """
+        @param slots: number of packet slots.
+        @param name: shared memory of an existing ring, None creates a ring.
+        @param semaphores: free, filled and answered semaphores of an existing ring.
+        """
+        self.slots = slots
+        size = _HEADER_SIZE + slots * _SLOT_SIZE
+        self.owner = name is None
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+            self.memory.buf[:_HEADER_SIZE] = bytes(_HEADER_SIZE)
+            semaphores = (
+                multiprocessing.Semaphore(slots),
+                multiprocessing.Semaphore(0),
+                multiprocessing.Semaphore(0),
+            )
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.free, self.filled, self.answered = semaphores
+        self.buf = self.memory.buf
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    @property
+    def semaphores(self):
+        return self.free, self.filled, self.answered
+
+    def _header(self):
+        return _HEADER.unpack_from(self.buf, 0)
+
+    @property
+    def completed(self):
+        return self._header()[0]
+
+    @property
+    def discard_before(self):
+        return self._header()[1]
+
+    def set_completed(self, completed):
+        struct.pack_into("<Q", self.buf, 0, completed)
+
+    def set_discard_before(self, sequence):
+        struct.pack_into("<Q", self.buf, 8, sequence)
+
+    def wait_free(self, alive=None):
+        """
+        Waits for a free slot, taking it.
+
+        @param alive: function returning whether the reader is alive, checked while waiting.
+        @return:
+        """
+        while not self.free.acquire(timeout=0.5):
+            if alive is not None and not alive():
+                raise ConnectionError("Sender process ended.")
+
+    def put(self, sequence, kind, packet=b"", alive=None):
+        """
+        Writes a packet into the next slot, waiting for a free slot.
+
+        @param alive: function returning whether the reader is alive, checked while waiting.
+        """
+        self.wait_free(alive)
+        offset = _HEADER_SIZE + (sequence % self.slots) * _SLOT_SIZE
+        length = len(packet)
+        _SLOT.pack_into(self.buf, offset, sequence, kind, length)
+        start = offset + _SLOT.size
+        self.buf[start : start + length] = packet
+        self.filled.release()
+
+    def get(self, sequence):
+        """
+        Slot of the packet, once written.
+
+        @return: sequence, kind, memoryview of the packet.
+        """
+        self.filled.acquire()
+        offset = _HEADER_SIZE + (sequence % self.slots) * _SLOT_SIZE
+        sequence, kind, length = _SLOT.unpack_from(self.buf, offset)
+        start = offset + _SLOT.size
+        return sequence, kind, self.buf[start : start + length]
+
+    def release(self, completed):
+        self.set_completed(completed)
+        self.free.release()
+
+    def answer(self, response=bytes(8), result=0):
+        struct.pack_into("<8si", self.buf, 16, bytes(response), result)
+        self.answered.release()
+
+    def response(self):
+        return self._header()[2:]
+
+    def close(self):
+        self.buf = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+def _sender(name, slots, semaphores, backend, options):
+    """
+    Sender process, writes the packets of the ring to a connection.
+    """
+    from .connections import create_connection
+
+    ring = PacketRing(slots, name=name, semaphores=semaphores)
+    connection = create_connection(backend, None, **options)
+    completed = 0
+    index = 0
+    try:
+        while True:
+            sequence, kind, packet = ring.get(completed)
+            if kind in (OPEN, CLOSE):
+                index = struct.unpack("<i", packet)[0]
+            answer = None
+            try:
+                if kind == STOP:
+                    break
+                elif kind == OPEN:
+                    answer = bytes(8), connection.open(index)
+                elif kind == CLOSE:
+                    connection.close(index)
+                elif kind == LIST:
+                    if sequence >= ring.discard_before:
+                        # Wait for the board to have room for the packet.
+                        while True:
+                            connection.write(index, _STATUS)
+                            status = struct.unpack("<4H", connection.read(index))[3]
+                            if status & READY:
+                                break
+                            time.sleep(0.001)
+                            if sequence < ring.discard_before:
+                                break
+                        if sequence >= ring.discard_before:
+                            connection.write(index, packet)
+                else:
+                    connection.write(index, packet)
+                    response = connection.read(index)
+                    if kind == QUERY:
+                        answer = response, 0
+            except Exception:
+                # Any failure of the connection is answered, the controller is not left waiting for the sender.
+                if kind in (QUERY, OPEN):
+                    answer = bytes(8), -1
+            finally:
+                packet.release()
+                completed += 1
+                ring.release(completed)
+                # Answered once completed, so nothing is pending when the answer is read.
+                if answer is not None:
+                    ring.answer(*answer)
+    finally:
+        ring.close()
+        if connection.is_open(index):
+            connection.close(index)
+
+
+class RingConnection:
+    def __init__(self, channel=None, path=None, sender="usb", slots=32, **options):
+        """
+        @param channel: log function.
+        @param path: path given to the connection of the sender, for file connections.
+        @param sender: backend of the connection in the sender process.
+        @param slots: packets queued before the controller waits.
+        @param options: further options of the connection of the sender.
+        """
+        self._log = channel
+        self.devices = {}
+        self.interface = {}
+        self.backend_error_code = None
+        self.timeout = 0
+        self.sender = sender
+        self.slots = slots
+        self.options = dict(options)
+        if path is not None:
+            self.options["path"] = path
+        self._ring = None
+        self._process = None
+        self._sequence = 0
+        self._response = bytes(8)
+
+        self.list_packets = 0
+        self.queries = 0
+        self.status_answered = 0
+        self.max_pending = 0
+        self.blocked_time = 0.0
+
+    def channel(self, data):
+        if self._log:
+            self._log(data)
+
+    @property
+    def pending(self):
+        """
+        Packets queued and not yet written by the sender.
+        """
+        if self._ring is None:
+            return 0
+        return self._sequence - self._ring.completed
+
+    def _start(self):
+        self._ring = PacketRing(self.slots)
+        self._sequence = 0
+        self._process = multiprocessing.Process(
+            target=_sender,
+            args=(
+                self._ring.name,
+                self.slots,
+                self._ring.semaphores,
+                self.sender,
+                self.options,
+            ),
+            daemon=True,
+        )
+        self._process.start()
+
+    def _stop(self):
+        if self._process is None:
+            return
+        if self._process.is_alive():
+            try:
+                self._post(STOP)
+            except ConnectionError:
+                pass
+            self._process.join()
+        self._process = None
+        self._ring.close()
+        self._ring = None
+
+    def _post(self, kind, packet=b""):
+        start = time.perf_counter()
+        self._ring.put(self._sequence, kind, packet, self._process.is_alive)
+        self.blocked_time += time.perf_counter() - start
+        self._sequence += 1
+        self.max_pending = max(self.max_pending, self.pending)
+
+    def _wait_answer(self):
+        while not self._ring.answered.acquire(timeout=0.5):
+            if not self._process.is_alive():
+                raise ConnectionError("Sender process ended.")
+        return self._ring.response()
+
+    def is_open(self, index=0):
+        try:
+            dev = self.devices[index]
+            if dev:
+                return True
+        except KeyError:
+            pass
+        return False
+
+    def open(self, index=0):
+        """Opens device, returns index."""
+        self.channel(_(f"Attempting connection to {self.sender} in sender process."))
+        if self._process is None:
+            self._start()
+        self._post(OPEN, struct.pack("<i", index))
+        response, result = self._wait_answer()
+        if result < 0:
+            return result
+        self.devices[index] = True
+        self.channel(_("Sender Connected."))
+        return index
+
+    def close(self, index=0):
+        """Closes device."""
+        device = self.devices.get(index)
+        self.channel(_("Attempting disconnection from sender process."))
+        if device is not None:
+            del self.devices[index]
+            try:
+                self._post(CLOSE, struct.pack("<i", index))
+            except ConnectionError:
+                # The sender already ended.
+                pass
+            if not self.devices:
+                self._stop()
+            self.channel(_("Sender Disconnection Successful.\n"))
+
+    def write(self, index=0, packet=None):
+        packet_length = len(packet)
+        assert packet_length == 0xC or packet_length == 0xC00
+        if not self.devices.get(index) or not self._process.is_alive():
+            raise ConnectionError
+        if packet_length == 0xC00:
+            self._post(LIST, packet)
+            self.list_packets += 1
+            return
+        opcode = packet[0] | packet[1] << 8
+        if opcode == GetVersion and self.pending:
+            # The board is busy with the queued packets, and ready once a slot is free.
+            start = time.perf_counter()
+            self._ring.wait_free(self._process.is_alive)
+            self._ring.free.release()
+            self.blocked_time += time.perf_counter() - start
+            self._response = struct.pack("<4H", 0, 0, 0, READY | BUSY)
+            self.status_answered += 1
+        elif opcode in QUERIES:
+            self._post(QUERY, packet)
+            response, result = self._wait_answer()
+            if result < 0:
+                raise ConnectionError
+            self._response = response
+            self.queries += 1
+        else:
+            if opcode in (StopExecute, ResetList):
+                # List packets still queued would be executed after the list was stopped.
+                self._ring.set_discard_before(self._sequence)
+            self._post(REALTIME, packet)
+            self._response = struct.pack("<4H", 0, 0, 0, READY)
+
+    def read(self, index=0):
+        if not self.devices.get(index):
+            raise ConnectionError
+        return self._response
+
+    def stats(self):
+        return {
+            "list_packets": self.list_packets,
+            "queries": self.queries,
+            "status_answered": self.status_answered,
+            "max_pending": self.max_pending,
+            "blocked_time": self.blocked_time,
+        }
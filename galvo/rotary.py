@@ -0,0 +1,195 @@
+"""
+Galvo Rotary
+
+Rotary marking marks geometry wrapped around a cylinder. The geometry is given unwrapped, y being the distance around
+the cylinder, and is split into bands of the circumference narrow enough to be marked without distortion. For each band
+the axis turns the band under the lens and the band is marked as its own list. The list of the next band is built while
+the axis moves, so the host work is overlapped with the motion.
+"""
+
+import time
+
+import numpy as np
+
+
+def split_bands(path, window):
+    """
+    Splits a path into pieces each within a single band of height window, cutting segments where they cross a band.
+
+    @param path: (N, 2) array, y being the distance around the cylinder.
+    @param window: height of each band.
+    @return: list of (band, (M, 2) array) pieces.
+    """
+    path = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+    if path.shape[0] < 2:
+        return []
+    start = path[:-1]
+    end = path[1:]
+    band_start = np.floor(start[:, 1] / window).astype(np.int64)
+    band_end = np.floor(end[:, 1] / window).astype(np.int64)
+    crossings = np.abs(band_end - band_start)
+    total = int(crossings.sum())
+
+    # Crossing points of each segment, in the direction of travel.
+    segment = np.repeat(np.arange(start.shape[0]), crossings)
+    k = np.arange(total) - np.repeat(np.cumsum(crossings) - crossings, crossings)
+    rising = band_end[segment] > band_start[segment]
+    boundary = np.where(rising, band_start[segment] + 1 + k, band_start[segment] - k)
+    dy = end[segment, 1] - start[segment, 1]
+    t = (boundary * window - start[segment, 1]) / dy
+    points = start[segment] + t[:, None] * (end[segment] - start[segment])
+
+    # Original points at t=0 of their segment, the last point at t=1 of the last segment.
+    order_segment = np.concatenate((np.arange(path.shape[0]), segment))
+    order_t = np.concatenate((np.zeros(path.shape[0]), t))
+    order_segment[path.shape[0] - 1] = start.shape[0] - 1
+    order_t[path.shape[0] - 1] = 1.0
+    order = np.lexsort((order_t, order_segment))
+    refined = np.concatenate((path, points))[order]
+
+    middle = (refined[:-1, 1] + refined[1:, 1]) / 2
+    bands = np.floor(middle / window).astype(np.int64)
+    cuts = np.flatnonzero(np.diff(bands)) + 1
+    firsts = np.concatenate(([0], cuts))
+    lasts = np.concatenate((cuts, [bands.shape[0]]))
+    return [
+        (int(bands[first]), refined[first : last + 1])
+        for first, last in zip(firsts, lasts)
+    ]
+
+
+class RotaryJob:
+    def __init__(
+        self,
+        paths,
+        circumference,
+        steps_per_revolution,
+        window=0x2000,
+        center=0x8000,
+        min_speed=100,
+        max_speed=5000,
+        acc_time=100,
+    ):
+        """
+        @param paths: sequence of (N, 2) positions in galvo units, y being the distance around the cylinder.
+        @param circumference: circumference of the cylinder in galvo units.
+        @param steps_per_revolution: rotary axis steps per revolution of the cylinder.
+        @param window: height of each band in galvo units.
+        @param center: y position of the lens over which each band is marked.
+        @param min_speed: rotary axis minimum speed.
+        @param max_speed: rotary axis maximum speed.
+        @param acc_time: rotary axis acceleration time.
+        """
+        self.circumference = circumference
+        self.steps_per_revolution = steps_per_revolution
+        self.window = window
+        self.center = center
+        self.axis_params = (min_speed, max_speed, acc_time)
+
+        bands = {}
+        for path in paths:
+            for band, piece in split_bands(path, window):
+                bands.setdefault(band, []).append(piece)
+        self.bands = [(band, bands[band]) for band in sorted(bands)]
+        self._index = 0
+        self._next = None
+        self._stopped = False
+
+        self.axis_time = 0.0
+        self.mark_time = 0.0
+        self.compile_time = 0.0
+        self.overlapped_time = 0.0
+        self.position_error = 0
+        self._start_time = None
+        self._end_time = None
+
+    def axis_position(self, band):
+        """
+        Axis position turning the center of the band under the lens.
+
+        @param band: band index.
+        @return: axis position in steps.
+        """
+        middle = (band + 0.5) * self.window
+        return int(round(middle / self.circumference * self.steps_per_revolution))
+
+    def build(self, controller, index):
+        """
+        Captures the list of a band, moved so the center of the band is at the center of the lens.
+
+        @param controller: GalvoController
+        @param index: index within the bands.
+        @return: CapturedList
+        """
+        start = time.perf_counter()
+        band, pieces = self.bands[index]
+        offset = self.center - (band + 0.5) * self.window
+        with controller.capture() as captured:
+            for piece in pieces:
+                controller.mark_polyline(piece + (0, offset))
+        self.compile_time += time.perf_counter() - start
+        return captured
+
+    def __call__(self, controller):
+        """
+        Spooler job, turns and marks the next band.
+
+        @param controller: GalvoController
+        @return: whether all bands are marked.
+        """
+        if self._stopped or self._index >= len(self.bands):
+            return True
+        if self._start_time is None:
+            self._start_time = time.perf_counter()
+            self._next = self.build(controller, 0)
+        index = self._index
+        band, pieces = self.bands[index]
+        current = self._next
+        target = self.axis_position(band)
+
+        start = time.perf_counter()
+        controller.rotary_move(target, *self.axis_params)
+        if index + 1 < len(self.bands):
+            # Build the next band while the axis moves.
+            built = time.perf_counter()
+            self._next = self.build(controller, index + 1)
+            self.overlapped_time += time.perf_counter() - built
+        controller.wait_axis()
+        self.axis_time += time.perf_counter() - start
+        self.position_error = max(
+            self.position_error, abs(controller.rotary_position() - target)
+        )
+
+        start = time.perf_counter()
+        with controller.marking():
+            controller.write_captured(current)
+        self.mark_time += time.perf_counter() - start
+        self._index += 1
+        if self._index >= len(self.bands):
+            self._end_time = time.perf_counter()
+            return True
+        return False
+
+    def stop(self):
+        self._stopped = True
+
+    @property
+    def cycle_time(self):
+        if self._start_time is None:
+            return 0.0
+        end = self._end_time
+        if end is None:
+            end = time.perf_counter()
+        return end - self._start_time
+
+    def stats(self):
+        return {
+            "bands": len(self.bands),
+            "marked": self._index,
+            "cycle_time": self.cycle_time,
+            "axis_time": self.axis_time,
+            "mark_time": self.mark_time,
+            "compile_time": self.compile_time,
+            "overlapped_time": self.overlapped_time,
+            "position_error": self.position_error,
+        }
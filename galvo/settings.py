@@ -0,0 +1,411 @@
+"""
+Galvo Settings
+
+The settings are the machine configuration of a galvo controller. Each setting is validated when assigned, and the
+unit conversions derived from them are cached until the settings they depend on change.
+
+Settings files are json, either a single dict of settings or a dict of named `profiles` with optional shared
+`defaults`, so that the profiles of many machines can be kept in one file. Unknown keys in a settings file are logged
+and ignored, so that files written for other versions still load.
+"""
+
+import json
+
+SOURCES = ("fiber", "co2")
+
+
+def _number(name, value, minimum=None, maximum=None):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError(f"{name} must be a number, not {value!r}")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}, not {value!r}")
+    if maximum is not None and value > maximum:
+        raise ValueError(f"{name} must be at most {maximum}, not {value!r}")
+    return value
+
+
+def _integer(name, value, minimum=0, maximum=0xFFFF):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise TypeError(f"{name} must be an integer, not {value!r}")
+    return _number(name, value, minimum, maximum)
+
+
+def _speed(name, value):
+    return _number(name, value, minimum=0)
+
+
+def _delay(name, value):
+    return _number(name, value, minimum=-0xFFFF, maximum=0xFFFF)
+
+
+def _pin(name, value):
+    return _integer(name, value, maximum=15)
+
+
+def _word(name, value):
+    return _integer(name, value)
+
+
+def _source(name, value):
+    if value not in SOURCES:
+        raise ValueError(f"{name} must be one of {SOURCES}, not {value!r}")
+    return value
+
+
+def _flag(name, value):
+    if not isinstance(value, bool):
+        raise TypeError(f"{name} must be a bool, not {value!r}")
+    return value
+
+
+def _filename(name, value):
+    if not isinstance(value, str):
+        raise TypeError(f"{name} must be a filename, not {value!r}")
+    return value
+
+
+def _name(name, value):
+    if not isinstance(value, str) or not value:
+        raise TypeError(f"{name} must be a name, not {value!r}")
+    return value
+
+
+def _galvos_per_mm(name, value):
+    _number(name, value)
+    if value == 0:
+        raise ValueError(f"{name} must not be 0")
+    return value
+
+
+def _power(name, value):
+    return _number(name, value, minimum=0, maximum=100)
+
+
+def _frequency(name, value):
+    _number(name, value)
+    if value <= 0:
+        raise ValueError(f"{name} must be positive, not {value!r}")
+    return value
+
+
+def _count(name, value):
+    return _integer(name, value, maximum=None)
+
+
+def _packets(name, value):
+    return _integer(name, value, minimum=1, maximum=None)
+
+
+def _curve(name, value):
+    try:
+        points = tuple((point[0], point[1]) for point in value)
+    except (TypeError, IndexError, KeyError):
+        raise TypeError(f"{name} must be a sequence of pairs, not {value!r}") from None
+    if not points:
+        raise ValueError(f"{name} must not be empty")
+    for distance, delay in points:
+        _number(name, distance, minimum=0)
+        # A jump delay of 0 is never sent.
+        _number(name, delay, minimum=1, maximum=0xFFFF)
+    return points
+
+
+# name: (default, validator, optional)
+SCHEMA = {
+    "mock": (False, _flag, False),
+    "backend": ("usb", _name, False),
+    "backend_path": (None, _filename, True),
+    "machine_index": (0, _count, False),
+    "source": ("fiber", _source, False),
+    "light_pin": (8, _pin, False),
+    "footpedal_pin": (15, _pin, False),
+    "laser_pin": (0, _pin, False),
+    "galvos_per_mm": (500, _galvos_per_mm, False),
+    "mark_speed": (100.0, _speed, False),
+    "travel_speed": (2000.0, _speed, False),
+    "goto_speed": (None, _speed, True),
+    "light_speed": (None, _speed, True),
+    "dark_speed": (None, _speed, True),
+    "power": (50.0, _power, False),
+    "fpk": (None, _power, True),
+    "frequency": (30.0, _frequency, False),
+    "pulse_width": (None, _word, True),
+    "cor_file": (None, _filename, True),
+    "first_pulse_killer": (200, _word, False),
+    "pwm_pulse_width": (125, _word, False),
+    "pwm_half_period": (125, _word, False),
+    "standby_param_1": (2000, _word, False),
+    "standby_param_2": (20, _word, False),
+    "timing_mode": (1, _word, False),
+    "delay_mode": (1, _word, False),
+    "laser_mode": (1, _word, False),
+    "control_mode": (0, _word, False),
+    "fpk_max_voltage": (0xFFB, _word, False),
+    "fpk_min_voltage": (1, _word, False),
+    "fpk_t1": (409, _word, False),
+    "fpk_t2": (100, _word, False),
+    "fly_resolution_1": (0, _word, False),
+    "fly_resolution_2": (99, _word, False),
+    "fly_resolution_3": (1000, _word, False),
+    "fly_resolution_4": (25, _word, False),
+    "input_passes_required": (3, _count, False),
+    "max_inflight_packets": (None, _packets, True),
+    "delay_laser_on": (100.0, _delay, False),
+    "delay_laser_off": (100.0, _delay, False),
+    "delay_polygon": (100.0, _delay, False),
+    "delay_end": (300.0, _delay, False),
+    "delay_open_mo": (8.0, _delay, True),
+    "delay_jump_short": (8, _delay, True),
+    "delay_jump_long": (200.0, _delay, True),
+    "jump_delay_curve": (None, _curve, True),
+}
+
+# Settings whose change invalidates the cached conversions.
+_CONVERSION_DEPENDENCIES = ("galvos_per_mm", "source")
+
+
+class GalvoSettings:
+    """
+    Validated machine settings of a GalvoController.
+    """
+
+    __slots__ = tuple(SCHEMA) + ("_derived", "_conversions")
+
+    def __init__(self, **kwargs):
+        object.__setattr__(self, "_derived", {})
+        object.__setattr__(self, "_conversions", 0)
+        for name, (default, validator, optional) in SCHEMA.items():
+            object.__setattr__(self, name, default)
+        self.update(kwargs)
+
+    def __setattr__(self, name, value):
+        try:
+            default, validator, optional = SCHEMA[name]
+        except KeyError:
+            raise AttributeError(f"Unknown setting: {name}") from None
+        if value is None:
+            if not optional:
+                raise ValueError(f"{name} must not be None")
+        else:
+            value = validator(name, value)
+        object.__setattr__(self, name, value)
+        if name in _CONVERSION_DEPENDENCIES:
+            self._conversions_changed()
+
+    def __eq__(self, other):
+        if not isinstance(other, GalvoSettings):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        changed = ", ".join(
+            f"{name}={value!r}"
+            for name, value in self.to_dict().items()
+            if value != SCHEMA[name][0]
+        )
+        return f"GalvoSettings({changed})"
+
+    def update(self, settings):
+        """
+        Assigns each of the given settings, all are validated before any are assigned.
+
+        @param settings: dict of settings.
+        @return:
+        """
+        unknown = [name for name in settings if name not in SCHEMA]
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(unknown)}")
+        validated = GalvoSettings.__new__(GalvoSettings)
+        object.__setattr__(validated, "_derived", {})
+        object.__setattr__(validated, "_conversions", 0)
+        for name, value in settings.items():
+            validated.__setattr__(name, value)
+        for name in settings:
+            object.__setattr__(self, name, getattr(validated, name))
+        if any(name in _CONVERSION_DEPENDENCIES for name in settings):
+            self._conversions_changed()
+
+    def _conversions_changed(self):
+        self._derived.clear()
+        object.__setattr__(self, "_conversions", self._conversions + 1)
+
+    @property
+    def conversions(self):
+        """
+        Number of changes to the settings the unit conversions depend on, values converted before a change are stale.
+        """
+        return self._conversions
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in SCHEMA}
+
+    def copy(self):
+        settings = GalvoSettings.__new__(GalvoSettings)
+        object.__setattr__(settings, "_derived", dict(self._derived))
+        object.__setattr__(settings, "_conversions", 0)
+        for name in SCHEMA:
+            object.__setattr__(settings, name, getattr(self, name))
+        return settings
+
+    #######################
+    # FILES
+    #######################
+
+    @staticmethod
+    def _known(settings, filename, channel=None):
+        """
+        Settings of a file without the unknown keys, which are logged.
+
+        @param settings: dict of settings read.
+        @param filename: settings file, for the log.
+        @param channel: log function, None ignores unknown keys silently.
+        @return: dict of settings
+        """
+        unknown = [name for name in settings if name not in SCHEMA]
+        if not unknown:
+            return settings
+        if channel is not None:
+            channel(f"Ignoring unknown settings in {filename}: {', '.join(unknown)}")
+        return {name: value for name, value in settings.items() if name in SCHEMA}
+
+    @staticmethod
+    def read(filename, profile=None, channel=None):
+        """
+        Reads the settings given in a json settings file, without validation or defaults. Unknown keys are ignored.
+
+        @param filename: settings file.
+        @param profile: name of the profile, required if the file contains profiles.
+        @param channel: log function told of unknown keys.
+        @return: dict of settings
+        """
+        with open(filename, "r") as fp:
+            data = json.load(fp)
+        if "profiles" not in data:
+            if profile is not None:
+                raise KeyError(f"{filename} does not contain profiles.")
+            return GalvoSettings._known(data, filename, channel)
+        if profile is None:
+            raise KeyError(f"{filename} contains profiles, a profile is required.")
+        settings = dict(data.get("defaults", {}))
+        settings.update(data["profiles"][profile])
+        return GalvoSettings._known(settings, filename, channel)
+
+    @classmethod
+    def load(cls, filename, profile=None, channel=None):
+        """
+        Loads settings from a json settings file.
+
+        @param filename: settings file.
+        @param profile: name of the profile, required if the file contains profiles.
+        @param channel: log function told of unknown keys.
+        @return: GalvoSettings
+        """
+        return cls(**cls.read(filename, profile, channel))
+
+    @classmethod
+    def load_profiles(cls, filename, channel=None):
+        """
+        Loads all profiles from a json settings file. The shared defaults are validated once.
+
+        @param filename: settings file.
+        @param channel: log function told of unknown keys.
+        @return: dict of profile name to GalvoSettings
+        """
+        with open(filename, "r") as fp:
+            data = json.load(fp)
+        if "profiles" not in data:
+            raise KeyError(f"{filename} does not contain profiles.")
+        defaults = cls(**cls._known(data.get("defaults", {}), filename, channel))
+        profiles = {}
+        for name, profile in data["profiles"].items():
+            settings = defaults.copy()
+            settings.update(cls._known(profile, filename, channel))
+            profiles[name] = settings
+        return profiles
+
+    def save(self, filename):
+        with open(filename, "w") as fp:
+            json.dump(self.to_dict(), fp, indent=4)
+
+    #######################
+    # UNIT CONVERSIONS
+    #######################
+
+    def _derive(self, key, value):
+        derived = self._derived
+        if len(derived) >= 0x400:
+            # Many distinct values were converted, start over rather than grow.
+            derived.clear()
+        derived[key] = value
+        return value
+
+    def convert_speed(self, speed):
+        """
+        Speed in the galvo is given in galvos/ms this means mm/s needs to multiply by galvos_per_mm
+        and divide by 1000 (s/ms)
+
+        @param speed:
+        @return:
+        """
+        key = ("speed", speed)
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        return self._derive(key, int(speed * abs(self.galvos_per_mm) / 1000.0))
+
+    def convert_frequency(self, frequency_khz, base=20000.0):
+        """
+        Converts frequency to period.
+
+        20000000.0 / frequency in hz
+
+        @param frequency_khz: Frequency to convert
+        @param base: period base
+        @return:
+        """
+        key = ("frequency", frequency_khz, base)
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        return self._derive(key, int(round(base / frequency_khz)) & 0xFFFF)
+
+    def convert_power(self, power):
+        """
+        Converts power percent to int value
+        @return:
+        """
+        key = ("power", power)
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        return self._derive(key, int(round(power * 0xFFF / 100.0)))
+
+    @property
+    def mark_speed_converted(self):
+        return self.convert_speed(self.mark_speed)
+
+    @property
+    def travel_speed_converted(self):
+        return self.convert_speed(self.travel_speed)
+
+    @property
+    def frequency_converted(self):
+        """
+        Period sent for the frequency, the qswitch period for fiber and the mark frequency for co2.
+        """
+        base = 10000.0 if self.source == "co2" else 20000.0
+        return self.convert_frequency(self.frequency, base=base)
+
+    @property
+    def power_converted(self):
+        """
+        Value sent for the power, the mark current for fiber and the power ratio for co2.
+        """
+        if self.source == "co2":
+            return int(round(200 * self.power / self.frequency))
+        return self.convert_power(self.power)
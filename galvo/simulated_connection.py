@@ -0,0 +1,274 @@
+"""
+Simulated Connection for Galvo
+
+The simulated connection records every command like the recorder connection, and also models the controller board
+closely enough to test workflows which depend on the board responding: list packets are buffered and executed,
+the status reports when the buffer is full or the list is busy, and the counters, ports and position can be queried.
+The list stops at an end of list command, packets after it wait for the list to be executed again.
+
+List execution is instant, except that the list waits at each fly wait input for a part to be triggered. Call
+`trigger()` to simulate a part passing the part-present sensor of a conveyor. Given a `packet_time`, each list packet
+instead takes that long to execute, so the list runs in real time and the board fills as it would while marking.
+
+Call `fault()`, or give `fault_after_packets`, to simulate the connection failing: the board is no longer reachable,
+yet executes the list packets it holds, until `recover()`.
+"""
+
+import struct
+import threading
+import time
+from collections import deque
+
+from .consts import *
+from .recorder_connection import READY, RecorderConnection, _words
+
+BUSY = 0x04
+AXIS = 0x40
+
+
+class SimulatedConnection(RecorderConnection):
+    def __init__(
+        self,
+        channel=None,
+        buffer_packets=8,
+        encoder_speed=0,
+        axis_reads=3,
+        packet_time=0.0,
+        fault_after_packets=None,
+    ):
+        """
+        @param channel: log function.
+        @param buffer_packets: list packets the board holds before it is no longer ready for more.
+        @param encoder_speed: value reported as the fly speed of the conveyor encoder.
+        @param axis_reads: status reads for which the rotary axis reports moving after each move.
+        @param packet_time: seconds the board takes to execute each list packet, 0 executes them instantly.
+        @param fault_after_packets: list packets received before the connection fails, None never fails.
+        """
+        super().__init__(channel)
+        self.buffer_packets = buffer_packets
+        self.packet_time = packet_time
+        self._packet_done = None
+        self.encoder_speed = encoder_speed
+        self.queue = deque()
+        self._cursor = 0
+        self.executing = False
+        self.waiting = False
+
+        self.packets_executed = 0
+        self.packets_discarded = 0
+        self.commands_executed = 0
+        self.fly_wait_count = 0
+        self.mark_count = 0
+        self.input_bits = 0
+        self.port_bits = 0
+        self.x = 0x8000
+        self.y = 0x8000
+        self.axis_reads = axis_reads
+        self.axis_position = 0
+        self.axis_target = 0
+        self.axis_moves = 0
+        self._axis_moving = 0
+        self._response = (0, 0, 0)
+        self._board_lock = threading.RLock()
+        self.fault_after_packets = fault_after_packets
+        self.faulted = False
+        self.packets_received = 0
+
+        # perf_counter() times execution was last stopped and a packet last executed.
+        self.stop_time = None
+        self.packet_executed_time = None
+
+    def _status(self):
+        status = 0
+        if len(self.queue) < self.buffer_packets:
+            status |= READY
+        if self.executing and (self.queue or self.waiting):
+            status |= BUSY
+        if self._axis_moving:
+            status |= AXIS
+            self._axis_moving -= 1
+            if not self._axis_moving:
+                self.axis_position = self.axis_target
+        return status
+
+    def open(self, index=0):
+        if self.faulted:
+            raise ConnectionError
+        return super().open(index)
+
+    def write(self, index=0, packet=None):
+        with self._board_lock:
+            if self.faulted:
+                raise ConnectionError
+            if len(packet) == 0xC00 and self.packets_received == self.fault_after_packets:
+                self.fault()
+                raise ConnectionError
+            super().write(index, packet)
+            words = _words(packet)
+            if len(packet) == 0xC00:
+                self.packets_received += 1
+                self.queue.append(words)
+                self._response = (0, 0, 0)
+            else:
+                self._response = self._realtime(*words)
+            self.run()
+
+    def read(self, index=0):
+        device = self.devices[index]
+        if not device or self.faulted:
+            raise ConnectionError
+        with self._board_lock:
+            self.run()
+            return struct.pack("<4H", *self._response, self._status())
+
+    #######################
+    # BOARD MODEL
+    #######################
+
+    def _realtime(self, opcode, v1, v2, v3, v4, v5):
+        """
+        Performs a realtime command.
+
+        @return: the first three words of the response.
+        """
+        if opcode == ExecuteList or opcode == RestartList:
+            self.executing = True
+        elif opcode == StopList:
+            self.executing = False
+            self._packet_done = None
+        elif opcode == StopExecute or opcode == ResetList:
+            if opcode == StopExecute:
+                self.stop_time = time.perf_counter()
+            self.executing = False
+            self.packets_discarded += len(self.queue)
+            self.queue.clear()
+            self._cursor = 0
+            self._packet_done = None
+            self.waiting = False
+        elif opcode == WritePort:
+            self.port_bits = v1
+        elif opcode == ReadPort:
+            return 0, self.input_bits, 0
+        elif opcode == GetListStatus:
+            return 0, self.packets_executed & 0xFFFF, 0
+        elif opcode == GetPositionXY:
+            return 0, self.x, self.y
+        elif opcode == GotoXY:
+            self.x = v1
+            self.y = v2
+        elif opcode == MoveAxisTo:
+            position = v1 | v2 << 16
+            if position >= 0x80000000:
+                position = -(position - 0x80000000)
+            self.axis_target = position
+            self.axis_moves += 1
+            self._axis_moving = self.axis_reads
+            if not self._axis_moving:
+                self.axis_position = position
+        elif opcode == GetAxisPos:
+            position = self.axis_position
+            if position < 0:
+                position = -position + 0x80000000
+            return 0, position >> 16, position & 0xFFFF
+        elif opcode == GetFlyWaitCount:
+            return 0, self.fly_wait_count & 0xFFFF, 0
+        elif opcode == GetMarkCount:
+            return 0, self.mark_count & 0xFFFF, 0
+        elif opcode == GetFlySpeed:
+            return 0, self.encoder_speed & 0xFFFF, 0
+        return 0, 0, 0
+
+    def _list_command(self, opcode, v1, v2, v3, v4, v5):
+        """
+        Performs a list command.
+
+        @return: whether execution continues past this command.
+        """
+        if opcode == listJumpTo or opcode == listMarkTo:
+            self.x = v1
+            self.y = v2
+        elif opcode == listWritePort:
+            self.port_bits = v1
+        elif opcode == listFlyWaitInput:
+            self.waiting = True
+            return False
+        elif opcode == listEndOfList:
+            # The list ends here, the rest of the packet is padding and later packets wait for the list to execute.
+            self.executing = False
+            return False
+        return True
+
+    def run(self):
+        """
+        Executes the buffered list, until it runs out or waits for a part.
+
+        @return:
+        """
+        if not self.executing or self.waiting:
+            return
+        queue = self.queue
+        while queue:
+            if self.packet_time:
+                now = time.perf_counter()
+                if self._packet_done is None:
+                    self._packet_done = now + self.packet_time
+                if now < self._packet_done:
+                    return
+                self._packet_done += self.packet_time
+            words = queue[0]
+            while self._cursor < len(words):
+                command = words[self._cursor : self._cursor + 6]
+                self._cursor += 6
+                self.commands_executed += 1
+                if not self._list_command(*command):
+                    if self.executing:
+                        return
+                    # The end of the list, the packet is done.
+                    break
+            queue.popleft()
+            self._cursor = 0
+            self.packets_executed += 1
+            self.packet_executed_time = time.perf_counter()
+            if not self.executing:
+                break
+        self._packet_done = None
+
+    def fault(self):
+        """
+        The connection fails. The board executes what it holds, as it would, but nothing reaches it.
+
+        @return:
+        """
+        with self._board_lock:
+            self.faulted = True
+            for index in self.devices:
+                self.devices[index] = False
+
+    def recover(self):
+        """
+        The connection may be opened again. The board executed the packets it held meanwhile.
+
+        @return:
+        """
+        with self._board_lock:
+            self.run()
+            self.faulted = False
+            self.fault_after_packets = None
+
+    def trigger(self, count=1):
+        """
+        Parts passing the part-present sensor. A part is marked if the list is waiting for one, otherwise it is missed.
+
+        @param count: number of parts.
+        @return: number of parts marked.
+        """
+        marked = 0
+        with self._board_lock:
+            for i in range(count):
+                self.fly_wait_count += 1
+                if self.waiting and self.executing:
+                    self.waiting = False
+                    self.mark_count += 1
+                    marked += 1
+                    self.run()
+        return marked
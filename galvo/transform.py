@@ -0,0 +1,239 @@
+"""
+Galvo Transform
+
+A transform maps positions in mm to galvo units: an affine stack in mm (translate, rotate, scale, or any matrix),
+then the lens scale in galvo units per mm about the origin, the center of the field by default. The composed matrix
+is cached until the stack or lens changes, and points are transformed in bulk with numpy.
+
+Like a canvas, each operation applies to positions given after it, before the operations already on the stack:
+`translate(10, 0)` then `rotate(90)` rotates positions about the origin, then moves them 10mm along x. `push()` and
+`pop()` save and restore the stack, around a part for example.
+
+Transformed positions outside the galvo field, 0 to 0xFFFF, are counted in stats(). The bulk commands clip lines to
+the field, as for positions given in galvo units: a path leaving the field is marked to its edge and jumps to where it
+comes back.
+"""
+
+import math
+from contextlib import contextmanager
+
+import numpy as np
+
+FIELD = 0xFFFF
+
+
+class Transform:
+    def __init__(self, galvos_per_mm=500, origin=(0x8000, 0x8000)):
+        """
+        @param galvos_per_mm: lens scale, galvo units per mm. Negative flips both axes.
+        @param origin: galvo position of 0mm, 0mm.
+        """
+        self._galvos_per_mm = galvos_per_mm
+        self._origin = tuple(origin)
+        self._stack = [np.identity(3)]
+        self._matrix = None
+
+        self.compositions = 0
+        self.points = 0
+        self.points_outside = 0
+
+    @classmethod
+    def from_correction_file(cls, filename, origin=(0x8000, 0x8000)):
+        """
+        Transform with the lens scale of a correction file.
+
+        @param filename: .cor file.
+        @param origin: galvo position of 0mm, 0mm.
+        @return: Transform
+        """
+        from .controller import GalvoController
+
+        return cls(GalvoController.get_scale_from_correction_file(filename), origin)
+
+    @property
+    def galvos_per_mm(self):
+        return self._galvos_per_mm
+
+    @galvos_per_mm.setter
+    def galvos_per_mm(self, value):
+        self._galvos_per_mm = value
+        self._matrix = None
+
+    @property
+    def origin(self):
+        return self._origin
+
+    @origin.setter
+    def origin(self, value):
+        self._origin = tuple(value)
+        self._matrix = None
+
+    #######################
+    # STACK
+    #######################
+
+    def apply(self, matrix):
+        """
+        Applies a matrix to positions given after this.
+
+        @param matrix: 3x3 array-like, or the six values a, b, c, d, e, f of the matrix [[a, c, e], [b, d, f]], as
+            in svg.
+        @return:
+        """
+        matrix = np.asarray(matrix, dtype=np.float64)
+        if matrix.shape == (6,):
+            a, b, c, d, e, f = matrix
+            matrix = np.array([[a, c, e], [b, d, f], [0.0, 0.0, 1.0]])
+        elif matrix.shape != (3, 3):
+            raise ValueError(f"Expected a 3x3 matrix or 6 values, not {matrix.shape}.")
+        self._stack[-1] = self._stack[-1] @ matrix
+        self._matrix = None
+
+    def translate(self, dx, dy):
+        """
+        @param dx: mm
+        @param dy: mm
+        @return:
+        """
+        self.apply((1.0, 0.0, 0.0, 1.0, dx, dy))
+
+    def rotate(self, angle, cx=0.0, cy=0.0):
+        """
+        @param angle: degrees, counterclockwise from x towards y.
+        @param cx: center of rotation in mm.
+        @param cy: center of rotation in mm.
+        @return:
+        """
+        angle = math.radians(angle)
+        cos = math.cos(angle)
+        sin = math.sin(angle)
+        self.apply(
+            (cos, sin, -sin, cos, cx - cos * cx + sin * cy, cy - sin * cx - cos * cy)
+        )
+
+    def scale(self, sx, sy=None, cx=0.0, cy=0.0):
+        """
+        @param sx: scale along x.
+        @param sy: scale along y, sx if None.
+        @param cx: center of scaling in mm.
+        @param cy: center of scaling in mm.
+        @return:
+        """
+        if sy is None:
+            sy = sx
+        self.apply((sx, 0.0, 0.0, sy, cx - sx * cx, cy - sy * cy))
+
+    def reset(self):
+        """
+        Clears the current level of the stack.
+
+        @return:
+        """
+        self._stack[-1] = np.identity(3)
+        self._matrix = None
+
+    def push(self):
+        self._stack.append(self._stack[-1].copy())
+
+    def pop(self):
+        if len(self._stack) == 1:
+            raise IndexError("pop from an unpushed transform")
+        self._stack.pop()
+        self._matrix = None
+
+    @contextmanager
+    def saved(self):
+        """
+        Restores the stack on exit, as push() and pop().
+        """
+        self.push()
+        try:
+            yield self
+        finally:
+            self.pop()
+
+    #######################
+    # TRANSFORMING
+    #######################
+
+    @property
+    def matrix(self):
+        """
+        Composed 3x3 matrix from mm to galvo units.
+        """
+        matrix = self._matrix
+        if matrix is None:
+            scale = self._galvos_per_mm
+            x, y = self._origin
+            lens = np.array([[scale, 0.0, x], [0.0, scale, y], [0.0, 0.0, 1.0]])
+            matrix = lens @ self._stack[-1]
+            self._matrix = matrix
+            self.compositions += 1
+        return matrix
+
+    def __call__(self, points):
+        """
+        Transforms positions in mm to galvo units.
+
+        @param points: array-like whose last axis is x, y in mm, as (N, 2) points or (N, 2, 2) segments.
+        @return: float64 array of the same shape in galvo units.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        matrix = self.matrix
+        result = points @ matrix[:2, :2].T
+        result += matrix[:2, 2]
+        count = result.size // 2
+        if count:
+            inside = (result >= 0) & (result <= FIELD)
+            self.points += count
+            self.points_outside += count - int(np.count_nonzero(inside.reshape(-1, 2).all(axis=1)))
+        return result
+
+    def point(self, x, y):
+        """
+        Transforms a position in mm to galvo units, rounded.
+
+        @return: x, y in galvo units.
+        """
+        matrix = self.matrix
+        gx = matrix[0, 0] * x + matrix[0, 1] * y + matrix[0, 2]
+        gy = matrix[1, 0] * x + matrix[1, 1] * y + matrix[1, 2]
+        self.points += 1
+        if not (0 <= gx <= FIELD and 0 <= gy <= FIELD):
+            self.points_outside += 1
+        return int(round(gx)), int(round(gy))
+
+    def tolerance(self, galvos=0.5):
+        """
+        Distance in mm which no direction of the transform stretches beyond the given galvo units, the tolerance to
+        flatten curves in mm to for them to be within that many galvo units on the field.
+
+        @param galvos: galvo units.
+        @return: mm
+        """
+        stretch = np.linalg.norm(self.matrix[:2, :2], 2)
+        if not stretch:
+            return math.inf
+        return galvos / stretch
+
+    def inverse(self, points):
+        """
+        Transforms positions in galvo units to mm.
+
+        @param points: array-like whose last axis is x, y in galvo units.
+        @return: float64 array of the same shape in mm.
+        """
+        inverse = np.linalg.inv(self.matrix)
+        points = np.asarray(points, dtype=np.float64)
+        return points @ inverse[:2, :2].T + inverse[:2, 2]
+
+    def stats(self):
+        return {
+            "points": self.points,
+            "points_outside": self.points_outside,
+            "compositions": self.compositions,
+        }
+
+    def reset_stats(self):
+        self.points = 0
+        self.points_outside = 0
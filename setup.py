@@ -3,5 +3,6 @@ from setuptools import setup
 setup(
     install_requires=[
         "pyusb",
+        "numpy",
     ],
 )
\ No newline at end of file
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+import unittest
+
+from galvo import *
+from galvo.simulated_connection import SimulatedConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+
+class QueueConnection(SimulatedConnection):
+    """
+    Simulated board remembering the most list packets it held at once.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_queue = 0
+
+    def write(self, index=0, packet=None):
+        super().write(index, packet)
+        self.max_queue = max(self.max_queue, len(self.queue))
+
+
+def job(c, points=20000):
+    with c.marking():
+        c.goto(0x1000, 0x1000)
+        for i in range(points):
+            c.mark(0x1010 + (i % 1000) * 0x20, 0x1000 + (i // 1000) * 0x100)
+
+
+def board_filled(board, packets):
+    end = time.perf_counter() + 10
+    while len(board.queue) < packets and time.perf_counter() < end:
+        time.sleep(0.005)
+
+
+class TestAbort(unittest.TestCase):
+    def test_abort_interrupts_wait_ready(self):
+        c = GalvoController(settings_file=__settings__)
+        board = SimulatedConnection(buffer_packets=4, packet_time=10.0)
+        c.connection = board
+        thread = threading.Thread(target=job, args=(c,))
+        thread.start()
+        # The board is full and executes no more, the job waits for it to be ready.
+        board_filled(board, 4)
+        start = time.perf_counter()
+        c.abort()
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertLess(board.stop_time - start, 0.5)
+        self.assertLess(c.abort_latency, 0.5)
+        self.assertEqual(c.aborts, 1)
+        thread.join(10)
+        self.assertFalse(thread.is_alive())
+        # Nothing of the job was sent after the abort, only its dummy packet.
+        self.assertEqual(len(board.queue), 1)
+        self.assertEqual(board.packets_executed, 0)
+        self.assertEqual(c.laser_configuration, "initial")
+
+    def test_abort_then_mark(self):
+        c = GalvoController(settings_file=__settings__)
+        board = SimulatedConnection(buffer_packets=0x100)
+        c.connection = board
+        c.abort()
+        job(c, points=1000)
+        c.wait_finished()
+        self.assertEqual(board.count(listMarkTo), 1000)
+        self.assertEqual(board.queue, type(board.queue)())
+
+    def test_max_inflight_packets(self):
+        c = GalvoController(settings_file=__settings__)
+        board = QueueConnection(buffer_packets=8, packet_time=0.001)
+        c.connection = board
+        c.max_inflight_packets = 2
+        job(c)
+        c.wait_finished()
+        self.assertEqual(board.max_queue, 2)
+        self.assertEqual(board.count(listMarkTo), 20000)
+
+    def test_max_inflight_packets_below_start(self):
+        c = GalvoController(settings_file=__settings__)
+        board = QueueConnection(buffer_packets=8, packet_time=0.001)
+        c.connection = board
+        c.max_inflight_packets = 1
+        job(c, points=2000)
+        c.wait_finished()
+        self.assertEqual(board.max_queue, 1)
+        self.assertEqual(board.count(listMarkTo), 2000)
+
+    def test_max_inflight_packets_setting(self):
+        c = GalvoController(settings_file=__settings__)
+        self.assertIsNone(c.max_inflight_packets)
+        with self.assertRaises(ValueError):
+            c.max_inflight_packets = 0
@@ -0,0 +1,38 @@
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks import suite
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_suite_runs(self):
+        """
+        Every workload runs against every connection, at a small scale.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results.json")
+            arguments = ["-c", *suite.CONNECTIONS, "-r", "1", "-s", "0.01"]
+            self.assertEqual(suite.main(arguments + ["--json", path]), 0)
+            with open(path) as fp:
+                results = json.load(fp)
+            self.assertEqual(
+                len(results), len(suite.WORKLOADS) * len(suite.CONNECTIONS)
+            )
+            for name, result in results.items():
+                self.assertGreater(result["commands"], 0, name)
+                self.assertGreater(result["packets_per_second"], 0, name)
+            self.assertIn("latency_mean", results["short_jobs[simulated]"])
+            self.assertEqual(
+                suite.main(arguments + ["--compare", path, "--threshold", "1000"]), 0
+            )
+
+    def test_compare(self):
+        baseline = {"a": {"time": 1.0}, "b": {"time": 1.0}}
+        results = {"a": {"time": 1.1}, "b": {"time": 2.0}, "c": {"time": 5.0}}
+        self.assertEqual(suite.compare(results, baseline, 1.25), [("b", 2.0)])
@@ -0,0 +1,126 @@
+import os
+import tempfile
+import unittest
+
+from galvo import *
+from galvo.checkpoint import Checkpoint
+from galvo.simulated_connection import SimulatedConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+POINTS = 20000
+
+
+def job(c, points=POINTS, offset=0):
+    with c.marking():
+        c.set(mark_speed=100.0, power=50.0)
+        c.goto(0x1000, 0x1000)
+        for i in range(points):
+            if i == points // 2:
+                c.set(mark_speed=200.0, power=75.0)
+            c.mark(0x1010 + (i % 1000) * 0x20 + offset, 0x1000 + (i // 1000) * 0x100)
+
+
+def marks(board):
+    return list(zip(board.values(listMarkTo, 1), board.values(listMarkTo, 2)))
+
+
+class TestCheckpoint(unittest.TestCase):
+    def reference(self):
+        c = GalvoController(settings_file=__settings__)
+        board = SimulatedConnection(buffer_packets=0x100)
+        c.connection = board
+        job(c)
+        c.wait_finished()
+        return board
+
+    def test_resume_after_fault(self):
+        reference = self.reference()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "job.checkpoint")
+            c = GalvoController(settings_file=__settings__)
+            board = SimulatedConnection(buffer_packets=0x100, fault_after_packets=40)
+            c.connection = board
+            checkpoint = c.enable_checkpoints(path)
+            with self.assertRaises(ConnectionRefusedError):
+                job(c)
+            self.assertTrue(checkpoint.interrupted)
+            self.assertLess(board.count(listMarkTo), POINTS)
+            executed = checkpoint.lists[0].executed
+            self.assertGreater(executed, 3)
+            c.disconnect()
+            c.disable_checkpoints()
+
+            # Another controller resumes the job from the journal file.
+            board.recover()
+            c = GalvoController(settings_file=__settings__)
+            c.connection = board
+            checkpoint = c.enable_checkpoints(path)
+            self.assertTrue(checkpoint.interrupted)
+            job(c)
+            c.wait_finished()
+            self.assertEqual(checkpoint.resumes, 1)
+            self.assertEqual(checkpoint.packets_skipped, executed)
+            self.assertFalse(checkpoint.interrupted)
+            # Every point marked once, in order, the second half at the speed and power set mid-job.
+            self.assertEqual(marks(board), marks(reference))
+            self.assertEqual(board.last_value(listMarkSpeed), reference.last_value(listMarkSpeed))
+            self.assertEqual(
+                board.last_value(listMarkCurrent), reference.last_value(listMarkCurrent)
+            )
+            self.assertEqual(Checkpoint(path).stats()["lists"], 1)
+            c.disable_checkpoints()
+
+            # The next run of the job starts over.
+            c.enable_checkpoints(path)
+            job(c)
+            c.wait_finished()
+            self.assertEqual(board.count(listMarkTo), 2 * POINTS)
+            self.assertEqual(c.checkpoint.resumes, 0)
+
+    def test_resume_restores_parameters(self):
+        c = GalvoController(settings_file=__settings__)
+        board = SimulatedConnection(buffer_packets=0x100)
+        c.connection = board
+        checkpoint = c.enable_checkpoints()
+        job(c)
+        c.wait_finished()
+        reference = marks(board)
+        # As though the connection failed after the board executed half of the list.
+        journaled = checkpoint.lists[0]
+        half = len(journaled.digests) // 2 + 1
+        journaled.executed = half
+        journaled.done = False
+        board.clear()
+        job(c)
+        c.wait_finished()
+        self.assertEqual(checkpoint.packets_skipped, half)
+        resumed = marks(board)
+        self.assertLess(len(resumed), POINTS // 2)
+        self.assertEqual(resumed, reference[-len(resumed) :])
+        # The first list packet sent restores the speed and power set mid-job, and the position.
+        restore = [command for command in board.commands(realtime=False)][: 0x100]
+        opcodes = [command[0] for command in restore]
+        self.assertIn(listMarkSpeed, opcodes)
+        self.assertIn(listMarkCurrent, opcodes)
+        self.assertEqual(opcodes[opcodes.index(listJumpTo) + 1], listEndOfList)
+
+    def test_job_differs(self):
+        c = GalvoController(settings_file=__settings__)
+        c.connection = SimulatedConnection(buffer_packets=0x100)
+        checkpoint = c.enable_checkpoints()
+        job(c)
+        c.wait_finished()
+        checkpoint.lists[0].executed = 10
+        checkpoint.lists[0].done = False
+        board = c.connection
+        board.clear()
+        with self.assertRaises(ValueError):
+            job(c, offset=0x10)
+        self.assertEqual(checkpoint.packets_skipped, 0)
+        self.assertEqual(board.count(realtime=False), 0)
+        self.assertEqual(c.laser_configuration, "initial")
+        # The journal is kept for the job it belongs to.
+        self.assertTrue(checkpoint.interrupted)
@@ -0,0 +1,115 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from galvo import *
+from galvo.connections import (
+    connection_backends,
+    create_connection,
+    get_connection_class,
+    register_connection,
+)
+from galvo.recorder_connection import RecorderConnection
+from galvo.simulated_connection import SimulatedConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+__root__ = os.path.dirname(__location__)
+
+
+def run_python(code):
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=__root__,
+        capture_output=True,
+        text=True,
+    )
+
+
+class TestConnections(unittest.TestCase):
+    def test_import_is_lazy(self):
+        """
+        Importing galvo and creating a controller does not import pyusb or numpy.
+        """
+        result = run_python(
+            "import sys, galvo\n"
+            "c = galvo.GalvoController(mock=True)\n"
+            "print(sorted(m for m in sys.modules if m.split('.')[0] in ('usb', 'numpy')))\n"
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "[]")
+
+    def test_import_time(self):
+        """
+        Importing galvo is cheap, timed in a fresh interpreter.
+        """
+        result = run_python(
+            "import time\n"
+            "start = time.perf_counter()\n"
+            "import galvo\n"
+            "print(time.perf_counter() - start)\n"
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        elapsed = float(result.stdout.strip())
+        self.assertLess(elapsed, 1.0, f"import galvo: {elapsed * 1000:.1f} ms")
+
+    def test_import_without_pyusb(self):
+        """
+        Without pyusb, galvo imports and the mock connection works, only the usb backend fails.
+        """
+        result = run_python(
+            "import sys\n"
+            "sys.modules['usb'] = None\n"
+            "import galvo\n"
+            "c = galvo.GalvoController(mock=True)\n"
+            "c.connect_if_needed()\n"
+            "print('connection', type(c.connection).__name__)\n"
+            "try:\n"
+            "    galvo.GalvoController(backend='usb').connect_if_needed()\n"
+            "except ImportError:\n"
+            "    print('usb', 'ImportError')\n"
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        lines = result.stdout.splitlines()
+        self.assertIn("connection MockConnection", lines)
+        self.assertIn("usb ImportError", lines)
+
+    def test_backends(self):
+        self.assertIn("usb", connection_backends())
+        self.assertIs(get_connection_class("simulated"), SimulatedConnection)
+        self.assertIsInstance(create_connection("recorder"), RecorderConnection)
+        with self.assertRaises(ValueError):
+            get_connection_class("nonexistent")
+
+    def test_backend_setting(self):
+        c = GalvoController(settings_file=__settings__, backend="simulated")
+        c.mock = False
+        self.assertEqual(c.backend, "simulated")
+        c.connect_if_needed()
+        self.assertIsInstance(c.connection, SimulatedConnection)
+        c.goto_xy(0x9000, 0x9000)
+        self.assertEqual(c.connection.x, 0x9000)
+        with self.assertRaises(TypeError):
+            c.backend = 1
+
+    def test_register_connection(self):
+        created = []
+
+        def factory(channel):
+            connection = RecorderConnection(channel)
+            created.append(connection)
+            return connection
+
+        register_connection("test_factory", factory)
+        c = GalvoController(settings_file=__settings__, backend="test_factory")
+        c.mock = False
+        c.connect_if_needed()
+        self.assertEqual(created, [c.connection])
+
+        register_connection(
+            "test_string", "galvo.simulated_connection:SimulatedConnection"
+        )
+        self.assertIs(get_connection_class("test_string"), SimulatedConnection)
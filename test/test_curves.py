@@ -0,0 +1,125 @@
+import math
+import os
+import unittest
+
+import numpy as np
+
+from galvo import *
+from galvo import curves
+from galvo.recorder_connection import RecorderConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+
+def distance_to_polyline(points, polyline):
+    """
+    Distance of each point to the nearest segment of the polyline.
+    """
+    a = polyline[:-1][None]
+    ab = (polyline[1:] - polyline[:-1])[None]
+    ap = points[:, None] - a
+    t = np.clip((ap * ab).sum(-1) / np.maximum((ab * ab).sum(-1), 1e-300), 0, 1)
+    return np.linalg.norm(ap - t[..., None] * ab, axis=-1).min(axis=1)
+
+
+class TestCurves(unittest.TestCase):
+    def test_circle_tolerance(self):
+        angles = np.linspace(0, 2 * np.pi, 5000)
+        for radius in (0.2, 10, 1000, 0x4000):
+            for tolerance in (0.5, 0.05):
+                points = curves.circle(5, -3, radius, tolerance)
+                np.testing.assert_array_equal(points[0], points[-1])
+                np.testing.assert_allclose(np.hypot(points[:, 0] - 5, points[:, 1] + 3), radius)
+                exact = np.column_stack((5 + radius * np.cos(angles), -3 + radius * np.sin(angles)))
+                self.assertLessEqual(distance_to_polyline(exact, points).max(), tolerance * (1 + 1e-9))
+        # Adaptive, larger circles take more segments.
+        self.assertLess(len(curves.circle(0, 0, 100, 0.5)), len(curves.circle(0, 0, 10000, 0.5)))
+
+    def test_ellipse_and_arc(self):
+        points = curves.ellipse(0, 0, 100, 20, math.radians(30), tolerance=0.1)
+        t = np.linspace(0, 2 * np.pi, 5000)
+        cos, sin = math.cos(math.radians(30)), math.sin(math.radians(30))
+        x, y = 100 * np.cos(t), 20 * np.sin(t)
+        exact = np.column_stack((cos * x - sin * y, sin * x + cos * y))
+        self.assertLessEqual(distance_to_polyline(exact, points).max(), 0.1)
+        np.testing.assert_allclose(points[0], (100 * cos, 100 * sin))
+
+        points = curves.arc(0, 0, 10, math.pi / 2, -math.pi, 0.01)
+        np.testing.assert_allclose(points[[0, -1]], [[0, 10], [0, -10]], atol=1e-9)
+        self.assertTrue(np.all(points[:, 0] >= -1e-9))
+
+    def test_bezier(self):
+        control = np.array([[0, 0], [0, 100], [100, 100], [100, -50]], dtype=float)
+        points = curves.bezier(control, 0.1)
+        np.testing.assert_array_equal(points[[0, -1]], control[[0, -1]])
+        t = np.linspace(0, 1, 5000)[:, None]
+        mt = 1 - t
+        exact = mt**3 * control[0] + 3 * mt * mt * t * control[1] + 3 * mt * t * t * control[2] + t**3 * control[3]
+        self.assertLessEqual(distance_to_polyline(exact, points).max(), 0.1)
+        # A straight curve is one chord.
+        self.assertEqual(len(curves.bezier([[0, 0], [1, 1], [2, 2]])), 2)
+        with self.assertRaises(ValueError):
+            curves.bezier([[0, 0], [1, 1]])
+
+    def test_unit_shapes_cached(self):
+        curves.cache_clear()
+        for i in range(100):
+            curves.circle(i, -i, 1000 + i, 0.5)
+        info = curves.cache_info()["circle"]
+        # Nearby radii share a segment count and reuse its table.
+        self.assertLessEqual(info.misses, 3)
+        self.assertEqual(info.hits + info.misses, 100)
+        # Arcs of many sweeps, as from files, have a cache of their own and leave the circles cached.
+        for i in range(300):
+            curves.arc(0, 0, 1000, 0.0, 0.01 * (i + 1), 0.5)
+        curves.circle(0, 0, 1000, 0.5)
+        self.assertEqual(curves.cache_info()["circle"].hits, info.hits + 1)
+        # Around the other way, a circle uses the same table.
+        points = curves.ellipse(0, 0, 1000, 1000, sweep=-curves.TAU)
+        self.assertEqual(curves.cache_info()["circle"].hits, info.hits + 2)
+        np.testing.assert_allclose(points[1:-1], curves.circle(0, 0, 1000)[-2:0:-1], atol=1e-9)
+
+    def test_tolerance_positive(self):
+        for tolerance in (0, -0.5, float("nan")):
+            with self.assertRaises(ValueError):
+                curves.circle(0, 0, 100, tolerance)
+            with self.assertRaises(ValueError):
+                curves.bezier([[0, 0], [1, 1], [2, 0]], tolerance)
+        c = GalvoController(settings_file=__settings__)
+        c.connection = RecorderConnection()
+        with self.assertRaises(ValueError):
+            c.mark_circle(0x8000, 0x8000, 0x1000, tolerance=0)
+
+    def test_mark_circle(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        with c.marking():
+            c.mark_circle(0x8000, 0x8000, 0x1000)
+            c.mark_arc(0x8000, 0x8000, 0x1000, 0, 90)
+            c.mark_ellipse(0x8000, 0x8000, 0x1000, 0x800, rotation=45)
+            c.mark_bezier((0x7000, 0x7000), (0x8000, 0x9000), (0x9000, 0x7000))
+        jumps = list(recorder.commands(listJumpTo))
+        self.assertEqual(len(jumps), 3)
+        marks = np.array([command[1:3] for command in recorder.commands(listMarkTo)])
+        expected = np.rint(curves.circle(0x8000, 0x8000, 0x1000, 0.5)[1:])
+        np.testing.assert_array_equal(marks[: len(expected)], expected)
+        self.assertEqual(tuple(marks[-1]), (0x9000, 0x7000))
+
+    def test_mark_circle_in_mm(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        transform = c.enable_transform()
+        transform.translate(10, 0)
+        with c.marking():
+            c.mark_circle(0, 0, 20, tolerance=0.5)
+        marks = np.array([command[1:3] for command in recorder.commands(listMarkTo)], dtype=float)
+        center = transform.point(0, 0)
+        radius = 20 * transform.galvos_per_mm
+        # Rounding adds up to half a galvo unit to the flattening.
+        distance = np.hypot(marks[:, 0] - center[0], marks[:, 1] - center[1])
+        self.assertLessEqual(np.abs(distance - radius).max(), 1.0)
+        self.assertEqual(len(marks), len(curves.circle(0, 0, radius, 0.5)) - 1)
@@ -0,0 +1,115 @@
+import os
+import unittest
+
+import numpy as np
+
+from galvo import *
+from galvo.farm import CompileFarm, end_positions, split_chunks
+from galvo.recorder_connection import RecorderConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+
+def spirals(count=60, points=400):
+    paths = []
+    t = np.linspace(0, 6 * np.pi, points)
+    for i in range(count):
+        cx = 0x3000 + (i % 8) * 0x1400
+        cy = 0x3000 + (i // 8) * 0x1400
+        r = 40 * t + (i * 37) % 200
+        paths.append(np.column_stack((cx + r * np.cos(t), cy + r * np.sin(t))))
+    # Degenerate paths: empty, a single point, a repeat of the last position, and out of the field.
+    paths.insert(10, np.zeros((0, 2)))
+    paths.insert(20, paths[19][-1:])
+    paths.insert(30, np.array([[0x20000, 5], [0x20001, 6]]))
+    return paths
+
+
+def marked(paths, farm=None, **settings):
+    c = GalvoController(settings_file=__settings__)
+    for key, value in settings.items():
+        setattr(c, key, value)
+    recorder = RecorderConnection()
+    c.connection = recorder
+    with c.marking():
+        c.goto(0x1000, 0x1000)
+        c.mark_polylines(paths, farm)
+        c.mark(0x2000, 0x2000)
+    return c, recorder
+
+
+class TestFarm(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.farm = CompileFarm(workers=2, chunks_per_worker=3, min_points=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.farm.close()
+
+    def assert_identical(self, **settings):
+        paths = spirals()
+        serial, expected = marked(paths, **settings)
+        farmed, recorded = marked(paths, self.farm, **settings)
+        self.assertEqual(
+            list(recorded.commands(realtime=False)),
+            list(expected.commands(realtime=False)),
+        )
+        self.assertEqual(farmed.get_list_state(), serial.get_list_state())
+        self.assertEqual(farmed.jump_delay_stats, serial.jump_delay_stats)
+        return farmed
+
+    def test_identical(self):
+        chunks = self.farm.chunks
+        self.assert_identical()
+        self.assertGreater(self.farm.chunks, chunks)
+
+    def test_identical_jump_delay_model(self):
+        self.assert_identical(
+            jump_delay_curve=[(0, 10), (0x1000, 100), (0x8000, 400)],
+            goto_speed=3000.0,
+        )
+
+    def test_recompiled_on_mismatch(self):
+        """
+        A path continuing from where the previous path ended does not jump, so does not set the jump delay. Chunks
+        after such a path are compiled from the wrong jump delay, and are compiled again.
+        """
+        paths = []
+        for path in spirals():
+            paths.append(path)
+            if path.shape[0]:
+                paths.append(path[-1] + np.array([[0, 0], [0, 50], [50, 50]]))
+        recompiled = self.farm.recompiled
+        curve = [(0, 10), (0x1000, 100), (0x8000, 400)]
+        serial, expected = marked(paths, jump_delay_curve=curve)
+        farmed, recorded = marked(paths, self.farm, jump_delay_curve=curve)
+        self.assertEqual(
+            list(recorded.commands(realtime=False)),
+            list(expected.commands(realtime=False)),
+        )
+        self.assertEqual(farmed.get_list_state(), serial.get_list_state())
+        self.assertGreater(self.farm.recompiled, recompiled)
+
+    def test_split_chunks(self):
+        paths = spirals()
+        chunks = split_chunks(paths, 7)
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][1], len(paths))
+        for (a, b), (c, d) in zip(chunks, chunks[1:]):
+            self.assertEqual(b, c)
+        self.assertLessEqual(len(chunks), 7)
+        self.assertEqual(split_chunks([], 4), [])
+
+    def test_end_positions(self):
+        paths = [
+            np.array([[1.4, 2.6], [10, 20]]),
+            np.zeros((0, 2)),
+            np.array([[-5, 3]]),
+            np.array([[7, 8]]),
+        ]
+        self.assertEqual(
+            end_positions(paths, 0, 0), [(10, 20), (10, 20), (10, 20), (7, 8)]
+        )
@@ -0,0 +1,176 @@
+import os
+import tempfile
+import unittest
+
+from galvo import *
+from galvo.consts import GetVersion, MoveAxisTo, listMarkTo
+from galvo.file_connection import MAGIC, WAIT, FileConnection, read_job_file
+from galvo.recorder_connection import RecorderConnection
+from galvo.simulated_connection import SimulatedConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+
+def job(c):
+    with c.marking():
+        c.goto(0x6000, 0x6000)
+        for i in range(600):
+            c.mark(0x6010 + 16 * i, 0x6000 + (i % 2) * 0x100)
+        c.mark(0x7000, 0x7000)
+
+
+def generate(path, **kwargs):
+    c = GalvoController(
+        settings_file=__settings__, backend="file", backend_path=path, **kwargs
+    )
+    c.mock = False
+    job(c)
+    connection = c.connection
+    c.disconnect()
+    return connection
+
+
+class TestFileConnection(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_file_matches_recorded(self):
+        """
+        The list packets of a job file are those the job sends to a board.
+        """
+        connection = generate(self.path("job.lmc"))
+        self.assertIsInstance(connection, FileConnection)
+        packets = list(read_job_file(self.path("job.lmc")))
+        list_packets = [packet for packet in packets if len(packet) == 0xC00]
+        self.assertEqual(len(list_packets), connection.list_packets)
+        self.assertGreater(connection.list_packets, 2)
+        # Queries are not recorded.
+        self.assertIn(WAIT, packets)
+        for packet in packets:
+            if len(packet) == 0xC:
+                self.assertNotEqual(packet[0] | packet[1] << 8, GetVersion)
+
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        job(c)
+        replayed = RecorderConnection()
+        replayed.open()
+        for packet in list_packets:
+            replayed.write(0, packet)
+        self.assertEqual(
+            list(replayed.commands(realtime=False)),
+            list(recorder.commands(realtime=False)),
+        )
+
+    def test_compressed(self):
+        generate(self.path("job.lmc"))
+        for name in ("job.lmc.gz", "job.lmc.bz2", "job.lmc.xz"):
+            generate(self.path(name))
+            with open(self.path(name), "rb") as fp:
+                self.assertNotEqual(fp.read(len(MAGIC)), MAGIC)
+            self.assertEqual(
+                list(read_job_file(self.path(name))),
+                list(read_job_file(self.path("job.lmc"))),
+            )
+        self.assertLess(
+            os.path.getsize(self.path("job.lmc.gz")),
+            os.path.getsize(self.path("job.lmc")),
+        )
+
+    def test_stream_file(self):
+        """
+        Streaming a job file to a board marks the job.
+        """
+        generate(self.path("job.lmc.gz"))
+        c = GalvoController(settings_file=__settings__)
+        board = SimulatedConnection(buffer_packets=4)
+        c.connection = board
+        count = c.stream_file(self.path("job.lmc.gz"))
+        packets = list(read_job_file(self.path("job.lmc.gz")))
+        self.assertEqual(count, len([packet for packet in packets if packet]))
+        c.wait_finished()
+        self.assertFalse(board.queue)
+        self.assertEqual((board.x, board.y), (0x7000, 0x7000))
+        self.assertEqual(board.count(listMarkTo, realtime=False), 601)
+
+    def test_polling_waits(self):
+        """
+        Waits polling the board for anything but its readiness for the next list packet are recorded.
+        """
+
+        def axis_job(c):
+            with c.marking():
+                c.goto(0x6000, 0x6000)
+                c.move_axis_to(1000)
+                c.wait_axis()
+                c.mark(0x7000, 0x7000)
+
+        c = GalvoController(
+            settings_file=__settings__, backend="file", backend_path=self.path("axis.lmc")
+        )
+        c.mock = False
+        axis_job(c)
+        c.disconnect()
+        packets = list(read_job_file(self.path("axis.lmc")))
+        index = [
+            i for i, p in enumerate(packets) if len(p) == 0xC and p[0] | p[1] << 8 == MoveAxisTo
+        ][0]
+        self.assertIs(packets[index + 1], WAIT)
+        self.assertEqual(len(packets[index + 2]), 0xC00)
+
+        # Polling the list status under a cap of packets in flight neither hangs nor is lost.
+        c = GalvoController(
+            settings_file=__settings__, backend="file", backend_path=self.path("capped.lmc")
+        )
+        c.mock = False
+        c.max_inflight_packets = 2
+        job(c)
+        connection = c.connection
+        c.disconnect()
+        packets = list(read_job_file(self.path("capped.lmc")))
+        list_indexes = [i for i, p in enumerate(packets) if len(p) == 0xC00]
+        self.assertEqual(len(list_indexes), connection.list_packets)
+        for i in list_indexes:
+            self.assertIs(packets[i - 1], WAIT)
+        generate(self.path("job.lmc"))
+        uncapped = list(read_job_file(self.path("job.lmc")))
+        self.assertEqual(
+            [p for p in packets if len(p) == 0xC00],
+            [p for p in uncapped if len(p) == 0xC00],
+        )
+
+    def test_stream_file_aborted(self):
+        """
+        An abort issued before streaming a job file stops it, the next stream is sent.
+        """
+        generate(self.path("job.lmc"))
+        c = GalvoController(settings_file=__settings__)
+        board = SimulatedConnection(buffer_packets=4)
+        c.connection = board
+        c.abort()
+        self.assertEqual(c.stream_file(self.path("job.lmc")), 0)
+        self.assertEqual(board.count(listMarkTo, realtime=False), 0)
+        self.assertGreater(c.stream_file(self.path("job.lmc")), 0)
+        c.wait_finished()
+        self.assertEqual(board.count(listMarkTo, realtime=False), 601)
+
+    def test_invalid_files(self):
+        with open(self.path("bad.lmc"), "wb") as fp:
+            fp.write(b"not a job")
+        with self.assertRaises(ValueError):
+            list(read_job_file(self.path("bad.lmc")))
+        with open(self.path("short.lmc"), "wb") as fp:
+            fp.write(MAGIC + b"L" + bytes(12))
+        with self.assertRaises(ValueError):
+            list(read_job_file(self.path("short.lmc")))
+        with self.assertRaises(ValueError):
+            FileConnection()
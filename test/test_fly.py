@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+import unittest
+
+from galvo import *
+from galvo.fly import FlyMarking
+from galvo.simulated_connection import SimulatedConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+
+def part(c):
+    c.goto(0x7000, 0x7000)
+    c.mark(0x9000, 0x7000)
+    c.mark(0x9000, 0x9000)
+    c.mark(0x7000, 0x9000)
+    c.mark(0x7000, 0x7000)
+
+
+class TestFly(unittest.TestCase):
+    def test_fly_parts(self):
+        c = GalvoController(settings_file=__settings__)
+        board = SimulatedConnection()
+        c.connection = board
+        job = FlyMarking(part, parts=10, delay=100, ahead=3)
+        self.assertFalse(job(c))
+        self.assertEqual(job.armed, 3)
+        self.assertTrue(board.waiting)
+        for i in range(20):
+            if job(c):
+                break
+            board.trigger()
+        c.initial_configuration()
+        self.assertEqual(job.marked, 10)
+        self.assertEqual(job.armed, 10)
+        self.assertEqual(job.missed, 0)
+        self.assertEqual(board.mark_count, 10)
+        self.assertFalse(board.waiting)
+        self.assertEqual(board.count(listFlyWaitInput), 10)
+        self.assertEqual(board.count(listFlyDelay), 10)
+        self.assertEqual(board.count(listMarkTo), 40)
+        # Parts end where they start, only the first part jumps to its start.
+        self.assertEqual(board.count(listJumpTo), 1)
+        # Packets flushed part way do not end the list, the board executed every packet.
+        self.assertEqual(board.packets_executed, board.packets_received)
+
+    def test_fly_missed(self):
+        c = GalvoController(settings_file=__settings__)
+        board = SimulatedConnection()
+        c.connection = board
+        job = FlyMarking(part, ahead=1)
+        job(c)
+        # Three parts pass before the host re-arms, two are missed.
+        self.assertEqual(board.trigger(3), 1)
+        job(c)
+        self.assertEqual(job.stats()["marked"], 1)
+        self.assertEqual(job.stats()["missed"], 2)
+        job.stop()
+        self.assertTrue(job(c))
+        self.assertFalse(board.waiting)
+        self.assertEqual(c.laser_configuration, "initial")
+
+    def test_fly_spooled(self):
+        c = GalvoController(settings_file=__settings__)
+        board = SimulatedConnection()
+        c.connection = board
+
+        def conveyor():
+            while board.mark_count < 20:
+                board.trigger()
+                time.sleep(0.002)
+
+        job = c.fly_mark(part, parts=20)
+        thread = threading.Thread(target=conveyor)
+        thread.start()
+        c.wait_for_spooler_send()
+        thread.join()
+        self.assertEqual(job.marked, 20)
+        self.assertGreater(job.parts_per_minute, 0)
+        c.shutdown()
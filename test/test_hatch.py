@@ -0,0 +1,64 @@
+import os
+import unittest
+
+import numpy as np
+
+from galvo import *
+from galvo.hatch import hatch, hatch_lines
+from galvo.recorder_connection import RecorderConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+SQUARE = np.array([[0, 0], [100, 0], [100, 100], [0, 100]], dtype=float)
+HOLE = np.array([[25, 25], [75, 25], [75, 75], [25, 75]], dtype=float)
+
+
+class TestHatch(unittest.TestCase):
+    def test_hatch_square(self):
+        segments = hatch_lines(SQUARE + 0.5, 10)
+        self.assertEqual(len(segments), 10)
+        # Odd hatch lines run in reverse.
+        self.assertTrue(np.allclose(segments[0], [[100.5, 10], [0.5, 10]]))
+        self.assertTrue(np.allclose(segments[1], [[0.5, 20], [100.5, 20]]))
+        segments = hatch_lines(SQUARE + 0.5, 10, bidirectional=False)
+        self.assertTrue(np.all(segments[:, 0, 0] < segments[:, 1, 0]))
+
+    def test_hatch_hole(self):
+        segments = hatch_lines([[SQUARE + 0.5, HOLE + 0.5]], 10)
+        self.assertEqual(len(segments), 15)
+        lengths = np.abs(segments[:, 1, 0] - segments[:, 0, 0])
+        self.assertAlmostEqual(lengths.sum(), 100 * 10 - 50 * 5)
+
+    def test_hatch_angle_passes(self):
+        segments = hatch(SQUARE, 5, angle=45, passes=2)
+        self.assertTrue(np.all(segments >= -1e-9))
+        self.assertTrue(np.all(segments <= 100 + 1e-9))
+        directions = segments[:, 1] - segments[:, 0]
+        angles = np.degrees(np.arctan2(directions[:, 1], directions[:, 0])) % 90
+        self.assertTrue(np.allclose(angles, 45))
+
+    def test_hatch_controller_matches_goto_mark(self):
+        recorders = []
+        segments = np.rint(hatch([[SQUARE * 50 + 0x4000, HOLE * 50 + 0x4000]], 100))
+        # Lines crossing the hole are split around it.
+        middles = segments.mean(axis=1) - 0x4000
+        self.assertFalse(np.any(np.all((middles > 25 * 50) & (middles < 75 * 50), axis=1)))
+        self.assertGreater(len(segments), 50)
+        for bulk in (True, False):
+            c = GalvoController(settings_file=__settings__)
+            recorder = RecorderConnection()
+            c.connection = recorder
+            with c.marking():
+                if bulk:
+                    c.mark_segments(segments)
+                else:
+                    for (x0, y0), (x1, y1) in segments:
+                        c.goto(x0, y0)
+                        c.mark(x1, y1)
+            recorders.append(recorder)
+        self.assertEqual(
+            list(recorders[0].commands(realtime=False)),
+            list(recorders[1].commands(realtime=False)),
+        )
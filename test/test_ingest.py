@@ -0,0 +1,228 @@
+import io
+import os
+import unittest
+
+import numpy as np
+
+from galvo import *
+from galvo.bulk import polyline_words, polylines_words
+from galvo.ingest import cubic, path_data, read_dxf, read_paths, read_svg
+from galvo.recorder_connection import RecorderConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+SVG = b"""<?xml version="1.0"?>
+<svg xmlns="http://www.w3.org/2000/svg" width="100mm" height="50mm" viewBox="0 0 200 100">
+  <g transform="translate(10,10)">
+    <path d="M0 0 L20 0 h10 v10 Z"/>
+    <rect x="0" y="20" width="20" height="10"/>
+  </g>
+  <defs><circle cx="0" cy="0" r="5"/></defs>
+  <circle cx="50" cy="50" r="20" style="display: none"/>
+  <circle cx="100" cy="50" r="20"/>
+  <polyline points="0,0 10,0 10,10"/>
+</svg>
+"""
+
+DXF = """0
+SECTION
+2
+HEADER
+9
+$INSUNITS
+70
+1
+0
+ENDSEC
+0
+SECTION
+2
+ENTITIES
+0
+LWPOLYLINE
+90
+2
+70
+1
+10
+0.0
+20
+0.0
+42
+1.0
+10
+1.0
+20
+0.0
+0
+ARC
+10
+0.0
+20
+0.0
+40
+2.0
+50
+0.0
+51
+90.0
+0
+LINE
+10
+0.0
+20
+0.0
+11
+1.0
+21
+1.0
+0
+ENDSEC
+0
+EOF
+"""
+
+
+def distance_to_polyline(points, polyline):
+    """
+    Distance of each point to the nearest segment of the polyline.
+    """
+    a = polyline[:-1][None]
+    ab = (polyline[1:] - polyline[:-1])[None]
+    ap = points[:, None] - a
+    t = np.clip((ap * ab).sum(-1) / np.maximum((ab * ab).sum(-1), 1e-300), 0, 1)
+    return np.linalg.norm(ap - t[..., None] * ab, axis=-1).min(axis=1)
+
+
+class NamedFile(io.BytesIO):
+    """
+    File in memory with a name, as opened files have.
+    """
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+class TestIngest(unittest.TestCase):
+    def test_path_commands(self):
+        paths = list(path_data("M10 10 l10 0 H30 v10 Z m5 5 h1 M0 0", 0.01))
+        self.assertEqual(len(paths), 2)
+        np.testing.assert_allclose(paths[0], [[10, 10], [20, 10], [30, 10], [30, 20], [10, 10]])
+        # Relative after a close is from the start of the closed subpath.
+        np.testing.assert_allclose(paths[1], [[15, 15], [16, 15]])
+
+    def test_smooth_curves_and_arcs(self):
+        (path,) = path_data("M0 0 C0 10 10 10 10 0 S20 -10 20 0 Q25 5 30 0 T40 0 A5 5 0 0 1 50 0", 0.001)
+        ends = [tuple(point) for point in path]
+        for point in ((10, 0), (20, 0), (30, 0), (40, 0), (50, 0)):
+            self.assertIn(point, ends)
+        # The smooth cubic reflects the control point of the one before it.
+        second = path[np.argmin(np.abs(path[:, 0] - 15))]
+        self.assertLess(second[1], -5)
+        # The arc sweeps clockwise on screen, y being down, through negative y.
+        arc = path[path[:, 0] > 40]
+        np.testing.assert_allclose(np.hypot(arc[:, 0] - 45, arc[:, 1]), 5, atol=1e-9)
+        self.assertTrue(np.all(arc[:, 1] <= 1e-9))
+
+    def test_cubic_tolerance(self):
+        p = [np.array(v, dtype=float) for v in ((0, 0), (0, 100), (100, 100), (100, -50))]
+        for tolerance in (1.0, 0.1, 0.01):
+            points = np.concatenate(([p[0]], cubic(*p, tolerance)))
+            t = np.linspace(0, 1, 5000)[:, None]
+            mt = 1 - t
+            exact = mt**3 * p[0] + 3 * mt * mt * t * p[1] + 3 * mt * t * t * p[2] + t**3 * p[3]
+            self.assertLessEqual(distance_to_polyline(exact, points).max(), tolerance)
+        # Adaptive, a coarser tolerance needs fewer points.
+        self.assertLess(len(cubic(*p, 1.0)), len(cubic(*p, 0.01)) / 5)
+
+    def test_svg(self):
+        paths = list(read_svg(io.BytesIO(SVG), tolerance=0.01))
+        self.assertEqual(len(paths), 4)
+        # Half a mm per user unit, from the viewBox.
+        np.testing.assert_allclose(paths[0][:4], [[5, 5], [15, 5], [20, 5], [20, 10]])
+        np.testing.assert_allclose(paths[1][0], [5, 15])
+        circle = paths[2]
+        np.testing.assert_allclose(np.hypot(circle[:, 0] - 50, circle[:, 1] - 25), 10, atol=1e-9)
+        angles = np.linspace(0, 2 * np.pi, 500)[:, None]
+        exact = np.hstack((50 + 10 * np.cos(angles), 25 + 10 * np.sin(angles)))
+        self.assertLessEqual(distance_to_polyline(exact, circle).max(), 0.01)
+        np.testing.assert_allclose(paths[3], [[0, 0], [5, 0], [5, 5]])
+
+    def test_dxf(self):
+        paths = list(read_dxf(io.StringIO(DXF), tolerance=0.01))
+        self.assertEqual(len(paths), 3)
+        polyline, arc, line = paths
+        # Inches, a closed polyline whose first segment is a half circle.
+        np.testing.assert_allclose(polyline[0], polyline[-1])
+        np.testing.assert_allclose(np.hypot(polyline[:, 0] - 12.7, polyline[:, 1]), 12.7, atol=1e-9)
+        self.assertTrue(np.all(polyline[:, 1] <= 1e-9))
+        np.testing.assert_allclose(arc[[0, -1]], [[50.8, 0], [0, 50.8]], atol=1e-9)
+        np.testing.assert_allclose(line, [[0, 0], [25.4, 25.4]])
+
+    def test_format(self):
+        self.assertEqual(len(list(read_paths(NamedFile(SVG, "part.SVG")))), 4)
+        self.assertEqual(len(list(read_paths(io.BytesIO(DXF.encode()), file_format="dxf"))), 3)
+        with self.assertRaises(ValueError):
+            read_paths("part.pdf")
+
+    def test_mark_file_streams(self):
+        """
+        Marking starts before a large file is parsed.
+        """
+        rows = [f'<path d="M{i % 100} {i // 100} q 0.5 1 1 0 t 1 0"/>' for i in range(20000)]
+        data = b'<svg xmlns="http://www.w3.org/2000/svg" width="100mm" height="100mm" viewBox="0 0 200 200">'
+        data += "\n".join(rows).encode() + b"</svg>"
+        source = NamedFile(data, "large.svg")
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        first = []
+
+        write = recorder.write
+
+        def record(index=0, packet=None):
+            if len(packet) == 0xC00 and not first:
+                first.append(source.tell())
+            write(index, packet)
+
+        recorder.write = record
+        transform = c.enable_transform()
+        transform.translate(-25, -50)
+        with c.marking():
+            self.assertEqual(c.mark_file(source), 20000)
+        self.assertLess(first[0], len(data) / 2)
+        self.assertEqual(recorder.count(listJumpTo), 20000)
+        self.assertEqual(transform.stats()["points_outside"], 0)
+
+    def test_mark_file_batches_match_paths(self):
+        c = GalvoController(settings_file=__settings__)
+        c.connection = RecorderConnection()
+        with c.marking():
+            c.mark_file(io.BytesIO(SVG), file_format="svg", batch_points=1)
+        single = list(c.connection.commands())
+        c = GalvoController(settings_file=__settings__)
+        c.connection = RecorderConnection()
+        with c.marking():
+            c.mark_file(io.BytesIO(SVG), file_format="svg")
+        self.assertEqual(list(c.connection.commands()), single)
+
+    def test_polylines_words_match_polyline_words(self):
+        paths = [
+            np.array([[10.2, 10], [20, 10], [20, 10], [-5, 10], [30, 30]]),
+            np.array([[-1.0, -1.0], [70000, 0]]),
+            np.array([[30.0, 30.0], [40, 40]]),
+            np.zeros((0, 2)),
+            np.array([[5.0, 5.0]]),
+        ]
+        x, y = 10, 10
+        expected = []
+        for path in paths:
+            words = polyline_words(path, x, y)
+            if words.shape[0]:
+                x, y = int(words[-1, 1]), int(words[-1, 2])
+            expected.extend(words.tolist())
+        words = polylines_words(np.concatenate(paths), [len(path) for path in paths], 10, 10)
+        self.assertEqual(words.tolist(), expected)
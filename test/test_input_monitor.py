@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+import unittest
+
+from galvo import GalvoController
+from galvo.input_monitor import InputMonitor
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+
+class TestInputMonitor(unittest.TestCase):
+    def test_input_monitor_debounce(self):
+        controller = GalvoController(settings_file=__settings__)
+        reads = iter([0, 0, 0, 1, 0, 1, 1, 1, 1, 3, 3, 3])
+        monitor = InputMonitor(controller, passes_required=3, read=lambda: next(reads))
+        changes = []
+        matches = []
+        monitor.on_change(0x1, lambda old, new: changes.append((old, new)))
+        monitor.on_match(0x2, 0x2, matches.append)
+        for i in range(12):
+            monitor.poll()
+        self.assertEqual(monitor.state, 3)
+        self.assertEqual(changes, [(0, 1)])
+        self.assertEqual(matches, [3])
+        self.assertEqual(monitor.stats()["changes"], 3)
+
+    def test_input_monitor_wait_for(self):
+        controller = GalvoController(settings_file=__settings__)
+        inputs = [0]
+        monitor = InputMonitor(
+            controller, interval=0.001, passes_required=2, read=lambda: inputs[0]
+        )
+
+        def press():
+            time.sleep(0.1)
+            inputs[0] = 1 << 15
+
+        with monitor:
+            self.assertFalse(monitor.wait_for(1 << 15, 1 << 15, timeout=0.05))
+            threading.Thread(target=press).start()
+            self.assertTrue(monitor.wait_for(1 << 15, 1 << 15, timeout=2))
+            self.assertTrue(monitor.wait_for(1 << 15, 1 << 15))
+        stats = monitor.stats()
+        self.assertGreater(stats["poll_rate"], 0)
+        self.assertLess(stats["latency_max"], 0.5)
+
+    def test_shutdown_during_wait_for_input(self):
+        controller = GalvoController(settings_file=__settings__)
+        monitor = controller.input_monitor(interval=0.001)
+        monitor._read = lambda: 0
+        waited = []
+
+        def job(c):
+            waited.append(c.wait_for_input(1 << 15, 1 << 15))
+            return True
+
+        controller.submit(job)
+        time.sleep(0.2)
+        shutdown = threading.Thread(target=controller.shutdown, daemon=True)
+        shutdown.start()
+        shutdown.join(5)
+        self.assertFalse(shutdown.is_alive())
+        self.assertEqual(waited, [False])
+        self.assertFalse(monitor.is_running)
+
+    def test_abort_during_wait_for_input(self):
+        controller = GalvoController(settings_file=__settings__)
+        monitor = controller.input_monitor(interval=0.001)
+        monitor._read = lambda: 0
+        waited = []
+
+        def job(c):
+            waited.append(c.wait_for_input(1 << 15, 1 << 15))
+            return True
+
+        controller.submit(job)
+        time.sleep(0.2)
+        controller.abort()
+        for i in range(100):
+            if waited:
+                break
+            time.sleep(0.05)
+        self.assertEqual(waited, [False])
+        # Not resumed marking after the abort.
+        self.assertEqual(controller.laser_configuration, "initial")
+        controller.shutdown()
@@ -0,0 +1,72 @@
+import os
+import unittest
+
+import numpy as np
+
+from galvo import *
+from galvo.jump_delay import JumpDelayModel
+from galvo.recorder_connection import RecorderConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+CURVE = [(0, 10), (0x1000, 40), (0x8000, 250)]
+
+
+class TestJumpDelay(unittest.TestCase):
+    def test_jump_delay_model(self):
+        model = JumpDelayModel(CURVE)
+        self.assertEqual(model.delay(0), 10)
+        self.assertEqual(model.delay(0x800), 25)
+        self.assertEqual(model.delay(0x10000), 250)
+        distances = np.arange(0, 0x10000, 7)
+        self.assertEqual(
+            model.delays(distances).tolist(), [model.delay(d) for d in distances]
+        )
+
+    def test_jump_delay_setting(self):
+        settings = GalvoSettings(jump_delay_curve=CURVE)
+        self.assertEqual(settings.jump_delay_curve, tuple(CURVE))
+        with self.assertRaises(ValueError):
+            settings.jump_delay_curve = [(0, 0)]
+        with self.assertRaises(TypeError):
+            settings.jump_delay_curve = 10
+
+    def test_jump_delay_bulk_matches_goto(self):
+        segments = np.random.RandomState(0).randint(0x1000, 0xF000, (200, 2, 2))
+        recorders = []
+        for bulk in (True, False):
+            c = GalvoController(settings_file=__settings__)
+            c.jump_delay_curve = CURVE
+            recorder = RecorderConnection()
+            c.connection = recorder
+            with c.marking():
+                if bulk:
+                    c.mark_segments(segments)
+                else:
+                    for (x0, y0), (x1, y1) in segments:
+                        c.goto(x0, y0)
+                        c.mark(x1, y1)
+                stats = c.jump_delay_stats
+            recorders.append(recorder)
+            delays = recorder.values(listJumpDelay, realtime=False)
+            self.assertGreater(len(set(delays)), 50)
+            self.assertEqual(stats["jumps"], 200)
+            self.assertEqual(stats["baseline"], 200 * c.delay_jump_long)
+        self.assertEqual(
+            list(recorders[0].commands(realtime=False)),
+            list(recorders[1].commands(realtime=False)),
+        )
+
+    def test_jump_delay_saved(self):
+        c = GalvoController(settings_file=__settings__)
+        c.jump_delay_curve = CURVE
+        c.connection = RecorderConnection()
+        square = np.array([[0, 0], [10, 0], [10, 10], [0, 10]]) + 0x8000
+        with c.marking():
+            c.hatch(square, spacing=0.002)
+            stats = c.jump_delay_stats
+        self.assertGreater(stats["jumps"], 0)
+        self.assertGreater(stats["saved"], 0)
+        self.assertEqual(stats["delay"] + stats["saved"], stats["baseline"])
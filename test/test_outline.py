@@ -0,0 +1,81 @@
+import os
+import unittest
+
+import numpy as np
+
+from galvo import *
+from galvo.outline import (
+    adaptive_outline,
+    convex_hull,
+    decimate,
+    marked_paths,
+    outline,
+)
+from galvo.preview import LightPreview
+from galvo.recorder_connection import RecorderConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+
+def circle(radius, count, center=0x8000):
+    angles = np.linspace(0, 2 * np.pi, count)
+    return np.column_stack((np.cos(angles), np.sin(angles))) * radius + center
+
+
+class TestOutline(unittest.TestCase):
+    def test_outline_recorded_paths(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        with c.marking():
+            c.goto(0x5000, 0x5000)
+            c.mark(0x6000, 0x5000)
+            c.mark(0x6000, 0x6000)
+            c.goto(0x7000, 0x7000)
+            c.mark(0x7100, 0x7000)
+            with c.capture() as captured:
+                c.mark(0x7100, 0x7100)
+        paths = marked_paths(recorder)
+        self.assertEqual(len(paths), 2)
+        self.assertEqual(paths[0].tolist(), [[0x5000, 0x5000], [0x6000, 0x5000], [0x6000, 0x6000]])
+        # Captured commands start where they were captured.
+        self.assertEqual(marked_paths(captured)[0].tolist(), [[0x7100, 0x7000], [0x7100, 0x7100]])
+        self.assertEqual(
+            outline(recorder, "box")[0].tolist(),
+            [[0x5000, 0x5000], [0x7100, 0x5000], [0x7100, 0x7000], [0x5000, 0x7000], [0x5000, 0x5000]],
+        )
+
+    def test_outline_hull(self):
+        square = np.array([[0, 0], [100, 0], [100, 100], [0, 100]], dtype=float)
+        points = np.concatenate((np.random.rand(1000, 2) * 100, square))
+        hull = convex_hull(points)
+        self.assertEqual(len(hull), 5)
+        self.assertEqual(sorted(map(tuple, hull[:-1].tolist())), sorted(map(tuple, square.tolist())))
+        self.assertEqual(hull[0].tolist(), hull[-1].tolist())
+
+    def test_outline_decimate(self):
+        path = circle(1000, 2000)
+        decimated = decimate(path, 1.0)
+        self.assertLess(len(decimated), 200)
+        self.assertEqual(decimated[0].tolist(), path[0].tolist())
+        self.assertEqual(decimated[-1].tolist(), path[-1].tolist())
+        line = np.column_stack((np.arange(100.0), np.arange(100.0)))
+        self.assertEqual(len(decimate(line, 0.1)), 2)
+
+    def test_outline_adaptive(self):
+        c = GalvoController(settings_file=__settings__)
+        paths = [circle(0x1000, 20000)]
+        details = [adaptive_outline(paths, c, rate)[1:] for rate in (0.1, 10, 1000)]
+        self.assertEqual(details[0], ("paths", 0.0))
+        self.assertEqual(details[1][0], "paths")
+        self.assertGreater(details[1][1], 0)
+        self.assertEqual(details[2], ("box", 0.0))
+
+        recorder = RecorderConnection()
+        c.connection = recorder
+        preview = LightPreview(adaptive_outline(paths, c, 10)[0])
+        preview(c)
+        c.initial_configuration()
+        self.assertEqual(recorder.count(listJumpTo), len(preview.frame) - 2)
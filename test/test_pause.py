@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+import unittest
+
+from galvo import *
+from galvo.recorder_connection import RecorderConnection
+from galvo.simulated_connection import SimulatedConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+POINTS = 20000
+
+
+def job(c, points=POINTS):
+    with c.marking():
+        c.goto(0x1000, 0x1000)
+        for i in range(points):
+            c.mark(0x1010 + (i % 1000) * 0x20, 0x1000 + (i // 1000) * 0x100)
+
+
+def wait_for(condition, timeout=10):
+    end = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < end:
+        time.sleep(0.005)
+
+
+class TestPause(unittest.TestCase):
+    def test_pause_resume_exact(self):
+        c = GalvoController(settings_file=__settings__)
+        board = SimulatedConnection(buffer_packets=4, packet_time=0.002)
+        c.connection = board
+        thread = threading.Thread(target=job, args=(c,))
+        thread.start()
+        wait_for(lambda: board.packets_executed >= 5)
+        c.pause()
+        sent = board.count(realtime=False)
+        executed = board.packets_executed
+        stats = c.pause_stats
+        self.assertEqual(stats["pauses"], 1)
+        self.assertEqual(stats["executed"] + stats["pending"], sent // 0x100)
+        time.sleep(0.1)
+        # Neither sent nor executed while paused.
+        self.assertEqual(board.count(realtime=False), sent)
+        self.assertEqual(board.packets_executed, executed)
+        c.resume()
+        thread.join(30)
+        self.assertFalse(thread.is_alive())
+        c.wait_finished()
+        self.assertEqual(board.count(listMarkTo), POINTS)
+        self.assertEqual(board.packets_discarded, 0)
+        self.assertEqual(board.packets_executed, board.count(realtime=False) // 0x100)
+        stats = c.pause_stats
+        self.assertGreater(stats["paused_time"], 0.09)
+        self.assertLess(stats["resume_latency"], 0.1)
+
+    def test_resume_not_executing(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        c.pause()
+        self.assertEqual(c.state, ("idle", "idle"))
+        c.resume()
+        self.assertEqual(recorder.count(StopList), 1)
+        # No list was executing, none is restarted.
+        self.assertEqual(recorder.count(RestartList), 0)
+        self.assertFalse(c.paused)
+
+    def test_abort_while_paused(self):
+        c = GalvoController(settings_file=__settings__)
+        board = SimulatedConnection(buffer_packets=4, packet_time=0.002)
+        c.connection = board
+        thread = threading.Thread(target=job, args=(c,))
+        thread.start()
+        wait_for(lambda: board.packets_executed >= 2)
+        c.pause()
+        sent = board.count(realtime=False)
+        c.abort()
+        thread.join(10)
+        self.assertFalse(thread.is_alive())
+        # The job woken by the abort sends nothing more, only the abort's empty packet is sent.
+        self.assertEqual(board.count(realtime=False), sent + 0x100)
+        self.assertLess(board.count(listMarkTo), POINTS)
+        c.resume()
+        self.assertFalse(c.paused)
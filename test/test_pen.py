@@ -0,0 +1,158 @@
+import os
+import unittest
+
+from galvo import *
+from galvo.recorder_connection import RecorderConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+PENS = {
+    "fast": dict(mark_speed=2000.0, power=20.0, frequency=20.0, delay_on=50),
+    "slow": dict(mark_speed=100.0, power=80.0, frequency=40.0, fpk=10.0),
+    "fine": dict(mark_speed=100.0, power=80.0, frequency=40.0, delay_polygon=-20),
+}
+
+
+def pen_job(c, use_pens):
+    with c.marking():
+        for i in range(30):
+            name = ("fast", "slow", "fine")[i % 3]
+            if use_pens:
+                c.set_pen(name)
+            else:
+                c.set(**c.pens[name].parameters())
+            c.goto(0x5000, 0x5000 + i)
+            c.mark(0xA000, 0x5000 + i)
+
+
+class TestPen(unittest.TestCase):
+    def assert_pen_matches_set(self, source):
+        recorders = []
+        for use_pens in (False, True):
+            c = GalvoController(settings_file=__settings__)
+            c.source = source
+            c.fpk = 10.0
+            recorder = RecorderConnection()
+            c.connection = recorder
+            for name, parameters in PENS.items():
+                c.add_pen(name, **parameters)
+            pen_job(c, use_pens)
+            recorders.append(recorder)
+        self.assertEqual(
+            list(recorders[0].commands(realtime=False)),
+            list(recorders[1].commands(realtime=False)),
+        )
+
+    def test_pen_fiber_matches_set(self):
+        self.assert_pen_matches_set("fiber")
+
+    def test_pen_co2_matches_set(self):
+        self.assert_pen_matches_set("co2")
+
+    def test_pen_co2_without_frequency(self):
+        """
+        Co2 pens without a frequency set the power ratio and first pulse killer for the frequency of the board.
+        """
+        c = GalvoController(settings_file=__settings__)
+        c.source = "co2"
+        recorder = RecorderConnection()
+        c.connection = recorder
+        c.add_pen("a", power=20.0, fpk=10.0, frequency=None)
+        with c.marking():
+            c.set_pen("a")
+            c.set_frequency(40.0)
+            c.set_pen(c.add_pen("b", power=30.0, frequency=None))
+        self.assertEqual(list(recorder.values(listMarkFreq)), [333, 250])
+        self.assertEqual(list(recorder.values(listMarkPowerRatio))[-2:], [133, 150])
+        self.assertEqual(list(recorder.values(listSetCo2FPK)), [67])
+        # Pens without a frequency leave the setting.
+        self.assertEqual(c.settings.frequency, 30.0)
+
+    def test_pen_diff(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        c.add_pen("a", power=20.0)
+        c.add_pen("b", power=30.0)
+        with c.marking():
+            c.set_pen("a")
+            c.set_pen("a")
+            c.set_pen("b")
+        self.assertEqual(list(recorder.values(listMarkCurrent)), [0x800, 0x333, 0x4CC])
+        self.assertEqual(recorder.count(listMarkSpeed), 1)
+        self.assertEqual(c.power, 30.0)
+
+    def test_pen_recompile(self):
+        c = GalvoController(settings_file=__settings__)
+        pen = c.add_pen("a", power=20.0)
+        entries, block = pen.compile(c)
+        self.assertIs(pen.compile(c)[1], block)
+        pen.power = 30.0
+        self.assertNotEqual(pen.compile(c)[1], block)
+
+
+class TestListState(unittest.TestCase):
+    def test_list_state_retained_across_modes(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        with c.marking():
+            c.goto(0x5000, 0x5000)
+            c.mark(0x5000, 0xA000)
+        with c.lighting():
+            c.dark(0x5000, 0x5000)
+            c.light(0x5000, 0xA000)
+        saved = c.parameters_saved
+        with c.marking():
+            c.goto(0x5000, 0x5000)
+            c.mark(0x5000, 0xA000)
+        self.assertEqual(recorder.count(listMarkSpeed), 1)
+        self.assertEqual(recorder.count(listMarkCurrent), 1)
+        self.assertGreater(c.parameters_saved, saved)
+
+    def test_list_state_invalidated_by_abort(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        with c.marking():
+            c.goto(0x5000, 0x5000)
+            c.mark(0x5000, 0xA000)
+        invalidations = c.list_state_stats["invalidations"]
+        c.abort()
+        self.assertEqual(c.list_state_stats["invalidations"], invalidations + 1)
+        with c.marking():
+            c.goto(0x5000, 0x5000)
+            c.mark(0x5000, 0xA000)
+        self.assertEqual(recorder.count(listMarkSpeed), 2)
+        self.assertEqual(recorder.count(listMarkCurrent), 2)
+
+    def test_list_state_invalidated_by_conversion_settings(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        with c.marking():
+            c.set_mark_speed(100)
+        c.settings.galvos_per_mm = 1000
+        with c.marking():
+            c.set_mark_speed(100)
+        speeds = [command[1] for command in recorder.commands(listMarkSpeed)]
+        self.assertEqual(speeds[-1], c.settings.convert_speed(100))
+        self.assertEqual(speeds[-1], 100)
+        with c.marking():
+            c.set_mark_speed(100)
+        # Unchanged settings, the speed is still set.
+        self.assertEqual(recorder.count(listMarkSpeed), len(speeds))
+
+    def test_abort_invalidates_once(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        c.marking_configuration()
+        c.goto(0x5000, 0x5000)
+        for i in range(2000):
+            c.mark(0x5000 + i, 0xA000)
+        invalidations = c.list_state_stats["invalidations"]
+        c.abort()
+        self.assertEqual(c.list_state_stats["invalidations"], invalidations + 1)
@@ -0,0 +1,131 @@
+import os
+import struct
+import threading
+import unittest
+
+from galvo import *
+from galvo.preview import LightPreview
+from galvo.recorder_connection import RecorderConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+SQUARE = [[(0x6000, 0x6000), (0xA000, 0x6000), (0xA000, 0xA000), (0x6000, 0xA000)]]
+
+
+def list_commands(recorder):
+    return [
+        command
+        for command in recorder.commands(realtime=False)
+        if command[0] != listEndOfList
+    ]
+
+
+class TestPreview(unittest.TestCase):
+    def test_capture_matches_list(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        with c.marking():
+            state = c.get_list_state()
+            with c.capture() as captured:
+                c.goto(0x5000, 0x5000)
+                c.mark(0x6000, 0x5000)
+            # Nothing captured is sent, and the list state is unchanged.
+            self.assertEqual(c.get_list_state(), state)
+            # Parameters are not believed set while capturing, the jump delay is included.
+            self.assertEqual(len(captured), 3)
+            c.write_captured(captured)
+            self.assertEqual(c.get_last_xy(), (0x6000, 0x5000))
+        commands = list(captured_commands(captured))
+        self.assertEqual(list_commands(recorder)[-3:], commands)
+        self.assertEqual(commands[0][0], listJumpDelay)
+
+    def test_capture_other_thread(self):
+        """
+        Commands written by another thread during a capture go to its list, not into the capture.
+        """
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        c.marking_configuration()
+        thread = threading.Thread(target=c.list_delay_time, args=(77,))
+        with c.capture() as captured:
+            c.goto(0x5000, 0x5000)
+            thread.start()
+            thread.join(0.1)
+            # The other thread waits for the capture to end.
+            self.assertTrue(thread.is_alive())
+        thread.join(5)
+        self.assertNotIn(listDelayTime, [command[0] for command in captured_commands(captured)])
+        c.initial_configuration()
+        self.assertEqual(list(recorder.commands(listDelayTime))[-1][1], 77)
+
+    def test_write_bytes_not_split(self):
+        """
+        Commands written by another thread wait for pre-packed commands being written across packets.
+        """
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        c.marking_configuration()
+        sending = threading.Event()
+        release = threading.Event()
+        write = recorder.write
+
+        def blocking_write(index=0, packet=None):
+            if len(packet) == 0xC00 and not release.is_set():
+                sending.set()
+                release.wait(5)
+            return write(index, packet)
+
+        recorder.write = blocking_write
+        data = struct.pack("<6H", listDelayTime, 5, 0, 0, 0, 0) * 600
+        writer = threading.Thread(target=c._list_write_bytes, args=(data,))
+        writer.start()
+        self.assertTrue(sending.wait(5))
+        other = threading.Thread(target=c.list_delay_time, args=(77,))
+        other.start()
+        other.join(0.1)
+        release.set()
+        writer.join(5)
+        other.join(5)
+        c.initial_configuration()
+        delays = [command[1] for command in recorder.commands(listDelayTime)]
+        self.assertEqual(delays[delays.index(5) :][:601], [5] * 600 + [77])
+
+    def test_preview_frames(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        preview = LightPreview(SQUARE)
+        for i in range(50):
+            self.assertFalse(preview(c))
+        self.assertEqual(preview.builds, 1)
+        self.assertEqual(preview.frames, 50)
+        c.initial_configuration()
+        frame = list(captured_commands(preview.frame))
+        commands = list_commands(recorder)
+        for i in range(1, 50):
+            self.assertEqual(commands[-i * len(frame) :][: len(frame)], frame)
+        self.assertEqual(recorder.count(listJumpTo), 4 * 50)
+
+        preview.update([[(0x7000, 0x7000), (0x9000, 0x9000)]])
+        self.assertFalse(preview(c))
+        self.assertEqual(preview.builds, 2)
+        self.assertEqual(recorder.count(StopExecute, realtime=True), 1)
+        preview.stop()
+        self.assertTrue(preview(c))
+        self.assertGreater(preview.stats()["frames_sent_per_s"], 0)
+        c.initial_configuration()
+
+
+def captured_commands(captured):
+    data = bytes(captured)
+    for i in range(0, len(data), 12):
+        yield tuple(struct.unpack("<6H", data[i : i + 12]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import unittest
+
+from galvo import *
+from galvo.profiling import Profiler
+from galvo.recorder_connection import RecorderConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+
+def job(c):
+    c.set(power=50, frequency=30.0)
+    with c.marking():
+        c.goto(0x5000, 0x5000)
+        for i in range(2000):
+            c.mark(0x5000 + (i & 0xFF), 0x6000 + (i % 2) * 0x100)
+        c.set(power=20)
+        c.mark_polylines([[(0x7000, 0x7000), (0x7100, 0x7000), (0x7100, 0x7100)]])
+    c.get_serial_number()
+
+
+class TestProfiling(unittest.TestCase):
+    def test_profiling_counts_match_recorder(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        profiler = c.enable_profiling()
+        job(c)
+        snapshot = profiler.snapshot()
+        counts = recorder.opcode_counts()
+        commands = dict(snapshot["list_commands"])
+        commands.update(snapshot["realtime_commands"])
+        # The end of list padding of the packets is counted on its own.
+        self.assertNotIn("listEndOfList", commands)
+        commands["listEndOfList"] = snapshot["padding_commands"]
+        self.assertEqual(commands, counts)
+        self.assertEqual(snapshot["list_commands"]["listMarkTo"], 2002)
+        self.assertEqual(snapshot["list_packets"], recorder.count(realtime=False) // 0x100)
+        self.assertEqual(
+            snapshot["bytes_sent"],
+            snapshot["list_packets"] * 0xC00 + snapshot["realtime_packets"] * 0xC,
+        )
+        self.assertEqual(snapshot["wait_ready_calls"], snapshot["list_packets"])
+        self.assertGreater(snapshot["send_time"], 0)
+
+    def test_profiling_padding(self):
+        snapshots = []
+        for flush in (False, True):
+            c = GalvoController(settings_file=__settings__)
+            c.connection = RecorderConnection()
+            profiler = c.enable_profiling()
+            with c.marking():
+                c.goto(0x5000, 0x5000)
+                c.mark(0x6000, 0x5000)
+                if flush:
+                    c._list_flush()
+                c.mark(0x6000, 0x6000)
+            snapshots.append(profiler.snapshot())
+        commands = snapshots[0]["list_commands"]
+        self.assertEqual(commands["listMarkTo"], 2)
+        self.assertNotIn("listEndOfList", commands)
+        # The delays padding a flushed packet are not commands of the job either.
+        self.assertEqual(snapshots[1]["list_commands"], commands)
+        self.assertEqual(snapshots[1]["padding_commands"], 2 * 0x100 - sum(commands.values()))
+
+    def test_profiling_disabled(self):
+        c = GalvoController(settings_file=__settings__)
+        c.connection = RecorderConnection()
+        self.assertIsNone(c.profiler)
+        self.assertNotIn("send", c.__dict__)
+        profiler = c.enable_profiling()
+        self.assertIn("send", c.__dict__)
+        job(c)
+        c.disable_profiling()
+        self.assertIsNone(c.profiler)
+        self.assertNotIn("send", c.__dict__)
+        self.assertNotIn("wait_ready", c.__dict__)
+        packets = profiler.list_packets
+        job(c)
+        self.assertEqual(profiler.list_packets, packets)
+
+    def test_profiling_reset(self):
+        c = GalvoController(settings_file=__settings__)
+        c.connection = RecorderConnection()
+        profiler = c.enable_profiling(Profiler())
+        job(c)
+        profiler.reset()
+        snapshot = profiler.snapshot()
+        self.assertEqual(snapshot["list_commands"], {})
+        self.assertEqual(snapshot["realtime_commands"], {})
+        self.assertEqual(snapshot["bytes_sent"], 0)
+
+    def test_profiling_prometheus(self):
+        c = GalvoController(settings_file=__settings__)
+        c.connection = RecorderConnection()
+        profiler = c.enable_profiling()
+        job(c)
+        text = profiler.prometheus(labels={"machine": "station1"})
+        self.assertIn("# TYPE galvo_list_commands_total counter", text)
+        self.assertIn(
+            'galvo_list_commands_total{opcode="listMarkTo",machine="station1"} 2002',
+            text,
+        )
+        self.assertIn(
+            f'galvo_packets_total{{kind="list",machine="station1"}} {profiler.list_packets}',
+            text,
+        )
+        self.assertIn(
+            f'galvo_bytes_sent_total{{machine="station1"}} {profiler.bytes_sent}', text
+        )
+        for line in text.splitlines():
+            if not line.startswith("#"):
+                self.assertEqual(len(line.rsplit(" ", 1)), 2)
@@ -0,0 +1,59 @@
+import os
+import unittest
+
+import numpy as np
+
+from galvo import *
+from galvo.raster import Raster
+from galvo.recorder_connection import RecorderConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+
+class TestRaster(unittest.TestCase):
+    def test_raster_threshold_bidirectional(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        image = np.full((3, 8), 255, dtype=np.uint8)
+        image[0, 1:3] = 0
+        image[0, 5:7] = 0
+        image[2, 0:8] = 0
+        with c.marking():
+            c.raster(image, x=0x1000, y=0x2000, pixel_size=0x10)
+        marks = [(x, y) for o, x, y in recorder.positions() if o == listMarkTo]
+        jumps = [(x, y) for o, x, y in recorder.positions() if o == listJumpTo]
+        self.assertEqual(marks, [(0x1030, 0x2000), (0x1070, 0x2000), (0x1000, 0x2020)])
+        self.assertEqual(jumps, [(0x1010, 0x2000), (0x1050, 0x2000), (0x1080, 0x2020)])
+        self.assertEqual(c.get_last_xy(), (0x1000, 0x2020))
+
+    def test_raster_grayscale_power(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        image = np.array([[0, 0, 255, 128, 128, 0]], dtype=np.uint8)
+        with c.marking():
+            c.raster(
+                image,
+                x=0x1000,
+                y=0x2000,
+                pixel_size=1,
+                mode="grayscale",
+                levels=3,
+                power_min=10.0,
+                power_max=90.0,
+            )
+        self.assertEqual(
+            list(recorder.values(listMarkCurrent)),
+            [c._convert_power(50.0), c._convert_power(90.0), c._convert_power(10.0), c._convert_power(90.0)],
+        )
+        self.assertEqual(c._power, 90.0)
+
+    def test_raster_dither_and_bounds(self):
+        raster = Raster(np.full((16, 16), 128, dtype=np.uint8), mode="dither")
+        marked = sum(int(raster.row_levels(i).sum()) for i in range(16))
+        self.assertEqual(marked, 128)
+        with self.assertRaises(ValueError):
+            Raster(np.zeros((10, 10)), x=0xFFF0, pixel_size=10)
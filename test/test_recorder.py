@@ -0,0 +1,62 @@
+import os
+import unittest
+
+from galvo import *
+from galvo.recorder_connection import RecorderConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+
+class TestRecorder(unittest.TestCase):
+    def test_recorder_co2_values(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        c.source = "co2"
+        c.set(power=50, frequency=80.0, fpk=10.0)
+        with c.marking():
+            c.goto(0x5000, 0x5000)
+            c.mark(0x5000, 0xA000)
+        c.wait_for_machine_idle()
+        self.assertEqual(recorder.last_value(listMarkFreq), 0x007D)
+        self.assertEqual(recorder.last_value(listSetCo2FPK), 0x0019)
+        self.assertEqual(recorder.last_value(listMarkPowerRatio), 0x007D)
+        self.assertEqual(recorder.count(listMarkCurrent), 0)
+        self.assertEqual(recorder.count(listQSwitchPeriod), 0)
+        self.assertEqual(recorder.count(listMarkTo), 1)
+        self.assertEqual(recorder.count(ExecuteList, realtime=True), 1)
+
+    def test_recorder_distances(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        with c.marking():
+            c.goto(0x5000, 0x5000)
+            c.mark(0x5000, 0xA000)
+            c.mark(0xA000, 0xA000)
+            c.goto(0x5000, 0x5000)
+        self.assertEqual(recorder.mark_distance(), 0x5000 * 2)
+        self.assertAlmostEqual(
+            recorder.jump_distance(),
+            abs(complex(0x3000, 0x3000)) + abs(complex(0x5000, 0x5000)),
+        )
+        self.assertEqual(list(recorder.values(listMarkTo, field=2)), [0xA000, 0xA000])
+        self.assertEqual(
+            list(recorder.commands(listJumpTo))[0][:3], (listJumpTo, 0x5000, 0x5000)
+        )
+        self.assertEqual(recorder.opcode_counts()["listMarkTo"], 2)
+
+    def test_recorder_many_commands(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        with c.lighting():
+            for i in range(10000):
+                c.dark(0x1000 + (i & 0xFF), 0x1000)
+                c.light(0x2000, 0x2000 + (i & 0xFF))
+        self.assertEqual(recorder.count(listJumpTo), 20000)
+        self.assertGreater(recorder.packets, 20000 // 0x100)
+        recorder.clear()
+        self.assertEqual(len(recorder), 0)
@@ -0,0 +1,83 @@
+import os
+import unittest
+
+from galvo import *
+from galvo.repeat import RepeatMarking
+from galvo.simulated_connection import SimulatedConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+
+class Drawing:
+    def __init__(self):
+        self.static = 0
+        self.variable = 0
+
+    def frame(self, c):
+        self.static += 1
+        c.goto(0x6000, 0x6000)
+        c.mark(0xA000, 0x6000)
+        c.mark(0xA000, 0xA000)
+
+    def serial(self, c, value):
+        self.variable += 1
+        # A digit-like tick per serial value.
+        c.goto(0x7000 + value * 0x10, 0x8000)
+        c.mark(0x7000 + value * 0x10, 0x8100)
+
+
+def run(job, c):
+    while not job(c):
+        pass
+    c.initial_configuration()
+
+
+class TestRepeat(unittest.TestCase):
+    def test_repeat_count(self):
+        c = GalvoController(settings_file=__settings__)
+        board = SimulatedConnection(buffer_packets=0x100)
+        c.connection = board
+        drawing = Drawing()
+        job = RepeatMarking(drawing.frame, count=100)
+        self.assertFalse(job(c))
+        # Parts still in the list packet being built are not sent.
+        self.assertLess(job.poll(c), job.written)
+        run(job, c)
+        self.assertLessEqual(drawing.static, 2)
+        self.assertEqual(board.count(listMarkTo), 200)
+        self.assertEqual(board.count(listJumpTo), 100)
+        # Counted on the host, the undocumented mark count command is not sent.
+        self.assertEqual(board.count(listChangeMarkCount), 0)
+        self.assertEqual(job.poll(c), 100)
+        self.assertEqual(job.stats()["written"], 100)
+        self.assertEqual(job.stats()["sent"], 100)
+
+    def test_repeat_serial(self):
+        values = list(range(50))
+        moves = []
+        for fast in (True, False):
+            c = GalvoController(settings_file=__settings__)
+            board = SimulatedConnection(buffer_packets=0x100)
+            c.connection = board
+            drawing = Drawing()
+            if fast:
+                run(RepeatMarking(drawing.frame, variable=drawing.serial, values=values), c)
+                self.assertEqual(drawing.static, 1)
+            else:
+                with c.marking():
+                    for value in values:
+                        drawing.frame(c)
+                        drawing.serial(c, value)
+            self.assertEqual(drawing.variable, 50)
+            moves.append(list(board.positions()))
+        self.assertEqual(moves[0], moves[1])
+        self.assertEqual(board.count(listMarkTo), 150)
+
+    def test_repeat_requires_count(self):
+        drawing = Drawing()
+        with self.assertRaises(ValueError):
+            RepeatMarking(drawing.frame)
+        with self.assertRaises(ValueError):
+            RepeatMarking(drawing.frame, variable=drawing.serial)
@@ -0,0 +1,87 @@
+import os
+import struct
+import threading
+import unittest
+
+from galvo import *
+from galvo.connections import create_connection
+from galvo.consts import GetListStatus, StopExecute
+from galvo.ring_connection import RingConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+
+def job(c):
+    with c.marking():
+        c.goto(0x6000, 0x6000)
+        for i in range(3000):
+            c.mark(0x6010 + (i % 500) * 8, 0x6000 + (i % 2) * 0x100)
+        c.mark(0x7000, 0x7000)
+
+
+class TestRingConnection(unittest.TestCase):
+    def test_job_through_ring(self):
+        c = GalvoController(settings_file=__settings__)
+        ring = RingConnection(sender="simulated", slots=4)
+        c.connection = ring
+        try:
+            job(c)
+            # Queries are answered by the board in the sender process.
+            self.assertEqual(c.get_position_xy()[1:3], (0x7000, 0x7000))
+            self.assertEqual(c.get_list_status()[1], ring.list_packets)
+            self.assertGreater(ring.list_packets, 4)
+            self.assertLessEqual(ring.max_pending, 4)
+            self.assertEqual(ring.pending, 0)
+        finally:
+            c.disconnect()
+        self.assertIsNone(ring._process)
+
+    def test_stop_discards_queued(self):
+        ring = RingConnection(sender="simulated", slots=4, buffer_packets=1)
+        self.assertEqual(ring.open(), 0)
+        try:
+            # The board holds one packet and is not executing, the second waits in the sender.
+            ring.write(0, bytes(0xC00))
+            ring.write(0, bytes(0xC00))
+            self.assertGreater(ring.pending, 0)
+            ring.write(0, struct.pack("<6H", StopExecute, 0, 0, 0, 0, 0))
+            ring.write(0, struct.pack("<6H", GetListStatus, 0, 0, 0, 0, 0))
+            self.assertEqual(struct.unpack("<4H", ring.read())[1], 0)
+            self.assertEqual(ring.pending, 0)
+        finally:
+            ring.close()
+
+    def test_backend(self):
+        ring = create_connection("ring", sender="recorder", slots=2)
+        self.assertIsInstance(ring, RingConnection)
+        self.assertEqual(ring.open(), 0)
+        ring.close()
+        self.assertFalse(ring.is_open())
+
+    def test_sender_ended_while_full(self):
+        ring = RingConnection(sender="simulated", slots=2, buffer_packets=1)
+        self.assertEqual(ring.open(), 0)
+        try:
+            # The board holds one packet and is not executing, the sender waits with the next and the ring fills.
+            for i in range(3):
+                ring.write(0, bytes(0xC00))
+            ring._process.terminate()
+            errors = []
+
+            def write():
+                try:
+                    for i in range(3):
+                        ring.write(0, bytes(0xC00))
+                except ConnectionError as e:
+                    errors.append(e)
+
+            thread = threading.Thread(target=write, daemon=True)
+            thread.start()
+            thread.join(10)
+            self.assertFalse(thread.is_alive())
+            self.assertEqual(len(errors), 1)
+        finally:
+            ring.close()
+        self.assertIsNone(ring._process)
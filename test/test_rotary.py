@@ -0,0 +1,57 @@
+import os
+import unittest
+
+import numpy as np
+
+from galvo import *
+from galvo.rotary import RotaryJob, split_bands
+from galvo.simulated_connection import SimulatedConnection
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+
+class TestRotary(unittest.TestCase):
+    def test_rotary_position(self):
+        c = GalvoController(settings_file=__settings__)
+        board = SimulatedConnection()
+        c.connection = board
+        for position in (0, 12345, 0x12345, -0x12345):
+            c.rotary(position)
+            self.assertEqual(board.axis_position, position)
+            self.assertEqual(c.rotary_position(), position)
+
+    def test_rotary_split_bands(self):
+        path = np.array([[0x4000, 100], [0x4000, 2500], [0x5000, 900]], dtype=float)
+        pieces = split_bands(path, 1000)
+        self.assertEqual([band for band, piece in pieces], [0, 1, 2, 1, 0])
+        for band, piece in pieces:
+            self.assertTrue(np.all(piece[:, 1] >= band * 1000 - 1e-9))
+            self.assertTrue(np.all(piece[:, 1] <= (band + 1) * 1000 + 1e-9))
+        # Pieces join up into the original path.
+        joined = np.concatenate([pieces[0][1]] + [piece[1:] for band, piece in pieces[1:]])
+        self.assertEqual(joined[0].tolist(), path[0].tolist())
+        self.assertEqual(joined[-1].tolist(), path[-1].tolist())
+        length = np.hypot(*np.diff(joined, axis=0).T).sum()
+        self.assertAlmostEqual(length, np.hypot(*np.diff(path, axis=0).T).sum())
+
+    def test_rotary_job(self):
+        c = GalvoController(settings_file=__settings__)
+        board = SimulatedConnection(buffer_packets=0x100)
+        c.connection = board
+        # A helix around a cylinder of circumference 0x10000.
+        t = np.linspace(0, 1, 500)
+        helix = np.column_stack((0x6000 + t * 0x4000, t * 0xFFFF))
+        job = RotaryJob([helix], 0x10000, 3600, window=0x2000)
+        while not job(c):
+            pass
+        stats = job.stats()
+        self.assertEqual(stats["bands"], 8)
+        self.assertEqual(board.axis_moves, 8)
+        self.assertEqual(stats["position_error"], 0)
+        self.assertEqual(board.axis_position, job.axis_position(7))
+        self.assertGreaterEqual(stats["cycle_time"], stats["axis_time"] + stats["mark_time"])
+        # Every band is marked within the window around the center of the lens.
+        ys = np.array([y for opcode, x, y in board.positions() if opcode == listMarkTo])
+        self.assertTrue(np.all(np.abs(ys - 0x8000) <= 0x1000))
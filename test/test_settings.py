@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+import unittest
+
+from galvo import GalvoController
+from galvo.settings import GalvoSettings
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+
+class TestSettings(unittest.TestCase):
+    def test_settings_validation(self):
+        settings = GalvoSettings()
+        with self.assertRaises(ValueError):
+            settings.source = "diode"
+        with self.assertRaises(TypeError):
+            settings.mark_speed = "fast"
+        with self.assertRaises(ValueError):
+            settings.light_pin = 16
+        with self.assertRaises(ValueError):
+            settings.power = None
+        with self.assertRaises(AttributeError):
+            settings.unknown = 1
+        with self.assertRaises(ValueError):
+            settings.update({"power": 20.0, "frequency": -1.0})
+        self.assertEqual(settings.power, 50.0)
+        settings.goto_speed = None
+
+    def test_settings_conversions(self):
+        settings = GalvoSettings(galvos_per_mm=500, mark_speed=100.0)
+        self.assertEqual(settings.mark_speed_converted, 50)
+        settings.galvos_per_mm = 1000
+        self.assertEqual(settings.mark_speed_converted, 100)
+        self.assertEqual(settings.frequency_converted, 667)
+        settings.source = "co2"
+        self.assertEqual(settings.frequency_converted, 333)
+        self.assertEqual(settings.power_converted, 333)
+
+    def test_settings_controller(self):
+        controller = GalvoController(settings_file=__settings__, mark_speed=500.0)
+        self.assertTrue(controller.mock)
+        self.assertEqual(controller.light_pin, 4)
+        self.assertEqual(controller.mark_speed, 100.0)
+        controller.power = 20
+        self.assertEqual(controller.settings.power, 20)
+        with self.assertRaises(ValueError):
+            controller.source = "diode"
+        controller = GalvoController(mark_speed=500.0, foot_pin=3)
+        self.assertEqual(controller.mark_speed, 500.0)
+        self.assertEqual(controller.footpedal_pin, 3)
+
+    def test_settings_profiles(self):
+        data = {
+            "defaults": {"mock": True, "source": "fiber", "light_pin": 4},
+            "profiles": {
+                f"station{i}": {"galvos_per_mm": 400 + i, "machine_index": i}
+                for i in range(100)
+            },
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "stations.json")
+            with open(filename, "w") as fp:
+                json.dump(data, fp)
+            profiles = GalvoSettings.load_profiles(filename)
+            self.assertEqual(len(profiles), 100)
+            self.assertEqual(profiles["station7"].galvos_per_mm, 407)
+            self.assertEqual(profiles["station7"].light_pin, 4)
+            self.assertEqual(profiles["station7"].machine_index, 7)
+            controller = GalvoController(settings_file=filename, profile="station3")
+            self.assertEqual(controller.galvos_per_mm, 403)
+            self.assertTrue(controller.mock)
+            with self.assertRaises(KeyError):
+                GalvoSettings.load(filename)
+
+    def test_settings_given(self):
+        settings = GalvoSettings(mock=True, light_pin=4)
+        with self.assertRaises(ValueError):
+            GalvoController(settings=settings, mark_speed=500.0)
+        # Controllers given the same settings with a settings file each keep their own.
+        with tempfile.TemporaryDirectory() as directory:
+            controllers = []
+            for power in (10.0, 20.0):
+                filename = os.path.join(directory, f"power{int(power)}.json")
+                with open(filename, "w") as fp:
+                    json.dump({"power": power}, fp)
+                controllers.append(GalvoController(settings_file=filename, settings=settings))
+        self.assertEqual([c.power for c in controllers], [10.0, 20.0])
+        self.assertEqual(settings.power, 50.0)
+        self.assertIs(GalvoController(settings=settings).settings, settings)
+
+    def test_settings_file_unknown_keys(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "old.json")
+            with open(filename, "w") as fp:
+                json.dump({"mock": True, "power": 20.0, "retired_option": 1}, fp)
+            log = []
+            controller = GalvoController(settings_file=filename, usb_log=log.append)
+            self.assertEqual(controller.power, 20.0)
+            self.assertTrue(any("retired_option" in line for line in log))
+            self.assertEqual(GalvoSettings.load(filename).power, 20.0)
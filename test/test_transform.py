@@ -0,0 +1,151 @@
+import os
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+from galvo import *
+from galvo.farm import CompileFarm
+from galvo.recorder_connection import RecorderConnection
+from galvo.transform import Transform
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+__settings__ = os.path.join(__location__, "test.json")
+
+
+def square(x, y, size):
+    return np.array([[x, y], [x + size, y], [x + size, y + size], [x, y + size]])
+
+
+class TestTransform(unittest.TestCase):
+    def test_lens_scale(self):
+        transform = Transform(galvos_per_mm=500)
+        np.testing.assert_allclose(
+            transform([[0, 0], [10, -4]]), [[0x8000, 0x8000], [0x8000 + 5000, 0x8000 - 2000]]
+        )
+        self.assertEqual(transform.point(10, -4), (0x8000 + 5000, 0x8000 - 2000))
+
+    def test_stack_order(self):
+        transform = Transform(galvos_per_mm=1, origin=(0, 0))
+        transform.translate(10, 0)
+        transform.rotate(90)
+        # Rotated about the origin, then moved along x.
+        np.testing.assert_allclose(transform([[1, 0]]), [[10, 1]], atol=1e-9)
+        with transform.saved():
+            transform.scale(2, cx=1, cy=0)
+            np.testing.assert_allclose(transform([[2, 0]]), [[10, 3]], atol=1e-9)
+        np.testing.assert_allclose(transform([[2, 0]]), [[10, 2]], atol=1e-9)
+        transform.reset()
+        np.testing.assert_allclose(transform([[2, 0]]), [[2, 0]])
+        with self.assertRaises(IndexError):
+            transform.pop()
+
+    def test_svg_matrix(self):
+        transform = Transform(galvos_per_mm=1, origin=(0, 0))
+        transform.apply((1, 0, 0, -1, 5, 7))
+        np.testing.assert_allclose(transform([[1, 2]]), [[6, 5]])
+        np.testing.assert_allclose(transform.inverse(transform([[1, 2]])), [[1, 2]])
+        with self.assertRaises(ValueError):
+            transform.apply((1, 2, 3))
+
+    def test_matrix_cached(self):
+        transform = Transform()
+        for i in range(10):
+            transform([[i, i]])
+        self.assertEqual(transform.compositions, 1)
+        transform.rotate(5)
+        transform([[1, 1]])
+        transform.galvos_per_mm = 400
+        transform([[1, 1]])
+        self.assertEqual(transform.compositions, 3)
+
+    def test_points_outside(self):
+        transform = Transform(galvos_per_mm=500)
+        transform([[0, 0], [70, 0], [0, -70], [65, 65]])
+        segments = np.zeros((3, 2, 2))
+        segments[0, 1] = 80
+        transform(segments)
+        self.assertEqual(transform.stats()["points"], 10)
+        self.assertEqual(transform.stats()["points_outside"], 3)
+
+    def test_correction_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "lens.cor")
+            with open(path, "wb") as f:
+                f.write(bytes(0x16 + 6))
+                f.write(struct.pack("d", 327.68))
+            transform = Transform.from_correction_file(path)
+        self.assertEqual(transform.galvos_per_mm, 327.68)
+        np.testing.assert_allclose(transform([[100, 0]]), [[0x8000 + 32768, 0x8000]])
+
+    def test_mark_polyline(self):
+        path = np.array([[-10.0, -10.0], [10.0, -10.0], [10.0, 10.0], [0.0, 20.0]])
+        c = GalvoController(settings_file=__settings__)
+        transform = c.enable_transform()
+        transform.rotate(30)
+        transform.translate(5, 5)
+        expected = transform(path)
+
+        raw = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        raw.connection = recorder
+        with raw.marking():
+            raw.mark_polyline(expected)
+
+        recorder = RecorderConnection()
+        c.connection = recorder
+        with c.marking():
+            c.mark_polyline(path)
+            c.mark_polylines([path + 1, path + 2], CompileFarm(workers=1))
+        marks = list(recorder.commands(listMarkTo))
+        self.assertEqual(len(marks), 9)
+        self.assertEqual(marks[:3], list(raw.connection.commands(listMarkTo)))
+        # The farm marks in mm too, transformed once.
+        x, y = transform.point(2, 22)
+        self.assertEqual(marks[-1][1:3], (x, y))
+
+    def test_path_leaving_field(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        c.enable_transform()
+        # Out past the edge of the field and back, 65.535mm from the center at 500 galvos/mm.
+        with c.marking():
+            c.mark_polyline([[-10, 0], [100, 0], [0, 10]])
+        moves = [command[:3] for command in recorder.commands() if command[0] in (listJumpTo, listMarkTo)]
+        back = 0x8000 + round(5000 * (82768 - 0xFFFF) / 50000)
+        # Marked to the edge and from where it comes back, not along the chord between the points in the field.
+        self.assertEqual(
+            moves,
+            [
+                (listJumpTo, 0x8000 - 5000, 0x8000),
+                (listMarkTo, 0xFFFF, 0x8000),
+                (listJumpTo, 0xFFFF, back),
+                (listMarkTo, 0x8000, 0x8000 + 5000),
+            ],
+        )
+        self.assertEqual(c.transform.stats()["points_outside"], 1)
+        # Segments are clipped at the edge too.
+        recorder.clear()
+        with c.marking():
+            c.mark_segments([[[-100, 0], [10, 0]]])
+        moves = [command[:3] for command in recorder.commands() if command[0] in (listJumpTo, listMarkTo)]
+        self.assertEqual(moves, [(listJumpTo, 0, 0x8000), (listMarkTo, 0x8000 + 5000, 0x8000)])
+
+    def test_hatch_spacing_in_mm(self):
+        c = GalvoController(settings_file=__settings__)
+        recorder = RecorderConnection()
+        c.connection = recorder
+        transform = c.enable_transform()
+        transform.scale(1, 2)
+        with c.marking():
+            c.hatch(square(0, 0, 10), spacing=1.0, bidirectional=False)
+        # Hatched before scaling, the lines are 1mm apart in the polygon's mm, 2mm apart on the field.
+        marks = list(recorder.commands(listMarkTo))
+        ys = sorted({command[2] for command in marks})
+        self.assertEqual(len(ys), 10)
+        self.assertAlmostEqual((ys[1] - ys[0]) / 500, 2.0, places=2)
+        c.disable_transform()
+        self.assertIsNone(c.transform)